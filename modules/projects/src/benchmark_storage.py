@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+from core.config import settings
+from core.connection import init_documents
+from logic.ingest import delete_unreferenced, insert_contributions
+from models import DBContribution, DBProject, SuperTokensUser
+from models.database.loaders import create_loaders
+from schema import schema
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("main")
+
+QUERIES = {
+    "list": """
+        query($limit: Int) {
+            projects { items(limit: $limit) { id name location { country } } }
+        }
+    """,
+    "assemblies": """
+        query($limit: Int) {
+            projects { items(limit: $limit) { id name assemblies { id name products { id name impactData { ... on EPD { id } } } } } }
+        }
+    """,
+}
+
+
+def copy_project(data: dict) -> DBProject:
+    """A copy of the project with new ids, so every copy is stored as its own documents"""
+
+    project = DBProject(**data)
+    project.id = uuid.uuid4()
+    for assembly in project.assemblies:
+        assembly.id = uuid.uuid4()
+        for product in assembly.products:
+            product.id = uuid.uuid4()
+    return project
+
+
+async def run_query(query: str, user: SuperTokensUser, limit: int, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        context = {"user": user, "loaders": create_loaders()}
+        start = time.perf_counter()
+        result = await schema.execute(query, variable_values={"limit": limit}, context_value=context)
+        timings.append(time.perf_counter() - start)
+        if result.errors:
+            raise RuntimeError(result.errors)
+    return timings
+
+
+async def benchmark(layout: str, data: dict, projects: int, runs: int) -> dict[str, list[float]]:
+    settings.PROJECT_STORAGE = layout
+    user = SuperTokensUser(id=uuid.uuid4(), organization_id=uuid.uuid4())
+    contributions = [
+        DBContribution(project=copy_project(data), user_id=user.id, organization_id=user.organization_id)
+        for _ in range(projects)
+    ]
+    for start in range(0, projects, settings.UPLOAD_BATCH_SIZE):
+        await insert_contributions(contributions[start : start + settings.UPLOAD_BATCH_SIZE])
+
+    try:
+        return {name: await run_query(query, user, projects, runs) for name, query in QUERIES.items()}
+    finally:
+        await DBContribution.get_motor_collection().delete_many({"organizationId": user.organization_id})
+        await delete_unreferenced([contribution.project.id for contribution in contributions])
+
+
+async def main(project: Path, projects: int, runs: int) -> None:
+    await init_documents()
+    data = json.loads(project.read_text())
+
+    for layout in ("linked", "embedded"):
+        for name, timings in (await benchmark(layout, data, projects, runs)).items():
+            timings = sorted(timings)
+            logger.info(
+                f"{layout:>8} {name:>10}: median {statistics.median(timings) * 1000:.1f} ms, "
+                f"p95 {timings[int(0.95 * (len(timings) - 1))] * 1000:.1f} ms over {runs} runs"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the read latency of projects.items with linked and embedded project storage. "
+        "Copies of the project are written under a new organization and deleted afterwards"
+    )
+    parser.add_argument("project", type=Path, help="LCAx project JSON to copy")
+    parser.add_argument("--projects", type=int, default=50, help="Copies of the project to read per query")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.project, args.projects, args.runs))
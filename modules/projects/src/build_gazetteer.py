@@ -0,0 +1,77 @@
+import argparse
+import io
+import json
+import logging
+import zipfile
+from pathlib import Path
+
+import httpx
+from iso3166 import countries
+
+from models.database.gazetteer import GAZETTEER_PATH, gazetteer_key, write_gazetteer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("main")
+
+COUNTRY_CACHE = Path(__file__).parent / "models" / "database" / "country_cache.json"
+GEONAMES_CITIES = "https://download.geonames.org/export/dump/cities15000.zip"
+
+
+def read_cities(source: str) -> str:
+    """The GeoNames cities table, from a .txt or .zip file or URL"""
+
+    if source.startswith("http"):
+        data = httpx.get(source, follow_redirects=True, timeout=120).raise_for_status().content
+    else:
+        data = Path(source).read_bytes()
+
+    if data[:2] == b"PK":
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            name = next(name for name in archive.namelist() if name.endswith(".txt"))
+            return archive.read(name).decode()
+    return data.decode()
+
+
+def city_entries(table: str, min_population: int) -> dict[bytes, tuple[float, float]]:
+    """The most populous city of each name per country. Names are indexed by their name and ASCII name"""
+
+    alpha3 = {country.alpha2: country.alpha3 for country in countries}
+    entries = {}
+    populations = {}
+    for line in table.splitlines():
+        columns = line.split("\t")
+        if len(columns) < 15 or columns[8] not in alpha3:
+            continue
+        population = int(columns[14] or 0)
+        if population < min_population:
+            continue
+
+        for name in {columns[1], columns[2]}:
+            key = gazetteer_key(alpha3[columns[8]], name)
+            if populations.get(key, -1) < population:
+                entries[key] = (float(columns[4]), float(columns[5]))
+                populations[key] = population
+    return entries
+
+
+def main(cities: str | None, min_population: int) -> None:
+    entries = {
+        gazetteer_key(country): (location["latitude"], location["longitude"])
+        for country, location in json.loads(COUNTRY_CACHE.read_text()).items()
+    }
+    if cities:
+        entries.update(city_entries(read_cities(cities), min_population))
+
+    write_gazetteer(entries)
+    logger.info(f"Wrote {len(entries)} places to {GAZETTEER_PATH}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline gazetteer of country and city coordinates")
+    parser.add_argument(
+        "--cities", nargs="?", const=GEONAMES_CITIES, help=f"GeoNames cities file or URL, default {GEONAMES_CITIES}"
+    )
+    parser.add_argument("--min-population", type=int, default=15000)
+    args = parser.parse_args()
+
+    main(args.cities, args.min_population)
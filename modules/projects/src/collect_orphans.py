@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import logging
+
+from core.config import settings
+from core.connection import init_documents
+from logic.gc import collect_orphans
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("main")
+
+
+async def main(batch_size: int, delay: float, dry_run: bool) -> None:
+    await init_documents(skip_indexes=True)
+
+    collected = await collect_orphans(batch_size, delay, dry_run)
+    for name, result in collected.items():
+        logger.info(f"{name}: {result.count} documents, {result.bytes} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete projects and linked documents that nothing links to")
+    parser.add_argument("--batch-size", type=int, default=settings.GC_BATCH_SIZE)
+    parser.add_argument("--delay", type=float, default=settings.GC_BATCH_DELAY, help="Seconds between batches")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the orphans")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.batch_size, args.delay, args.dry_run))
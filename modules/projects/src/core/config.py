@@ -1,4 +1,4 @@
-from typing import Any, Tuple, Type
+from typing import Any, Literal, Tuple, Type
 import json
 
 from pydantic import AnyHttpUrl, MongoDsn, field_validator
@@ -40,6 +40,55 @@ class Settings(BaseSettings):
 
     LOG_LEVEL: str = "INFO"
 
+    # Streaming project uploads: projects per bulk write, largest single project and size of inflated gzip chunks
+    UPLOAD_BATCH_SIZE: int = 20
+    UPLOAD_MAX_DOCUMENT_SIZE: int = 50 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+    # Contribution jobs: in-process workers (0 leaves the jobs to the worker entrypoint), polling interval, the
+    # seconds without progress after which a running job is taken over by another worker and the claims of a job
+    # before a worker error fails it
+    INGEST_WORKERS: int = 2
+    INGEST_POLL_INTERVAL: float = 2.0
+    INGEST_JOB_TIMEOUT: int = 300
+    INGEST_JOB_MAX_ATTEMPTS: int = 3
+
+    # Orphan collection: seconds between sweeps of the in-process collector (0, the default, disables it; a single
+    # scheduled `make gc` is preferred over a collector in every API process), documents scanned per batch, seconds to
+    # pause between batches, and the age in seconds below which a document is never collected. The grace period covers
+    # uploads without transactions, which write projects before their contributions, and resumed jobs
+    GC_INTERVAL: float = 0
+    GC_BATCH_SIZE: int = 500
+    GC_BATCH_DELAY: float = 0.5
+    GC_GRACE_PERIOD: int = 3600
+
+    # Geocoding backfill of projects stored without coordinates: whether every API process runs it at startup (off, as
+    # `make migrate name=geocode-projects` runs it once), with the projects per batch and seconds to pause between batches
+    GEOCODE_BACKFILL: bool = False
+    GEOCODE_BATCH_SIZE: int = 500
+    GEOCODE_BATCH_DELAY: float = 1.0
+
+    # Project storage: "linked" splits a project over the project, assembly and product collections, "embedded" stores
+    # it as one document. Embedded projects above the size limit, kept below the 16 MB BSON limit, are linked instead
+    PROJECT_STORAGE: Literal["linked", "embedded"] = "linked"
+    EMBEDDED_PROJECT_MAX_SIZE: int = 15 * 1024 * 1024
+
+    # Results of the groups and aggregation queries kept in memory per process (0 disables the cache)
+    RESULT_CACHE_SIZE: int = 256
+
+    # Analytics queries: time budget of the aggregation pipelines and the most items kept per group without a limit
+    ANALYTICS_MAX_TIME_MS: int = 10_000
+    GROUP_MAX_ITEMS: int = 1000
+    # Most documents returned by a client supplied aggregation pipeline
+    ANALYTICS_MAX_RESULTS: int = 1000
+
+    # Seconds clients may use the OpenBDF schema before revalidating it with its ETag
+    OPENBDF_CACHE_MAX_AGE: int = 3600
+
+    # Map clusters: grid cells per edge of a map tile at the requested zoom, and the most clusters returned
+    MAP_CLUSTER_GRID: int = 4
+    MAP_MAX_CLUSTERS: int = 500
+
     MONGO_USER: str
     MONGO_PASSWORD: str
     MONGO_HOST: str
@@ -19,6 +19,57 @@ def get_database() -> AsyncIOMotorDatabase:
     return client[settings.MONGO_DB]
 
 
+def get_document_models() -> list:
+    """All document models of the service"""
+
+    from models import (
+        DBAssembly,
+        DBProduct,
+        DBEPD,
+        DBTechFlow,
+        DBProject,
+        DBContribution,
+        DBProjectSummary,
+        DBDataVersion,
+        DBGeocode,
+        DBContributionJob,
+        DBContributionJobItem,
+    )
+
+    return [
+        DBAssembly,
+        DBProduct,
+        DBEPD,
+        DBTechFlow,
+        DBProject,
+        DBContribution,
+        DBProjectSummary,
+        DBDataVersion,
+        DBGeocode,
+        DBContributionJob,
+        DBContributionJobItem,
+    ]
+
+
+async def init_documents(skip_indexes: bool = False, drop_indexes: bool = False) -> AsyncIOMotorDatabase:
+    """
+    Initialize Beanie with all document models of the service.
+    The indexes declared in the models' Settings that are missing are created. Undeclared indexes are only dropped with
+    drop_indexes, by the indexes CLI, so processes of an older version or indexes added by hand keep theirs.
+    """
+
+    from beanie import init_beanie
+
+    db = get_database()
+    await init_beanie(
+        database=db,
+        document_models=get_document_models(),
+        allow_index_dropping=drop_indexes,
+        skip_indexes=skip_indexes,
+    )
+    return db
+
+
 @retry(
     stop=stop_after_attempt(60 * 5),
     wait=wait_fixed(1),
@@ -10,20 +10,30 @@ if TYPE_CHECKING:
 
 
 async def get_context(request: Request):
+    from models.database.loaders import create_loaders
+
+    return {"user": await get_request_user(request), "loaders": create_loaders()}
+
+
+async def get_request_user(request: Request) -> "SuperTokensUser | None":
     from supertokens_python.recipe.session.asyncio import get_session
-    from models import SuperTokensUser as User
 
     session = await get_session(request, session_required=False)
     if not session:
-        return {"user": None}
+        return None
+
+    return await get_session_user(session.get_user_id())
+
+
+async def get_session_user(user_id: str) -> "SuperTokensUser":
+    from models import SuperTokensUser as User
 
-    user_id = session.get_user_id()
     metadata = await get_user_metadata(user_id)
     organization_id = metadata.metadata.get("organization_id", None)
     if organization_id:
         organization_id = UUID(organization_id)
 
-    return {"user": User(id=UUID(user_id), organization_id=organization_id)}
+    return User(id=UUID(user_id), organization_id=organization_id)
 
 
 def get_user(info: Info) -> "SuperTokensUser":
@@ -22,6 +22,14 @@ class InvalidOperationError(GBDIApiError):
     pass
 
 
+class PartialUploadError(InvalidOperationError):
+    """Raised when an upload fails after some of its batches were written, with the ids of the stored contributions"""
+
+    def __init__(self, message: str, name: str, contributions: list):
+        self.contributions = contributions
+        super().__init__(message=message, name=name)
+
+
 class MicroServiceConnectionError(GBDIApiError):
     """Raised when the connection to another microservice fails"""
 
@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import logging
+
+from core.connection import get_document_models, init_documents
+from logic.indexes import index_report
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("main")
+
+
+async def main(reconcile: bool) -> None:
+    # Only touch the indexes when asked to, so the report shows the state of the database
+    await init_documents(skip_indexes=not reconcile, drop_indexes=reconcile)
+
+    for collection in await index_report(get_document_models()):
+        logger.info(f"Collection {collection['collection']}")
+        for name, ops in collection["usage"].items():
+            logger.info(f"  {name}: {ops} operations")
+        if collection["missing"]:
+            logger.warning(f"  Missing indexes: {', '.join(collection['missing'])}")
+        if collection["undeclared"]:
+            logger.warning(f"  Undeclared indexes: {', '.join(collection['undeclared'])}")
+        if collection["unused"]:
+            logger.warning(f"  Unused indexes: {', '.join(collection['unused'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report missing, undeclared and unused indexes of the projects database"
+    )
+    parser.add_argument("--reconcile", action="store_true", help="Create missing and drop undeclared indexes first")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.reconcile))
@@ -1,19 +1,22 @@
 from .contribution import (
     get_contributions,
+    count_contributions,
     create_contributions,
     update_contributions,
     delete_contributions,
     check_fetch_projects,
 )
-from .project import get_projects
+from .project import get_projects, count_projects
 from .openbdf import serialize_openbdf_schema
 
 __all__ = [
     get_contributions,
+    count_contributions,
     create_contributions,
     update_contributions,
     delete_contributions,
     check_fetch_projects,
     get_projects,
+    count_projects,
     serialize_openbdf_schema,
 ]
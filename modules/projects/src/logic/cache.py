@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+from uuid import UUID
+
+from core.config import settings
+from models import DBDataVersion
+
+logger = logging.getLogger("main")
+
+# The version document of the projects, incremented by every write to contributions and their projects
+PROJECTS_VERSION = "projects"
+
+
+async def get_version(name: str = PROJECTS_VERSION) -> int:
+    document = await DBDataVersion.get_motor_collection().find_one({"_id": name})
+    return document["version"] if document else 0
+
+
+async def bump_version(name: str = PROJECTS_VERSION) -> None:
+    """Invalidate the cached results of every process, as they check the version before serving a result"""
+
+    await DBDataVersion.get_motor_collection().update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def cache_key(name: str, organization_id: UUID | None, arguments: Any) -> tuple[str, str, str]:
+    """Results are scoped by organization, as it decides which private projects are visible"""
+
+    canonical = json.dumps(arguments, sort_keys=True, default=str, separators=(",", ":"))
+    return name, str(organization_id), hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    A size bounded LRU cache of query results, valid for one version of the projects.
+    Concurrent calls with the same key share one computation.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple, tuple[int, asyncio.Future]] = OrderedDict()
+
+    async def get(self, key: tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if self.maxsize <= 0:
+            return await compute()
+
+        version = await get_version()
+        entry = self._entries.get(key)
+        if entry and entry[0] == version:
+            self._entries.move_to_end(key)
+            logger.debug(f"Result cache hit for {key[0]}")
+            return await asyncio.shield(entry[1])
+
+        future = asyncio.ensure_future(compute())
+        self._entries[key] = (version, future)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # Failed results are not cached
+            if self._entries.get(key, (None, None))[1] is future:
+                del self._entries[key]
+            raise
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+result_cache = ResultCache(settings.RESULT_CACHE_SIZE)
@@ -3,13 +3,23 @@ import logging
 from enum import Enum
 from uuid import UUID
 
-from beanie import WriteRules
 from beanie.odm.operators.find.logical import Or
 from beanie.operators import In
+from pymongo import UpdateOne
 from strawberry import Info, UNSET
 
-from models import DBContribution, InputContribution, DBProject, SuperTokensUser, UpdateContribution
-from models.sort_filter import sort_model_query, filter_model_query, FilterBy, SortBy
+from logic.cache import bump_version
+from logic.ingest import delete_unreferenced, insert_contributions
+from models import DBContribution, InputContribution, DBProject, DBProjectSummary, SuperTokensUser, UpdateContribution
+from models.sort_filter import (
+    sort_model_query,
+    filter_model_query,
+    count_model_query,
+    keyset_model_query,
+    FilterBy,
+    SortBy,
+)
+from models.selection import construct_contribution_lookups, references_field
 
 logger = logging.getLogger("main")
 
@@ -21,20 +31,33 @@ async def get_contributions(
     limit: int | None,
     offset: int,
     fetch_links: bool = False,
+    after: str | None = UNSET,
+    selection: dict | None = None,
 ) -> list[DBContribution]:
     query = DBContribution.find(Or(DBContribution.organization_id == organization_id, DBContribution.public == True))  # noqa: E712
 
     query = filter_model_query(DBContribution, filter_by, query)
-    query = sort_model_query(DBContribution, sort_by, query)
+    if after is UNSET:
+        query = sort_model_query(DBContribution, sort_by, query)
+    else:
+        query = keyset_model_query(DBContribution, sort_by, after, query)
 
     if limit is not None:
         query = query.limit(limit)
 
-    if offset:
+    if offset and after is UNSET:
         query = query.skip(offset)
-    if fetch_links:
-        query = query.find({}, fetch_links=True)
-    contributions = await query.to_list()
+    if fetch_links and selection is not None and not references_field(query, "project."):
+        # Only look up the projects of the page, with the selected project fields
+        contributions = await DBContribution.aggregate(
+            [*query.build_aggregation_pipeline(), *construct_contribution_lookups(selection)],
+            projection_model=DBContribution,
+        ).to_list()
+    else:
+        if fetch_links:
+            # The links below the project are resolved by the per-request loaders
+            query = query.find({}, fetch_links=True, nesting_depth=1)
+        contributions = await query.to_list()
 
     logger.debug(
         f"Found {len(contributions)} projects for organization {organization_id} with filter \n{filter_by} and :\n sort {sort_by} ; limit {limit} ; offset {offset} ; fetch_links {fetch_links} \n\n"
@@ -42,63 +65,87 @@ async def get_contributions(
     return contributions
 
 
+async def count_contributions(organization_id: UUID, filter_by: FilterBy | None) -> dict[str, int]:
+    query = DBContribution.find(
+        Or(DBContribution.organization_id == organization_id, DBContribution.public == True),  # noqa: E712
+        fetch_links=bool(filter_by),
+        nesting_depth=1,
+    )
+    query = filter_model_query(DBContribution, filter_by, query)
+
+    counts = await count_model_query(query)
+
+    logger.debug(f"Counted {counts} contributions for organization {organization_id} with filter {filter_by}")
+    return counts
+
+
 async def create_contributions(contributions: list[InputContribution], user: SuperTokensUser) -> list[DBContribution]:
-    _contributions = []
-    for _contribution in contributions:
-        contribution = DBContribution(
+    _contributions = [
+        DBContribution(
             project=DBProject(**as_dict(_contribution.project)),
             user_id=user.id,
             organization_id=user.organization_id,
             public=_contribution.public,
         )
-        await contribution.insert(link_rule=WriteRules.WRITE)
-        _contributions.append(contribution)
+        for _contribution in contributions
+    ]
 
-    return _contributions
+    return await insert_contributions(_contributions)
 
 
 async def delete_contributions(contributions: list[UUID], user: SuperTokensUser) -> list[UUID]:
-    _contributions = DBContribution.find(In(DBContribution.id, contributions)).find(
-        DBContribution.organization_id == user.organization_id
-    )
-    logger.debug(f"Deleting {await _contributions.count()} contributions for organization {user.organization_id}")
-    contribution_ids = [contribution.id for contribution in (await _contributions.to_list())]
-    await _contributions.delete()
+    collection = DBContribution.get_motor_collection()
+    deleted = await collection.find(
+        {"_id": {"$in": contributions}, "organizationId": user.organization_id}, {"project": 1}
+    ).to_list(None)
+    contribution_ids = [contribution["_id"] for contribution in deleted]
+    logger.debug(f"Deleting {len(contribution_ids)} contributions for organization {user.organization_id}")
+
+    await collection.delete_many({"_id": {"$in": contribution_ids}})
+
+    # Remove the projects, assemblies and products that only the deleted contributions linked to
+    await delete_unreferenced([contribution["project"].id for contribution in deleted if contribution.get("project")])
+    await bump_version()
 
     return contribution_ids
 
 
 async def update_contributions(contributions: list[UpdateContribution], user: SuperTokensUser) -> list[DBContribution]:
-    _contributions = []
+    operations = []
     for _contribution in contributions:
-        contribution = await DBContribution.find(
-            DBContribution.id == _contribution.id, DBContribution.organization_id == user.organization_id
-        ).first_or_none()
-        if not contribution:
-            logger.debug(
-                f"Couldn't find Contribution with id {_contribution.id} and organization_id {user.organization_id}"
+        fields = {
+            DBContribution.model_fields[field].alias or field: value
+            for field, value in as_dict(_contribution).items()
+            if field != "id" and value is not UNSET
+        }
+        if fields:
+            operations.append(
+                UpdateOne({"_id": _contribution.id, "organizationId": user.organization_id}, {"$set": fields})
             )
-            continue
-        for field, value in as_dict(_contribution).items():
-            if field == "id" or value is UNSET:
-                continue
-            setattr(contribution, field, value)
 
-        await contribution.save()
-        logger.debug(f"Updated Contribution with id {_contribution.id} and organization_id {user.organization_id}")
-        _contributions.append(contribution)
+    if operations:
+        result = await DBContribution.get_motor_collection().bulk_write(operations, ordered=False)
+        logger.debug(f"Updated {result.modified_count} contributions for organization {user.organization_id}")
+
+    _contributions = await DBContribution.find(
+        In(DBContribution.id, [_contribution.id for _contribution in contributions]),
+        DBContribution.organization_id == user.organization_id,
+    ).to_list()
+
+    # Keep the visibility denormalized onto the projects and their summaries in step
+    if _contributions:
+        visibility = [
+            UpdateOne({"_id": contribution.project.ref.id}, {"$set": {"public": contribution.public}})
+            for contribution in _contributions
+        ]
+        await DBProject.get_motor_collection().bulk_write(visibility, ordered=False)
+        await DBProjectSummary.get_motor_collection().bulk_write(visibility, ordered=False)
+        await bump_version()
 
     return _contributions
 
 
 def check_fetch_projects(info: Info) -> bool:
-    if [
-        field
-        for field in info.selected_fields
-        if (field.name == "count" or field.name == "publicCount" or field.name == "privateCount")
-    ]:
-        return True
-
     if contribution_field := [field for field in info.selected_fields if (field.name in "items")]:
         if [_field for _field in contribution_field[0].selections if _field.name == "project"]:
             return True
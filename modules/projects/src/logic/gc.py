@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from uuid import UUID
+
+from beanie import Document
+
+from core.config import settings
+from logic.cache import bump_version
+from logic.ingest import IMPACT_DATA_PARENTS, WRITTEN_AT, find_unreferenced
+from logic.summaries import delete_summaries
+from models import DBEPD, DBAssembly, DBContribution, DBProduct, DBProject, DBTechFlow
+
+logger = logging.getLogger("main")
+
+# Collections that are only reachable through links, as (model, [(parent model, link field in the parent)]).
+# They are swept top down, so the documents below an orphaned project are collected in the same sweep.
+ORPHAN_TREE = [
+    (DBProject, [(DBContribution, "project")]),
+    (DBAssembly, [(DBProject, "assemblies")]),
+    (DBProduct, [(DBAssembly, "products")]),
+    (DBEPD, IMPACT_DATA_PARENTS),
+    (DBTechFlow, IMPACT_DATA_PARENTS),
+]
+
+
+@dataclass
+class CollectedOrphans:
+    count: int = 0
+    bytes: int = 0
+
+
+async def find_orphans(
+    model: type[Document],
+    parents: list[tuple[type[Document], str]],
+    after: UUID | None,
+    limit: int,
+    written_before: datetime.datetime | None = None,
+) -> tuple[list[tuple[UUID, int]], UUID | None]:
+    """
+    Anti-join the next `limit` documents, in id order, against the links of the parent collections.
+    Returns the ids and BSON sizes of the unreferenced documents and the id to continue after.
+    Documents written after `written_before` are never orphans, as the documents linking to them may not be written yet.
+    """
+
+    pipeline = [
+        {"$match": {"_id": {"$gt": after}}} if after is not None else {"$match": {}},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 1, "size": {"$bsonSize": "$$ROOT"}, WRITTEN_AT: 1}},
+        *(
+            {
+                "$lookup": {
+                    "from": parent.get_motor_collection().name,
+                    "localField": "_id",
+                    "foreignField": f"{field}.$id",
+                    "pipeline": [{"$limit": 1}, {"$project": {"_id": 1}}],
+                    "as": f"parents_{index}",
+                }
+            }
+            for index, (parent, field) in enumerate(parents)
+        ),
+    ]
+
+    orphans = []
+    last = None
+    async for document in model.get_motor_collection().aggregate(pipeline):
+        last = document["_id"]
+        # Documents written before the field was stored are old enough
+        written_at = document.get(WRITTEN_AT)
+        if written_before and written_at and written_at >= written_before:
+            continue
+        if not any(document[f"parents_{index}"] for index in range(len(parents))):
+            orphans.append((document["_id"], document["size"]))
+    return orphans, last
+
+
+async def collect_orphans(
+    batch_size: int = settings.GC_BATCH_SIZE, delay: float = settings.GC_BATCH_DELAY, dry_run: bool = False
+) -> dict[str, CollectedOrphans]:
+    """
+    Delete projects, assemblies, products, EPDs and TechFlows that no document links to.
+    Each collection is scanned in batches of `batch_size` documents with a pause of `delay` seconds between batches,
+    so a sweep does not compete with foreground traffic. Documents written in the last GC_GRACE_PERIOD seconds are
+    kept, as without transactions an upload writes them before the contribution that links to them.
+    """
+
+    written_before = datetime.datetime.now() - datetime.timedelta(seconds=settings.GC_GRACE_PERIOD)
+    collected = {}
+    for model, parents in ORPHAN_TREE:
+        result = collected[model.__name__] = CollectedOrphans()
+        after = None
+        while True:
+            orphans, after = await find_orphans(model, parents, after, batch_size, written_before)
+            if orphans:
+                # Check the links again right before deleting, in case a contribution was written during the scan
+                ids = [_id for _id, _ in orphans]
+                for parent, field in parents:
+                    ids = await find_unreferenced(parent, field, ids)
+                ids = set(ids)
+                if ids and not dry_run:
+                    await model.get_motor_collection().delete_many({"_id": {"$in": list(ids)}})
+                    if model is DBProject:
+                        await delete_summaries(list(ids))
+                result.count += len(ids)
+                result.bytes += sum(size for _id, size in orphans if _id in ids)
+
+            if after is None:
+                break
+            await asyncio.sleep(delay)
+
+    if not dry_run and collected[DBProject.__name__].count:
+        await bump_version()
+
+    logger.info(
+        f"{'Found' if dry_run else 'Collected'} orphans: "
+        + ", ".join(f"{name} {result.count} ({result.bytes} bytes)" for name, result in collected.items())
+    )
+    return collected
+
+
+async def run_collector(interval: float = settings.GC_INTERVAL) -> None:
+    """Sweep for orphans every `interval` seconds until cancelled"""
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await collect_orphans()
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.error(f"Orphan collection failed: {error}")
+
+
+def start_collector(interval: float = settings.GC_INTERVAL) -> asyncio.Task | None:
+    if interval <= 0:
+        return None
+    return asyncio.create_task(run_collector(interval))
+
+
+async def stop_collector(collector: asyncio.Task | None) -> None:
+    if collector is None:
+        return
+    collector.cancel()
+    await asyncio.gather(collector, return_exceptions=True)
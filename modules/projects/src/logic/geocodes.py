@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+from pymongo import UpdateOne
+
+from core.config import settings
+from logic.cache import bump_version
+from models import DBGeocode, DBLocation, DBProject, DBProjectSummary
+from models.database.geocodes import geocode_locations
+
+logger = logging.getLogger("main")
+
+
+async def backfill_coordinates(
+    batch_size: int = settings.GEOCODE_BATCH_SIZE, delay: float = settings.GEOCODE_BATCH_DELAY
+) -> int:
+    """
+    Geocode the projects stored without coordinates or map point, and resolve again the cities that fell back to their
+    country, in id order, pausing `delay` seconds between batches. Run it after rebuilding the gazetteer. The coordinates
+    are written to the projects and their summaries when they change.
+    """
+
+    projects = DBProject.get_motor_collection()
+    summaries = DBProjectSummary.get_motor_collection()
+
+    # Geocodes stored under a city with the coordinates of its country, before fallbacks were kept under the country
+    await DBGeocode.get_motor_collection().delete_many(
+        {"city": {"$nin": [None, ""]}, "precision": {"$in": ["country", "unknown"]}}
+    )
+
+    geocoded = 0
+    after = None
+    while True:
+        # Projects without coordinates, geocoded before map points were stored, or whose city fell back to its country
+        query = {
+            "$or": [
+                {"location.coordinates": None},
+                {"location.point": None, "location.coordinates.precision": {"$in": ["city", "country"]}},
+                {
+                    "location.city": {"$nin": [None, ""]},
+                    "location.coordinates.precision": {"$in": ["country", "unknown"]},
+                },
+            ]
+        }
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        batch = await projects.find(query, {"location": 1}).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        after = batch[-1]["_id"]
+
+        stored = {project["_id"]: DBLocation.model_validate(project["location"]) for project in batch}
+        locations = {_id: location.model_copy() for _id, location in stored.items()}
+        for location in locations.values():
+            if location.city and location.coordinates and location.coordinates.precision != "city":
+                location.coordinates = None
+        await geocode_locations(list(locations.values()))
+
+        operations = [
+            UpdateOne(
+                {"_id": _id},
+                {
+                    "$set": {
+                        "location.coordinates": location.coordinates.model_dump(),
+                        "location.point": location.point.model_dump() if location.point else None,
+                    }
+                },
+            )
+            for _id, location in locations.items()
+            if (location.coordinates, location.point) != (stored[_id].coordinates, stored[_id].point)
+        ]
+        if operations:
+            await projects.bulk_write(operations, ordered=False)
+            await summaries.bulk_write(operations, ordered=False)
+            geocoded += len(operations)
+
+        await asyncio.sleep(delay)
+
+    if geocoded:
+        await bump_version()
+    logger.info(f"Geocoded {geocoded} projects")
+    return geocoded
+
+
+def start_backfill(enabled: bool = settings.GEOCODE_BACKFILL) -> asyncio.Task | None:
+    if not enabled:
+        return None
+    return asyncio.create_task(_run_backfill())
+
+
+async def _run_backfill() -> None:
+    try:
+        await backfill_coordinates()
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        logger.error(f"Geocoding backfill failed: {error}")
+
+
+async def stop_backfill(backfill: asyncio.Task | None) -> None:
+    if backfill is None:
+        return
+    backfill.cancel()
+    await asyncio.gather(backfill, return_exceptions=True)
@@ -0,0 +1,36 @@
+import logging
+
+from beanie import Document
+
+logger = logging.getLogger("main")
+
+
+def get_declared_indexes(model: type[Document]) -> list[str]:
+    """Names of the indexes declared in the Settings of a document model"""
+
+    return [index.name for index in model.get_settings().indexes or []]
+
+
+async def index_report(models: list[type[Document]]) -> list[dict]:
+    """
+    Compare the declared indexes with the ones in the database.
+    Usage comes from $indexStats, so it only counts operations since the last restart of the mongod.
+    """
+
+    report = []
+    for model in models:
+        collection = model.get_motor_collection()
+        declared = get_declared_indexes(model)
+        existing = await collection.index_information()
+        usage = {stats["name"]: stats["accesses"]["ops"] async for stats in collection.aggregate([{"$indexStats": {}}])}
+
+        report.append(
+            {
+                "collection": collection.name,
+                "missing": [name for name in declared if name not in existing],
+                "undeclared": [name for name in existing if name not in declared and name != "_id_"],
+                "unused": [name for name, ops in usage.items() if ops == 0 and name != "_id_"],
+                "usage": usage,
+            }
+        )
+    return report
@@ -0,0 +1,386 @@
+import datetime
+import logging
+from uuid import UUID, uuid5
+
+import bson
+from async_lru import alru_cache
+from beanie import Document, Link
+from beanie.odm.utils.dump import get_dict
+from bson import DBRef, json_util
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession
+from pymongo import ReplaceOne, UpdateOne
+
+from core.config import settings
+from logic.cache import bump_version
+from logic.summaries import delete_summaries
+from models import DBEPD, DBAssembly, DBContribution, DBProduct, DBProject, DBProjectSummary, DBTechFlow
+from models.database.geocodes import geocode_locations
+
+logger = logging.getLogger("main")
+
+# Namespace of the content addressed ids of EPDs and TechFlows
+IMPACT_DATA_NAMESPACE = UUID("5b0c6f57-2f0d-4a8e-9d3c-3f1e0b7a6c21")
+
+# Documents that are only reachable through links, and the field with the time they were last written. The orphan
+# collector leaves recently written documents alone, as their contribution may not be written yet. EPDs and TechFlows
+# are marked in write_content_addressed
+LINKED_MODELS = (DBProject, DBAssembly, DBProduct)
+WRITTEN_AT = "writtenAt"
+
+# Namespace of the ids of projects whose LCAx id another organization already stored
+PROJECT_NAMESPACE = UUID("0d6f3e2a-8c41-4b7e-a5f9-6e2d1c8b4a73")
+
+# Written once per content hash and shared by every product that links to them
+CONTENT_ADDRESSED_MODELS = (DBEPD, DBTechFlow)
+
+# The UUID encoding of the Mongo client, for measuring documents before they are written
+CODEC_OPTIONS = CodecOptions(uuid_representation=UuidRepresentation.STANDARD)
+
+
+def content_id(document: Document) -> UUID:
+    """
+    A UUID derived from the canonical JSON of a document, without its id.
+    Identical datasets, e.g. the same generic EPD in many uploads, get the same id.
+    """
+
+    data = _without_id(get_dict(document, to_db=True))
+    data.pop("revision_id", None)
+    return uuid5(IMPACT_DATA_NAMESPACE, json_util.dumps(data, sort_keys=True, separators=(",", ":")))
+
+
+def link_impact_data(product: DBProduct) -> Document | None:
+    """Replace the embedded impact data of a product with a link to its content addressed EPD or TechFlow"""
+
+    impact_data = product.impact_data
+    if not isinstance(impact_data, CONTENT_ADDRESSED_MODELS):
+        return None
+
+    impact_data.id = content_id(impact_data)
+    product.impact_data = Link(
+        DBRef(impact_data.get_motor_collection().name, impact_data.id), document_class=type(impact_data)
+    )
+    return impact_data
+
+
+def scoped_id(organization_id: UUID, _id: UUID) -> UUID:
+    """The id of a document of an organization, whose LCAx id is taken by another organization"""
+
+    return uuid5(PROJECT_NAMESPACE, f"{organization_id}:{_id}")
+
+
+async def scope_project_ids(contributions: list[DBContribution]) -> None:
+    """
+    Projects, assemblies and products keep their LCAx ids, so an organization replaces its project by uploading it again.
+    A project whose id, or the id of one of its assemblies or products, another organization already stored gets ids
+    derived from its organization and LCAx ids, for the project and all its assemblies and products. It never replaces
+    the documents, or the visibility, of another organization, and its own re-uploads still replace it.
+    """
+
+    projects = [contribution for contribution in contributions if isinstance(contribution.project, DBProject)]
+    if not projects:
+        return
+
+    owners = await document_owners(
+        [contribution.project.id for contribution in projects],
+        [assembly.id for contribution in projects for assembly in contribution.project.assemblies],
+        [
+            product.id
+            for contribution in projects
+            for assembly in contribution.project.assemblies
+            for product in assembly.products
+        ],
+    )
+    for contribution in projects:
+        project = contribution.project
+        ids = [
+            project.id,
+            *(assembly.id for assembly in project.assemblies),
+            *(product.id for assembly in project.assemblies for product in assembly.products),
+        ]
+        if not any(owners.get(_id, set()) - {contribution.organization_id} for _id in ids):
+            continue
+
+        logger.info(f"Project {project.id} shares ids with another organization, it is stored under scoped ids")
+        project.id = scoped_id(contribution.organization_id, project.id)
+        for assembly in project.assemblies:
+            assembly.id = scoped_id(contribution.organization_id, assembly.id)
+            for product in assembly.products:
+                product.id = scoped_id(contribution.organization_id, product.id)
+
+
+async def document_owners(
+    project_ids: list[UUID], assembly_ids: list[UUID], product_ids: list[UUID]
+) -> dict[UUID, set[UUID | None]]:
+    """
+    The organizations of the stored projects, assemblies and products with the given ids. Assemblies and products
+    belong to the organizations of the projects that link to them, found with one query per collection
+    """
+
+    owners = {}
+    async for document in DBProject.get_motor_collection().find({"_id": {"$in": project_ids}}, {"organizationId": 1}):
+        owners.setdefault(document["_id"], set()).add(document.get("organizationId"))
+
+    # The stored assemblies that link to the products, and the projects that link to either
+    products = set(product_ids)
+    product_assemblies = {}
+    async for document in DBAssembly.get_motor_collection().find(
+        {"products.$id": {"$in": product_ids}}, {"products": 1}
+    ):
+        for link in document.get("products", []):
+            if link.id in products:
+                product_assemblies.setdefault(link.id, set()).add(document["_id"])
+
+    assemblies = {*assembly_ids, *(_id for ids in product_assemblies.values() for _id in ids)}
+    assembly_owners = {}
+    async for document in DBProject.get_motor_collection().find(
+        {"assemblies.$id": {"$in": list(assemblies)}}, {"assemblies": 1, "organizationId": 1}
+    ):
+        for link in document.get("assemblies", []):
+            if link.id in assemblies:
+                assembly_owners.setdefault(link.id, set()).add(document.get("organizationId"))
+
+    owners.update({_id: assembly_owners[_id] for _id in assembly_ids if _id in assembly_owners})
+    for _id, ids in product_assemblies.items():
+        owners[_id] = {owner for assembly_id in ids for owner in assembly_owners.get(assembly_id, set())}
+    return owners
+
+
+def flatten_contributions(contributions: list[DBContribution]) -> dict[type[Document], list[Document | dict]]:
+    """
+    Split contributions into the documents of each collection, leaves first, so a link never points to a missing document.
+    Impact data is stored once per content hash and linked from the products.
+    With embedded project storage, a project is a single document with its assemblies and products.
+    Every project gets a summary for the analytics queries.
+    """
+
+    documents = {
+        DBEPD: {},
+        DBTechFlow: {},
+        DBProduct: {},
+        DBAssembly: {},
+        DBProject: {},
+        DBProjectSummary: {},
+        DBContribution: {},
+    }
+    for contribution in contributions:
+        contribution.denormalize_visibility()
+        contribution.index_project_search()
+        project = contribution.project
+        documents[DBContribution][contribution.id] = contribution
+        documents[DBProjectSummary][project.id] = DBProjectSummary.from_project(project)
+        for assembly in project.assemblies:
+            for product in assembly.products:
+                if impact_data := link_impact_data(product):
+                    documents[type(impact_data)][impact_data.id] = impact_data
+
+        if settings.PROJECT_STORAGE == "embedded" and (embedded := embed_project(project)) is not None:
+            documents[DBProject][project.id] = embedded
+            continue
+
+        documents[DBProject][project.id] = project
+        for assembly in project.assemblies:
+            documents[DBAssembly][assembly.id] = assembly
+            for product in assembly.products:
+                documents[DBProduct][product.id] = product
+
+    return {model: list(_documents.values()) for model, _documents in documents.items()}
+
+
+def embed_project(project: DBProject) -> dict | None:
+    """
+    The project as one document, with its assemblies and products embedded in place of their links.
+    Returns None if the document would exceed EMBEDDED_PROJECT_MAX_SIZE, so the project is stored linked instead.
+    """
+
+    data = get_dict(project, to_db=True)
+    data["assemblies"] = [
+        {**get_dict(assembly, to_db=True), "products": [get_dict(product, to_db=True) for product in assembly.products]}
+        for assembly in project.assemblies
+    ]
+
+    size = len(bson.encode(data, codec_options=CODEC_OPTIONS))
+    if size > settings.EMBEDDED_PROJECT_MAX_SIZE:
+        logger.info(f"Project {project.id} is {size} bytes embedded, it is stored linked instead")
+        return None
+    return data
+
+
+async def insert_contributions(contributions: list[DBContribution]) -> list[DBContribution]:
+    """Write a batch of contributions with their projects, assemblies and products with one bulk write per collection"""
+
+    if not contributions:
+        return contributions
+
+    await scope_project_ids(contributions)
+    # Coordinates are resolved once here, so reading a project never geocodes
+    await geocode_locations(
+        [contribution.project.location for contribution in contributions if isinstance(contribution.project, DBProject)]
+    )
+    documents = flatten_contributions(contributions)
+    client = DBContribution.get_motor_collection().database.client
+
+    async with await client.start_session() as session:
+        if await supports_transactions(client):
+            async with session.start_transaction():
+                await write_documents(documents, session)
+        else:
+            await write_documents(documents, session)
+
+    await bump_version()
+    logger.debug(f"Inserted {', '.join(f'{len(docs)} {model.__name__}' for model, docs in documents.items())}")
+    return contributions
+
+
+async def write_documents(
+    documents: dict[type[Document], list[Document | dict]], session: AsyncIOMotorClientSession | None = None
+) -> None:
+    written_at = datetime.datetime.now()
+    for model, _documents in documents.items():
+        if model in CONTENT_ADDRESSED_MODELS:
+            await write_content_addressed(model, _documents, session, written_at)
+            continue
+        if not _documents:
+            continue
+
+        # Projects, assemblies and products keep their LCAx ids within an organization, see scope_project_ids, so an
+        # upload of a known id replaces it. Replacing by id also makes a repeated batch, e.g. of a resumed job, idempotent
+        operations = []
+        for data in map(_to_db, _documents):
+            if model in LINKED_MODELS:
+                data[WRITTEN_AT] = written_at
+            operations.append(ReplaceOne({"_id": data["_id"]}, data, upsert=True))
+        await model.get_motor_collection().bulk_write(operations, ordered=False, session=session)
+
+
+def _to_db(document: Document | dict) -> dict:
+    """Embedded projects are already dumped"""
+
+    return document if isinstance(document, dict) else get_dict(document, to_db=True)
+
+
+async def write_content_addressed(
+    model: type[Document],
+    documents: list[Document],
+    session: AsyncIOMotorClientSession | None = None,
+    written_at: datetime.datetime | None = None,
+) -> int:
+    """
+    Insert the EPDs or TechFlows whose content hash is not stored yet. Returns the number of new documents.
+    The ones that are stored already are marked as written too, as the products about to link to them are not yet.
+    """
+
+    if not documents:
+        return 0
+
+    written_at = written_at or datetime.datetime.now()
+    collection = model.get_motor_collection()
+    existing = set(
+        await collection.distinct("_id", {"_id": {"$in": [document.id for document in documents]}}, session=session)
+    )
+    if existing:
+        await collection.update_many(
+            {"_id": {"$in": list(existing)}}, {"$set": {WRITTEN_AT: written_at}}, session=session
+        )
+    if not (missing := [document for document in documents if document.id not in existing]):
+        return 0
+
+    # A document inserted concurrently has the same content, so an upsert that finds it leaves it as it is
+    operations = [
+        UpdateOne(
+            {"_id": document.id},
+            {"$setOnInsert": _without_id(get_dict(document, to_db=True)), "$set": {WRITTEN_AT: written_at}},
+            upsert=True,
+        )
+        for document in missing
+    ]
+    await collection.bulk_write(operations, ordered=False, session=session)
+    return len(missing)
+
+
+def _without_id(data: dict) -> dict:
+    data.pop("_id", None)
+    return data
+
+
+@alru_cache
+async def supports_transactions(client: AsyncIOMotorClient) -> bool:
+    """Transactions need a replica set or a sharded cluster"""
+
+    hello = await client.admin.command("hello")
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+
+# The levels below a contribution, as (model, link field in the level above, link field to the level below)
+LINK_TREE = [
+    (DBProject, "project", "assemblies"),
+    (DBAssembly, "assemblies", "products"),
+    (DBProduct, "products", "impactData"),
+]
+
+# The documents that link to EPDs and TechFlows, as (model, link field). Embedded projects link from their products
+IMPACT_DATA_PARENTS = [
+    (DBProduct, "impactData"),
+    (DBProject, "assemblies.products.impactData"),
+]
+
+
+async def delete_unreferenced(project_ids: list[UUID]) -> dict[str, int]:
+    """
+    Delete projects and the documents below them that are no longer linked from anywhere.
+    Documents can be shared, e.g. by re-uploads of the same LCAx project, so a document that is still linked is kept.
+    Each level costs a constant number of queries, however many documents are deleted.
+    """
+
+    deleted = {}
+    parent = DBContribution
+    ids = project_ids
+    impact_data = []
+    for model, parent_field, child_field in LINK_TREE:
+        if not (ids := await find_unreferenced(parent, parent_field, ids)):
+            break
+
+        collection = model.get_motor_collection()
+        links = []
+        async for document in collection.find({"_id": {"$in": ids}}, {child_field: 1}):
+            value = document.get(child_field)
+            for link in value if isinstance(value, list) else [value]:
+                if isinstance(link, DBRef):
+                    links.append(link)
+                elif isinstance(link, dict):
+                    # An assembly of an embedded project, whose products link to their impact data
+                    impact_data.extend(
+                        product["impactData"]
+                        for product in link.get("products", [])
+                        if isinstance(product.get("impactData"), DBRef)
+                    )
+        deleted[model.__name__] = (await collection.delete_many({"_id": {"$in": ids}})).deleted_count
+        if model is DBProject:
+            deleted[DBProjectSummary.__name__] = await delete_summaries(ids)
+
+        parent = model
+        ids = [link.id for link in links]
+        if model is DBProduct:
+            impact_data.extend(links)
+
+    # EPDs and TechFlows are shared by content hash, so they are only deleted once no product links to them
+    for model in CONTENT_ADDRESSED_MODELS:
+        collection = model.get_motor_collection()
+        ids = [link.id for link in impact_data if link.collection == collection.name]
+        for parent, field in IMPACT_DATA_PARENTS:
+            ids = await find_unreferenced(parent, field, ids)
+        if ids:
+            deleted[model.__name__] = (await collection.delete_many({"_id": {"$in": ids}})).deleted_count
+
+    logger.debug(f"Deleted unreferenced documents: {deleted}")
+    return deleted
+
+
+async def find_unreferenced(parent: type[Document], field: str, ids: list[UUID]) -> list[UUID]:
+    """The ids that no document of the parent model links to"""
+
+    if not ids:
+        return []
+    referenced = set(await parent.get_motor_collection().distinct(f"{field}.$id", {f"{field}.$id": {"$in": ids}}))
+    return [_id for _id in ids if _id not in referenced]
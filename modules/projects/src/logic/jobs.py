@@ -0,0 +1,210 @@
+import asyncio
+import datetime
+import logging
+from contextlib import suppress
+from uuid import UUID
+
+from beanie import UpdateResponse
+from beanie.operators import In, Inc, Set
+from pydantic import ValidationError
+from pymongo import ASCENDING
+
+from core.config import settings
+from logic.contribution import as_dict
+from logic.ingest import insert_contributions
+from models import (
+    DBContribution,
+    DBContributionJob,
+    DBContributionJobItem,
+    DBProject,
+    InputContribution,
+    SuperTokensUser,
+)
+from models.database.db_model import ContributionJobError, JobStatus
+
+logger = logging.getLogger("main")
+
+# Set when a job is enqueued, so the in-process workers pick it up without waiting for the next poll
+job_enqueued = asyncio.Event()
+
+
+async def enqueue_contributions(contributions: list[InputContribution], user: SuperTokensUser) -> DBContributionJob:
+    job = DBContributionJob(total=len(contributions), user_id=user.id, organization_id=user.organization_id)
+    if not contributions:
+        job.status = JobStatus.COMPLETED
+        job.finished_at = datetime.datetime.now()
+
+    # The items are stored before the job, so a worker never claims a job with missing items
+    items = [
+        DBContributionJobItem(
+            job_id=job.id, index=index, project=as_dict(contribution.project), public=contribution.public
+        )
+        for index, contribution in enumerate(contributions)
+    ]
+    if items:
+        await DBContributionJobItem.insert_many(items)
+    await job.insert()
+    job_enqueued.set()
+
+    logger.debug(f"Enqueued job {job.id} with {job.total} contributions for organization {user.organization_id}")
+    return job
+
+
+async def get_contribution_job(job_id: UUID, user: SuperTokensUser) -> DBContributionJob | None:
+    return await DBContributionJob.find_one(
+        DBContributionJob.id == job_id, DBContributionJob.organization_id == user.organization_id
+    )
+
+
+async def claim_job() -> DBContributionJob | None:
+    """Take the oldest queued job, or a running job whose worker stopped making progress"""
+
+    now = datetime.datetime.now()
+    stale = now - datetime.timedelta(seconds=settings.INGEST_JOB_TIMEOUT)
+    return await DBContributionJob.find_one(
+        {
+            "$or": [
+                {"status": JobStatus.QUEUED.value},
+                {"status": JobStatus.RUNNING.value, "updatedAt": {"$lt": stale}},
+            ]
+        }
+    ).update(
+        Set({DBContributionJob.status: JobStatus.RUNNING, DBContributionJob.updated_at: now}),
+        Inc({DBContributionJob.attempts: 1}),
+        response_type=UpdateResponse.NEW_DOCUMENT,
+        sort=[("createdAt", ASCENDING)],
+    )
+
+
+async def process_job(job: DBContributionJob) -> None:
+    """Write the queued projects of a job in batches and record the progress after every batch"""
+
+    if not job.started_at:
+        await DBContributionJob.find_one(DBContributionJob.id == job.id).update(
+            Set({DBContributionJob.started_at: datetime.datetime.now()})
+        )
+
+    while items := (
+        await DBContributionJobItem.find(DBContributionJobItem.job_id == job.id)
+        .sort((DBContributionJobItem.index, ASCENDING))
+        .limit(settings.UPLOAD_BATCH_SIZE)
+        .to_list()
+    ):
+        contributions = []
+        errors = []
+        for item in items:
+            try:
+                # The id of the item is reused, so a batch that is written again replaces its contributions
+                contribution = DBContribution(
+                    id=item.id,
+                    project=DBProject(**item.project),
+                    user_id=job.user_id,
+                    organization_id=job.organization_id,
+                    public=item.public,
+                )
+                contributions.append(contribution)
+            except ValidationError as error:
+                errors.append(ContributionJobError(index=item.index, message=str(error)))
+
+        try:
+            await insert_contributions(contributions)
+        except Exception as error:
+            logger.error(f"Job {job.id} failed to write a batch: {error}")
+            # The items that failed validation already have their error
+            indexes = {item.id: item.index for item in items}
+            errors.extend(
+                ContributionJobError(index=indexes[contribution.id], message=str(error))
+                for contribution in contributions
+            )
+            contributions = []
+
+        await DBContributionJob.get_motor_collection().update_one(
+            {"_id": job.id},
+            {
+                "$inc": {"processed": len(items), "failed": len(errors)},
+                "$push": {
+                    "errors": {"$each": [error.model_dump() for error in errors]},
+                    "contributions": {"$each": [contribution.id for contribution in contributions]},
+                },
+                "$set": {"updatedAt": datetime.datetime.now()},
+            },
+        )
+        await DBContributionJobItem.find(In(DBContributionJobItem.id, [item.id for item in items])).delete()
+
+    await finish_job(job.id)
+
+
+async def release_job(job: DBContributionJob, message: str) -> None:
+    """
+    Queue a job again after its worker failed, keeping the items it did not process, or fail it once it used
+    INGEST_JOB_MAX_ATTEMPTS
+    """
+
+    if job.attempts >= settings.INGEST_JOB_MAX_ATTEMPTS:
+        await finish_job(job.id, message)
+        return
+
+    await DBContributionJob.find_one(DBContributionJob.id == job.id).update(
+        Set({DBContributionJob.status: JobStatus.QUEUED, DBContributionJob.updated_at: datetime.datetime.now()})
+    )
+    logger.info(f"Job {job.id} queued again after attempt {job.attempts}: {message}")
+
+
+async def finish_job(job_id: UUID, message: str | None = None) -> None:
+    """Record the final status of a job. The items a job failed with are deleted with it, as it is never resumed"""
+
+    await DBContributionJobItem.find(DBContributionJobItem.job_id == job_id).delete()
+    job = await DBContributionJob.get(job_id)
+    if message:
+        job.errors.append(ContributionJobError(index=-1, message=message))
+
+    status = JobStatus.FAILED if message or (job.total and job.failed == job.total) else JobStatus.COMPLETED
+    await DBContributionJob.find_one(DBContributionJob.id == job_id).update(
+        Set(
+            {
+                DBContributionJob.status: status,
+                DBContributionJob.errors: [error.model_dump() for error in job.errors],
+                DBContributionJob.finished_at: datetime.datetime.now(),
+            }
+        )
+    )
+    logger.info(f"Job {job_id} {status.value}: {job.processed} processed, {job.failed} failed")
+
+
+async def run_worker(name: str) -> None:
+    """Process jobs until cancelled"""
+
+    logger.info(f"Contribution worker {name} started")
+    while True:
+        job = None
+        try:
+            job = await claim_job()
+            if job is None:
+                job_enqueued.clear()
+                try:
+                    await asyncio.wait_for(job_enqueued.wait(), settings.INGEST_POLL_INTERVAL)
+                except TimeoutError:
+                    pass
+                continue
+
+            logger.info(f"Contribution worker {name} processing job {job.id}")
+            await process_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.error(f"Contribution worker {name} failed: {error}")
+            if job is not None:
+                # If the database is unreachable this fails too, and the job is resumed once it times out
+                with suppress(Exception):
+                    await release_job(job, str(error))
+            await asyncio.sleep(settings.INGEST_POLL_INTERVAL)
+
+
+def start_workers(count: int = settings.INGEST_WORKERS) -> list[asyncio.Task]:
+    return [asyncio.create_task(run_worker(f"worker-{index}")) for index in range(count)]
+
+
+async def stop_workers(workers: list[asyncio.Task]) -> None:
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
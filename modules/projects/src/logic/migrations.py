@@ -0,0 +1,196 @@
+import logging
+
+from beanie.odm.utils.dump import get_dict
+from pymongo import UpdateOne
+
+from logic.ingest import (
+    CONTENT_ADDRESSED_MODELS,
+    embed_project,
+    find_unreferenced,
+    link_impact_data,
+    write_content_addressed,
+    write_documents,
+)
+from logic.geocodes import backfill_coordinates
+from logic.summaries import summarize_projects
+from models import DBAssembly, DBContribution, DBProduct, DBProject
+from models.search import SEARCH_FIELDS, SEARCH_TERMS_FIELD, search_terms
+
+logger = logging.getLogger("main")
+
+
+async def denormalize_project_visibility(batch_size: int = 1000) -> int:
+    """Copy organization, visibility and upload time from every contribution onto its project"""
+
+    contributions = DBContribution.get_motor_collection()
+    projects = DBProject.get_motor_collection()
+
+    updated = 0
+    operations = []
+    async for contribution in contributions.find({}, {"project": 1, "organizationId": 1, "public": 1, "uploadedAt": 1}):
+        if not contribution.get("project"):
+            continue
+
+        operations.append(
+            UpdateOne(
+                {"_id": contribution["project"].id},
+                {
+                    "$set": {
+                        "organizationId": contribution.get("organizationId"),
+                        "public": contribution.get("public", False),
+                        "uploadedAt": contribution.get("uploadedAt"),
+                    }
+                },
+            )
+        )
+        if len(operations) >= batch_size:
+            updated += (await projects.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+
+    if operations:
+        updated += (await projects.bulk_write(operations, ordered=False)).modified_count
+
+    logger.info(f"Denormalized visibility onto {updated} projects")
+    return updated
+
+
+async def link_embedded_impact_data(batch_size: int = 1000) -> int:
+    """Move the impact data embedded in products into content addressed EPDs and TechFlows"""
+
+    products = DBProduct.get_motor_collection()
+
+    linked = 0
+    batch = []
+    async for product in DBProduct.find({"impactData": {"$ne": None}, "impactData.$id": {"$exists": False}}):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            linked += await _link_products(products, batch)
+            batch = []
+
+    if batch:
+        linked += await _link_products(products, batch)
+
+    logger.info(f"Linked the impact data of {linked} products")
+    return linked
+
+
+async def _link_products(products, batch: list[DBProduct]) -> int:
+    impact_data = {model: {} for model in CONTENT_ADDRESSED_MODELS}
+    operations = []
+    for product in batch:
+        if document := link_impact_data(product):
+            impact_data[type(document)][document.id] = document
+            operations.append(
+                UpdateOne({"_id": product.id}, {"$set": {"impactData": get_dict(product, to_db=True)["impactData"]}})
+            )
+
+    # The linked documents are written before the products link to them
+    for model, documents in impact_data.items():
+        await write_content_addressed(model, list(documents.values()))
+    if operations:
+        await products.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def embed_projects(batch_size: int = 100) -> int:
+    """Store linked projects as single documents, for PROJECT_STORAGE=embedded. Projects above the size limit stay linked"""
+
+    embedded = 0
+    batch = []
+    async for project in DBProject.find({"assemblies.$id": {"$exists": True}}, fetch_links=True):
+        batch.append(project)
+        if len(batch) >= batch_size:
+            embedded += await _embed_projects(batch)
+            batch = []
+
+    if batch:
+        embedded += await _embed_projects(batch)
+
+    logger.info(f"Embedded {embedded} projects")
+    return embedded
+
+
+async def _embed_projects(batch: list[DBProject]) -> int:
+    documents = {model: {} for model in (*CONTENT_ADDRESSED_MODELS, DBProject)}
+    for project in batch:
+        for assembly in project.assemblies:
+            for product in assembly.products:
+                if impact_data := link_impact_data(product):
+                    documents[type(impact_data)][impact_data.id] = impact_data
+        if (data := embed_project(project)) is not None:
+            documents[DBProject][project.id] = data
+
+    await write_documents({model: list(_documents.values()) for model, _documents in documents.items()})
+
+    # The assemblies and products of the embedded projects are deleted, unless another project still links to them
+    assembly_ids = [assembly.id for project in batch for assembly in project.assemblies]
+    product_ids = [product.id for project in batch for assembly in project.assemblies for product in assembly.products]
+    if ids := await find_unreferenced(DBProject, "assemblies", assembly_ids):
+        await DBAssembly.get_motor_collection().delete_many({"_id": {"$in": ids}})
+    if ids := await find_unreferenced(DBAssembly, "products", product_ids):
+        await DBProduct.get_motor_collection().delete_many({"_id": {"$in": ids}})
+    return len(documents[DBProject])
+
+
+async def link_projects(batch_size: int = 100) -> int:
+    """Split embedded projects over the project, assembly and product collections, for PROJECT_STORAGE=linked"""
+
+    linked = 0
+    batch = []
+    async for project in DBProject.find({"assemblies._id": {"$exists": True}}):
+        batch.append(project)
+        if len(batch) >= batch_size:
+            linked += await _link_projects(batch)
+            batch = []
+
+    if batch:
+        linked += await _link_projects(batch)
+
+    logger.info(f"Linked {linked} projects")
+    return linked
+
+
+async def _link_projects(batch: list[DBProject]) -> int:
+    # The embedded assemblies and products are parsed as documents, so the projects are dumped with links to them
+    documents = {DBProduct: {}, DBAssembly: {}, DBProject: {}}
+    for project in batch:
+        documents[DBProject][project.id] = project
+        for assembly in project.assemblies:
+            documents[DBAssembly][assembly.id] = assembly
+            for product in assembly.products:
+                documents[DBProduct][product.id] = product
+
+    await write_documents({model: list(_documents.values()) for model, _documents in documents.items()})
+    return len(batch)
+
+
+async def index_project_search(batch_size: int = 1000) -> int:
+    """Write the search terms of every project, for the contains filter on name, description and owner"""
+
+    projects = DBProject.get_motor_collection()
+
+    indexed = 0
+    operations = []
+    async for project in projects.find({}, {field: 1 for field in SEARCH_FIELDS}):
+        terms = search_terms({field: project.get(field) for field in SEARCH_FIELDS})
+        operations.append(UpdateOne({"_id": project["_id"]}, {"$set": {SEARCH_TERMS_FIELD: terms}}))
+        if len(operations) >= batch_size:
+            indexed += (await projects.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+
+    if operations:
+        indexed += (await projects.bulk_write(operations, ordered=False)).modified_count
+
+    logger.info(f"Indexed the search terms of {indexed} projects")
+    return indexed
+
+
+MIGRATIONS = {
+    "denormalize-project-visibility": denormalize_project_visibility,
+    "link-embedded-impact-data": link_embedded_impact_data,
+    "embed-projects": embed_projects,
+    "link-projects": link_projects,
+    "summarize-projects": summarize_projects,
+    "index-project-search": index_project_search,
+    "geocode-projects": backfill_coordinates,
+}
@@ -1,6 +1,66 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+
+import brotli
+
 from models.openbdf import GraphQLProject
 from .json_schema import get_schema
 
 
-async def serialize_openbdf_schema() -> dict:
+@dataclass(frozen=True)
+class SchemaDocument:
+    """The serialized schema, keyed by content coding, with a strong ETag per coding"""
+
+    bodies: dict[str, bytes]
+    etags: dict[str, str]
+
+
+@lru_cache(maxsize=1)
+def _openbdf_schema() -> dict:
     return get_schema(GraphQLProject)
+
+
+@lru_cache(maxsize=1)
+def get_openbdf_document() -> SchemaDocument:
+    """
+    The OpenBDF schema, reflected from GraphQLProject once per process and kept serialized and compressed, as it only
+    changes on deploy.
+    """
+
+    body = json.dumps(_openbdf_schema(), separators=(",", ":")).encode()
+    bodies = {
+        "identity": body,
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        "br": brotli.compress(body, quality=11),
+    }
+
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    etags = {coding: f'"{digest}"' if coding == "identity" else f'"{digest}-{coding}"' for coding in bodies}
+    return SchemaDocument(bodies=bodies, etags=etags)
+
+
+def select_encoding(accept_encoding: str | None, available: dict) -> str:
+    """The smallest available content coding the client accepts, brotli before gzip, else identity"""
+
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, parameters = part.strip().partition(";")
+        quality = 1.0
+        if parameters.strip().startswith("q="):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+async def serialize_openbdf_schema() -> dict:
+    return _openbdf_schema()
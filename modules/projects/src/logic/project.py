@@ -2,6 +2,7 @@ import logging
 from uuid import UUID
 
 from beanie.exceptions import DocumentNotFound, CollectionWasNotInitialized, RevisionIdWasChanged
+from beanie.odm.operators.find.comparison import In
 from beanie.odm.operators.find.logical import Or
 
 from core.exceptions import (
@@ -9,7 +10,19 @@ from core.exceptions import (
     DatabaseError,
     DatabaseConfigurationError,
 )
-from models import DBProject, FilterBy, SortBy, filter_model_query, sort_model_query
+from strawberry import UNSET
+
+from models import (
+    DBProject,
+    FilterBy,
+    SortBy,
+    filter_model_query,
+    sort_model_query,
+    count_model_query,
+    keyset_model_query,
+)
+from models.sort_filter import get_sort_key, search_ranking
+from models.selection import construct_project_projection
 
 logger = logging.getLogger("main")
 
@@ -20,34 +33,57 @@ async def get_projects(
     sort_by: SortBy | None = None,
     limit: int | None = None,
     offset: int = 0,
+    after: str | None = UNSET,
+    selection: dict | None = None,
 ):
     try:
         # Initialize base query with organization filter
         base_query = DBProject.find(
-            Or(DBProject.contribution.organizationId == organization_id, DBProject.contribution.public == True)  # noqa: E712
+            Or(DBProject.organization_id == organization_id, DBProject.public == True)  # noqa: E712
         )
 
         # Apply filters if any
         if filter_by:
             base_query = filter_model_query(DBProject, filter_by, base_query)
 
-        # Always fetch related links
-        base_query = base_query.find({}, fetch_links=True)
-
-        # Apply sorting if any
-        if sort_by:
+        # Apply sorting if any. In cursor mode the sort is keyed on (sort field, _id) and continues after the cursor
+        if after is not UNSET:
+            base_query = keyset_model_query(DBProject, sort_by, after, base_query)
+        elif sort_by:
             base_query = sort_model_query(DBProject, sort_by, base_query)
 
+        # Without a sort, the matches of a search are ranked, which orders the page before it is cut
+        ranking = search_ranking(DBProject, filter_by) if not sort_by and after is UNSET else []
+
         # Apply limit if specified
-        if limit is not None:
+        if limit is not None and not ranking:
             base_query = base_query.limit(limit)
 
         # Apply offset if specified
-        if offset:
+        if offset and after is UNSET and not ranking:
             base_query = base_query.skip(offset)
 
-        # Execute query
-        projects = await base_query.to_list()
+        ids = None
+        if ranking:
+            # Rank the search terms of the matches and fetch only the documents of the page
+            page = [
+                *ranking,
+                {"$skip": offset},
+                *([{"$limit": limit}] if limit is not None else []),
+                {"$project": {"_id": 1}},
+            ]
+            ids = [document["_id"] for document in await base_query.aggregate(page, allowDiskUse=True).to_list()]
+            base_query = DBProject.find(In(DBProject.id, ids))
+
+        # Match, sort and paginate on the indexed project fields first and only fetch the selected fields of the page
+        sort_field = get_sort_key(sort_by)[0].split(".")[0]
+        projects = await DBProject.aggregate(
+            [*base_query.build_aggregation_pipeline(), *construct_project_projection(selection, keep=(sort_field,))],
+            projection_model=DBProject,
+        ).to_list()
+        if ids is not None:
+            order = {_id: index for index, _id in enumerate(ids)}
+            projects.sort(key=lambda project: order[project.id])
 
         logger.debug(f"Found {len(projects)} projects for organization {organization_id}")
         return projects
@@ -58,3 +94,19 @@ async def get_projects(
         raise DatabaseConfigurationError("Database collection was not properly initialized")
     except RevisionIdWasChanged:
         raise DatabaseError("Database revision ID was changed")
+
+
+async def count_projects(organization_id: UUID, filter_by: FilterBy | None = None) -> dict[str, int]:
+    try:
+        query = DBProject.find(Or(DBProject.organization_id == organization_id, DBProject.public == True))  # noqa: E712
+
+        if filter_by:
+            query = filter_model_query(DBProject, filter_by, query)
+
+        counts = await count_model_query(query)
+
+        logger.debug(f"Counted {counts} projects for organization {organization_id}")
+        return counts
+
+    except CollectionWasNotInitialized:
+        raise DatabaseConfigurationError("Database collection was not properly initialized")
@@ -0,0 +1,39 @@
+import logging
+from uuid import UUID
+
+from beanie.odm.utils.dump import get_dict
+from pymongo import ReplaceOne
+
+from models import DBProject, DBProjectSummary
+
+logger = logging.getLogger("main")
+
+
+async def delete_summaries(project_ids: list[UUID]) -> int:
+    if not project_ids:
+        return 0
+    return (await DBProjectSummary.get_motor_collection().delete_many({"_id": {"$in": project_ids}})).deleted_count
+
+
+async def summarize_projects(batch_size: int = 1000) -> int:
+    """Rebuild the summaries of all projects, e.g. after adding a summary field"""
+
+    summaries = DBProjectSummary.get_motor_collection()
+
+    summarized = 0
+    operations = []
+    # The assemblies are not needed for a summary, so they are not read
+    async for data in DBProject.get_motor_collection().find({}, {"assemblies": 0}):
+        summary = DBProjectSummary.from_project(DBProject.model_validate({**data, "assemblies": []}))
+        operations.append(ReplaceOne({"_id": summary.id}, get_dict(summary, to_db=True), upsert=True))
+        if len(operations) >= batch_size:
+            await summaries.bulk_write(operations, ordered=False)
+            summarized += len(operations)
+            operations = []
+
+    if operations:
+        await summaries.bulk_write(operations, ordered=False)
+        summarized += len(operations)
+
+    logger.info(f"Summarized {summarized} projects")
+    return summarized
@@ -0,0 +1,145 @@
+import codecs
+import json
+import logging
+import zlib
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import UUID
+
+from pydantic import ValidationError
+
+from core.config import settings
+from core.exceptions import InvalidOperationError, PartialUploadError
+from logic.ingest import insert_contributions
+from models import DBContribution, DBProject, SuperTokensUser
+
+logger = logging.getLogger("main")
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Separators between the documents of a JSON array or of NDJSON lines
+SEPARATORS = " \t\r\n,[]"
+
+
+async def decompress(chunks: AsyncIterator[bytes], gzipped: bool = False) -> AsyncIterator[bytes]:
+    """Inflate a gzip stream chunk by chunk. Bodies are sniffed for the gzip header when no encoding is given"""
+
+    decompressor = None
+    first = True
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if first and (gzipped or chunk.startswith(GZIP_MAGIC)):
+            # 16 + MAX_WBITS expects a gzip header and trailer
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        first = False
+        if decompressor is None:
+            yield chunk
+            continue
+
+        try:
+            while chunk:
+                # Bound the output of each step, so a highly compressed body is inflated gradually
+                yield decompressor.decompress(chunk, settings.UPLOAD_CHUNK_SIZE)
+                chunk = decompressor.unconsumed_tail
+        except zlib.error as error:
+            raise InvalidOperationError(message=f"Invalid gzip body: {error}", name="Upload")
+
+    if decompressor is not None:
+        yield decompressor.flush()
+
+
+async def iter_documents(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict[str, Any]]:
+    """
+    Parse a stream of JSON documents incrementally. The stream can be a single document, a JSON array or NDJSON.
+    Only the document being parsed is buffered. Parsing is retried once the buffer has doubled, so large documents
+    split over many chunks are not parsed over and over again.
+    """
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    attempt_size = 0
+
+    async for chunk in chunks:
+        try:
+            buffer += text_decoder.decode(chunk)
+        except UnicodeDecodeError as error:
+            raise InvalidOperationError(message=f"Invalid UTF-8: {error}", name="Upload")
+
+        while True:
+            buffer = buffer.lstrip(SEPARATORS)
+            if not buffer or len(buffer) < attempt_size:
+                break
+            try:
+                document, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if len(buffer) > settings.UPLOAD_MAX_DOCUMENT_SIZE:
+                    raise InvalidOperationError(
+                        message=f"Document exceeds {settings.UPLOAD_MAX_DOCUMENT_SIZE} bytes or is invalid JSON",
+                        name="Upload",
+                    )
+                attempt_size = 2 * len(buffer)
+                break
+
+            attempt_size = 0
+            buffer = buffer[end:]
+            yield document
+
+    # The rest of the stream can hold several documents that were waiting for the buffer to double
+    try:
+        buffer += text_decoder.decode(b"", final=True)
+    except UnicodeDecodeError as error:
+        raise InvalidOperationError(message=f"Invalid UTF-8: {error}", name="Upload")
+    while buffer := buffer.lstrip(SEPARATORS):
+        try:
+            document, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as error:
+            raise InvalidOperationError(message=f"Invalid JSON: {error}", name="Upload")
+        buffer = buffer[end:]
+        yield document
+
+
+async def upload_contributions(
+    chunks: AsyncIterator[bytes], user: SuperTokensUser, public: bool = False, gzipped: bool = False
+) -> list[UUID]:
+    """
+    Validate each uploaded LCAx project and write them as contributions in batches.
+    The batches before an invalid project are kept, and the error lists their contributions, so a client retries the
+    upload from the first project that was not stored.
+    """
+
+    if not user.organization_id:
+        raise InvalidOperationError(message="User is not part of an organization", name="Upload")
+
+    contribution_ids = []
+    batch = []
+    index = 0
+    try:
+        async for document in iter_documents(decompress(chunks, gzipped)):
+            try:
+                project = DBProject.model_validate(document)
+            except ValidationError as error:
+                raise InvalidOperationError(
+                    message=f"Project {index} is not a valid LCAx project: {error}", name="Upload"
+                )
+            index += 1
+
+            batch.append(
+                DBContribution(project=project, user_id=user.id, organization_id=user.organization_id, public=public)
+            )
+            if len(batch) >= settings.UPLOAD_BATCH_SIZE:
+                contribution_ids.extend(contribution.id for contribution in await insert_contributions(batch))
+                batch = []
+    except InvalidOperationError as error:
+        if not contribution_ids:
+            raise
+        raise PartialUploadError(
+            message=f"{error.message}. The first {len(contribution_ids)} projects were stored",
+            name="Upload",
+            contributions=contribution_ids,
+        ) from error
+
+    contribution_ids.extend(contribution.id for contribution in await insert_contributions(batch))
+    logger.info(f"Uploaded {len(contribution_ids)} contributions for organization {user.organization_id}")
+    return contribution_ids
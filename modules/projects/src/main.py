@@ -3,7 +3,6 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 import yaml
-from beanie import init_beanie
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -12,10 +11,14 @@ from supertokens_python.recipe.session.exceptions import UnauthorisedError, TryR
 
 from core.auth import supertokens_init
 from core.config import settings
-from core.connection import get_database
-from core.exceptions import MicroServiceConnectionError
-from models import DBAssembly, DBProduct, DBEPD, DBTechFlow, DBProject, DBContribution
+from core.connection import init_documents
+from core.exceptions import MicroServiceConnectionError, InvalidOperationError, PartialUploadError
+from logic.gc import start_collector, stop_collector
+from logic.geocodes import start_backfill, stop_backfill
+from logic.jobs import start_workers, stop_workers
+from logic.openbdf import get_openbdf_document
 from routes import graphql_app
+from routes.contribution import contribution_router
 from routes.openbdf import openbdf_router
 
 log_config = yaml.safe_load((Path(__file__).parent / "logging.yaml").read_text())
@@ -27,11 +30,16 @@ logger = logging.getLogger("main")
 
 @asynccontextmanager
 async def lifespan(*args):
-    db = get_database()
-    await init_beanie(
-        database=db, document_models=[DBAssembly, DBProduct, DBEPD, DBTechFlow, DBProject, DBContribution]
-    )
+    await init_documents()
+    # Reflect and compress the OpenBDF schema before the first request asks for it
+    get_openbdf_document()
+    workers = start_workers(settings.INGEST_WORKERS)
+    collector = start_collector(settings.GC_INTERVAL)
+    backfill = start_backfill(settings.GEOCODE_BACKFILL)
     yield
+    await stop_backfill(backfill)
+    await stop_collector(collector)
+    await stop_workers(workers)
 
 
 app = FastAPI(title=settings.SERVER_NAME, openapi_url=f"{settings.API_STR}/openapi.json", lifespan=lifespan)
@@ -50,6 +58,7 @@ if settings.BACKEND_CORS_ORIGINS:
 
 app.include_router(graphql_app, prefix=settings.API_STR)
 app.include_router(openbdf_router, prefix=settings.API_STR)
+app.include_router(contribution_router, prefix=settings.API_STR)
 
 
 @app.exception_handler(UnauthorisedError)
@@ -100,3 +109,27 @@ async def microservice_exception_handler(request: Request, exc: MicroServiceConn
         status_code=501,
         content={"data": exc.message},
     )
+
+
+@app.exception_handler(InvalidOperationError)
+async def invalid_operation_exception_handler(request: Request, exc: InvalidOperationError):
+    logger.error(exc)
+
+    return JSONResponse(
+        status_code=400,
+        content={"data": exc.message},
+    )
+
+
+@app.exception_handler(PartialUploadError)
+async def partial_upload_exception_handler(request: Request, exc: PartialUploadError):
+    logger.error(exc)
+
+    return JSONResponse(
+        status_code=400,
+        content={
+            "data": exc.message,
+            "count": len(exc.contributions),
+            "contributions": [str(_id) for _id in exc.contributions],
+        },
+    )
@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import logging
+
+from core.connection import init_documents
+from logic.cache import bump_version
+from logic.migrations import MIGRATIONS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("main")
+
+
+async def main(name: str) -> None:
+    await init_documents()
+
+    logger.info(f"Running migration {name}")
+    await MIGRATIONS[name]()
+    # Cached results can be stale after a migration
+    await bump_version()
+    logger.info(f"Migration {name} finished")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a one-shot data migration on the projects database")
+    parser.add_argument("name", choices=MIGRATIONS.keys())
+    args = parser.parse_args()
+
+    asyncio.run(main(args.name))
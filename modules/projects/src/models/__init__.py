@@ -1,8 +1,31 @@
+from .cluster import GraphQLProjectCluster, InputBoundingBox
 from .contribution import GraphQLContribution, InputContribution, GraphQLUser, UpdateContribution
-from .database.db_model import DBContribution, DBProject, DBAssembly, DBProduct, DBEPD, DBTechFlow
+from .database.db_model import (
+    DBContribution,
+    DBProject,
+    DBAssembly,
+    DBProduct,
+    DBEPD,
+    DBTechFlow,
+    DBProjectSummary,
+    DBDataVersion,
+    DBGeocode,
+    DBLocation,
+    DBContributionJob,
+    DBContributionJobItem,
+)
+from .job import GraphQLContributionJob
 from .openbdf import GraphQLProject, GraphQLInputProject
 from .response import GraphQLResponse
-from .sort_filter import sort_model_query, filter_model_query, FilterBy, SortBy
+from .sort_filter import (
+    sort_model_query,
+    filter_model_query,
+    count_model_query,
+    keyset_model_query,
+    encode_cursor,
+    FilterBy,
+    SortBy,
+)
 from .supertokens import SuperTokensUser
 
 __all__ = [
@@ -11,6 +34,15 @@ __all__ = [
     DBProduct,
     DBEPD,
     DBTechFlow,
+    DBProjectSummary,
+    DBDataVersion,
+    DBGeocode,
+    DBLocation,
+    DBContributionJob,
+    DBContributionJobItem,
+    GraphQLContributionJob,
+    GraphQLProjectCluster,
+    InputBoundingBox,
     GraphQLProject,
     GraphQLInputProject,
     DBContribution,
@@ -22,6 +54,9 @@ __all__ = [
     GraphQLResponse,
     sort_model_query,
     filter_model_query,
+    count_model_query,
+    keyset_model_query,
+    encode_cursor,
     FilterBy,
     SortBy,
 ]
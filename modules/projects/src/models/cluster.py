@@ -0,0 +1,31 @@
+import datetime
+from uuid import UUID
+
+import strawberry
+
+
+@strawberry.input
+class InputBoundingBox:
+    west: float
+    south: float
+    east: float
+    north: float
+
+
+@strawberry.type
+class ClusterBounds:
+    west: float
+    south: float
+    east: float
+    north: float
+
+
+@strawberry.type(name="ProjectCluster")
+class GraphQLProjectCluster:
+    count: int
+    public_count: int
+    latitude: float = strawberry.field(description="Mean latitude of the projects in the cluster")
+    longitude: float = strawberry.field(description="Mean longitude of the projects in the cluster")
+    bounds: ClusterBounds
+    latest_upload: datetime.datetime | None
+    project_id: UUID | None = strawberry.field(description="The project of a cluster of one, shown as a marker")
@@ -1,7 +1,7 @@
 from uuid import UUID
 
 import strawberry
-from strawberry import UNSET
+from strawberry import Info, UNSET
 
 from .database.db_model import ContributionBase
 from .openbdf import GraphQLProject, GraphQLInputProject
@@ -12,6 +12,12 @@ async def get_user_info(root: "GraphQLContribution") -> "GraphQLUser":
     return GraphQLUser(id=root.user_id)
 
 
+async def get_project(root: "GraphQLContribution", info: Info) -> GraphQLProject:
+    from models.database.loaders import resolve_link
+
+    return await resolve_link(info, "projects", root.project)
+
+
 @strawberry.federation.type(name="User", keys=["id"])
 class GraphQLUser:
     id: UUID
@@ -19,7 +25,7 @@ class GraphQLUser:
 
 @strawberry.experimental.pydantic.type(model=ContributionBase, all_fields=True, name="Contribution")
 class GraphQLContribution:
-    project: GraphQLProject
+    project: GraphQLProject = strawberry.field(resolver=get_project)
     user: GraphQLUser = strawberry.field(resolver=get_user_info)
 
 
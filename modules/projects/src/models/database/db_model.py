@@ -1,14 +1,19 @@
 import datetime
-from typing import Optional, Union
+from enum import Enum
+from typing import Any, Literal, Optional, Union
 from uuid import UUID, uuid4
 
-from beanie import Document, Link, BackLink
+from beanie import Document, Link, Insert, after_event, before_event
 from lcax import Assembly as LCAxAssembly
 from lcax import EPD as LCAxEPD
+from lcax import Location as LCAxLocation
 from lcax import Product as LCAxProduct
 from lcax import Project as LCAxProject
 from lcax import TechFlow as LCAxTechFlow
 from pydantic import Field, BaseModel
+from pymongo import IndexModel, ASCENDING, DESCENDING, GEOSPHERE
+
+from models.search import SEARCH_FIELDS, search_terms
 
 
 class ContributionBase(BaseModel):
@@ -22,6 +27,48 @@ class ContributionBase(BaseModel):
 class DBContribution(ContributionBase, Document):
     project: Link["DBProject"]
 
+    class Settings:
+        # Visibility is matched on every query and the default sort is the upload time
+        indexes = [
+            IndexModel([("organizationId", ASCENDING), ("uploadedAt", DESCENDING)], name="organization_uploaded_at"),
+            IndexModel([("public", ASCENDING), ("uploadedAt", DESCENDING)], name="public_uploaded_at"),
+            IndexModel([("userId", ASCENDING)], name="user"),
+            # Reverse link lookups, e.g. to find the projects no contribution links to anymore
+            IndexModel([("project.$id", ASCENDING)], name="project_link"),
+        ]
+
+    @before_event(Insert)
+    def denormalize_visibility(self):
+        """Copy the visibility fields onto a project that is inserted together with its contribution"""
+
+        if isinstance(self.project, DBProject):
+            self.project.organization_id = self.organization_id
+            self.project.public = self.public
+            self.project.uploaded_at = self.uploaded_at
+
+    @before_event(Insert)
+    def index_project_search(self):
+        """Index the searchable fields of a project that is inserted together with its contribution"""
+
+        if isinstance(self.project, DBProject):
+            self.project.index_search_terms()
+
+    @before_event(Insert)
+    async def geocode_project(self):
+        """Resolve the coordinates of a project that is inserted together with its contribution"""
+
+        from models.database.geocodes import geocode_locations
+
+        if isinstance(self.project, DBProject):
+            await geocode_locations([self.project.location])
+
+    @after_event(Insert)
+    async def summarize_project(self):
+        """Write the summary of a project that is inserted together with its contribution"""
+
+        if isinstance(self.project, DBProject):
+            await DBProjectSummary.from_project(self.project).save()
+
 
 class DBEPD(LCAxEPD, Document):
     id: UUID
@@ -35,13 +82,239 @@ class DBProduct(LCAxProduct, Document):
     id: UUID
     impact_data: Union[Optional[Link[DBEPD]] | Optional[Link[DBTechFlow]]] = Field(..., alias="impactData")
 
+    class Settings:
+        indexes = [IndexModel([("impactData.$id", ASCENDING)], name="impact_data_link")]
+
 
 class DBAssembly(LCAxAssembly, Document):
     id: UUID
     products: list[Link[DBProduct]]
 
+    class Settings:
+        indexes = [IndexModel([("products.$id", ASCENDING)], name="products_link")]
+
+
+class LocationCoordinates(BaseModel):
+    latitude: float
+    longitude: float
+    # The place the coordinates are of. Unknown places are at 0, 0
+    precision: Literal["city", "country", "unknown"]
+
+
+class GeoPoint(BaseModel):
+    """A GeoJSON point, [longitude, latitude], for the 2dsphere index of the map"""
+
+    type: Literal["Point"] = "Point"
+    coordinates: tuple[float, float]
+
+
+class DBLocation(LCAxLocation):
+    # Resolved once, when the project is stored. Locations of unknown places have no point
+    coordinates: LocationCoordinates | None = None
+    point: GeoPoint | None = None
+
+
+class DBGeocode(Document):
+    """The coordinates of a place, shared by the projects in it. The id is the country code and folded city name"""
+
+    id: str
+    country: str
+    city: str | None = None
+    latitude: float
+    longitude: float
+    precision: Literal["city", "country", "unknown"]
+
+    class Settings:
+        name = "geocodes"
+
 
 class DBProject(LCAxProject, Document):
     id: UUID
     assemblies: list[Link[DBAssembly]]
-    contribution: BackLink[DBContribution] = Field(original_field="project")
+    location: DBLocation
+
+    # Denormalized from the owning DBContribution, so visibility can be matched without a $lookup
+    organization_id: UUID | None = Field(default=None, alias="organizationId")
+    public: bool = Field(default=False)
+    uploaded_at: datetime.datetime | None = Field(default=None, alias="uploadedAt")
+    # Folded word prefixes of the searchable fields, see models.search
+    search_terms: list[str] = Field(default_factory=list, alias="searchTerms")
+
+    def index_search_terms(self):
+        self.search_terms = search_terms({field: getattr(self, field) for field in SEARCH_FIELDS})
+
+    class Settings:
+        indexes = [
+            IndexModel([("organizationId", ASCENDING), ("uploadedAt", DESCENDING)], name="organization_uploaded_at"),
+            IndexModel([("public", ASCENDING), ("uploadedAt", DESCENDING)], name="public_uploaded_at"),
+            # The filters of filter_model_query, behind the public branch of the visibility match
+            IndexModel(
+                [("public", ASCENDING), ("location.country", ASCENDING), ("uploadedAt", DESCENDING)],
+                name="public_country_uploaded_at",
+            ),
+            IndexModel(
+                [("public", ASCENDING), ("projectInfo.buildingType", ASCENDING), ("uploadedAt", DESCENDING)],
+                name="public_building_type_uploaded_at",
+            ),
+            IndexModel(
+                [("public", ASCENDING), ("projectPhase", ASCENDING), ("uploadedAt", DESCENDING)],
+                name="public_project_phase_uploaded_at",
+            ),
+            IndexModel([("lifeCycleStages", ASCENDING)], name="life_cycle_stages"),
+            IndexModel([("impactCategories", ASCENDING)], name="impact_categories"),
+            IndexModel([("name", ASCENDING)], name="name"),
+            # Word prefixes of the name, description and owner, that the contains filter matches on
+            IndexModel([("searchTerms", ASCENDING)], name="search_terms"),
+            IndexModel([("location.point", GEOSPHERE)], name="location_point"),
+            IndexModel([("assemblies.$id", ASCENDING)], name="assemblies_link"),
+            # Impact data links of the products of embedded projects
+            IndexModel(
+                [("assemblies.products.impactData.$id", ASCENDING)], name="embedded_impact_data_link", sparse=True
+            ),
+        ]
+
+
+class SummaryLocation(BaseModel):
+    country: str | None = None
+    city: str | None = None
+    coordinates: LocationCoordinates | None = None
+
+
+class SummaryArea(BaseModel):
+    value: float
+    unit: str | None = None
+
+
+class SummaryProjectInfo(BaseModel):
+    type: str | None = None
+    building_type: str | None = Field(default=None, alias="buildingType")
+    building_typology: list[str] | None = Field(default=None, alias="buildingTypology")
+    gross_floor_area: SummaryArea | None = Field(default=None, alias="grossFloorArea")
+
+
+# The project fields that are copied onto its summary as they are
+SUMMARY_FIELDS = {
+    "organization_id",
+    "public",
+    "uploaded_at",
+    "name",
+    "reference_study_period",
+    "location",
+    "project_info",
+    "life_cycle_stages",
+    "impact_categories",
+}
+
+
+class DBProjectSummary(Document):
+    """
+    The fields of a project that analytics group and aggregate on, keyed by the project id.
+    The fields keep the paths they have in a project, e.g. location.country or results.gwp.a1a3.
+    """
+
+    id: UUID
+    organization_id: UUID | None = Field(default=None, alias="organizationId")
+    public: bool = Field(default=False)
+    uploaded_at: datetime.datetime | None = Field(default=None, alias="uploadedAt")
+    name: str | None = None
+    reference_study_period: int | None = Field(default=None, alias="referenceStudyPeriod")
+    location: SummaryLocation = Field(default_factory=SummaryLocation)
+    project_info: SummaryProjectInfo | None = Field(default=None, alias="projectInfo")
+    life_cycle_stages: list[str] = Field(default_factory=list, alias="lifeCycleStages")
+    impact_categories: list[str] = Field(default_factory=list, alias="impactCategories")
+    # Totals per impact category and life cycle stage, and the totals per m² gross floor area
+    results: dict[str, dict[str, float]] = Field(default_factory=dict)
+    intensities: dict[str, dict[str, float]] = Field(default_factory=dict)
+
+    @classmethod
+    def from_project(cls, project: DBProject) -> "DBProjectSummary":
+        """The summary of a project with its result totals and the totals per m² gross floor area"""
+
+        data = project.model_dump(mode="json", by_alias=True, include=SUMMARY_FIELDS)
+        summary = cls.model_validate({**data, "id": project.id})
+
+        summary.results = {
+            category: {stage: float(value) for stage, value in stages.items() if isinstance(value, (int, float))}
+            for category, stages in (project.results or {}).items()
+            if isinstance(stages, dict)
+        }
+
+        area = summary.project_info.gross_floor_area if summary.project_info else None
+        if area and area.value > 0 and area.unit in (None, "m2"):
+            summary.intensities = {
+                category: {stage: value / area.value for stage, value in stages.items()}
+                for category, stages in summary.results.items()
+            }
+        return summary
+
+    class Settings:
+        name = "project_summaries"
+        indexes = [
+            IndexModel([("organizationId", ASCENDING)], name="organization"),
+            IndexModel([("public", ASCENDING)], name="public"),
+        ]
+
+
+class DBDataVersion(Document):
+    """A counter per dataset, incremented on every write, that cached results are checked against"""
+
+    id: str
+    version: int = 0
+
+    class Settings:
+        name = "versions"
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ContributionJobError(BaseModel):
+    index: int
+    message: str
+
+
+class ContributionJobBase(BaseModel):
+    id: UUID = Field(default_factory=uuid4)
+    status: JobStatus = JobStatus.QUEUED
+    total: int
+    processed: int = 0
+    failed: int = 0
+    errors: list[ContributionJobError] = Field(default_factory=list)
+    contributions: list[UUID] = Field(default_factory=list)
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now, alias="createdAt")
+    started_at: datetime.datetime | None = Field(default=None, alias="startedAt")
+    updated_at: datetime.datetime | None = Field(default=None, alias="updatedAt")
+    finished_at: datetime.datetime | None = Field(default=None, alias="finishedAt")
+
+
+class DBContributionJob(ContributionJobBase, Document):
+    user_id: UUID = Field(alias="userId")
+    organization_id: UUID = Field(alias="organizationId")
+    # The times a worker claimed the job, so a job that keeps failing is given up after INGEST_JOB_MAX_ATTEMPTS
+    attempts: int = 0
+
+    class Settings:
+        name = "jobs"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_created_at"),
+        ]
+
+
+class DBContributionJobItem(Document):
+    """A queued project of a job. Items are kept apart from the job, so large uploads stay below the document limit"""
+
+    id: UUID = Field(default_factory=uuid4)
+    job_id: UUID = Field(alias="jobId")
+    index: int
+    project: dict[str, Any]
+    public: bool = False
+
+    class Settings:
+        name = "job_items"
+        indexes = [
+            IndexModel([("jobId", ASCENDING), ("index", ASCENDING)], name="job_index"),
+        ]
@@ -0,0 +1,110 @@
+import mmap
+import sys
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Literal, NamedTuple
+
+from models.search import fold
+
+GAZETTEER_PATH = Path(__file__).parent / "gazetteer.bin"
+MAGIC = b"GAZ1"
+HEADER_SIZE = 8
+
+
+class Coordinates(NamedTuple):
+    latitude: float
+    longitude: float
+    precision: Literal["city", "country"]
+
+
+def gazetteer_key(country: str, city: str | None = None) -> bytes:
+    """Entries are keyed by the lowercase alpha-3 country code and the folded city name, which is empty for a country"""
+
+    return f"{country.lower()}\t{fold(city).strip() if city else ''}".encode()
+
+
+class Gazetteer:
+    """
+    An offline table of country and city coordinates, memory-mapped from a file written by build_gazetteer.py.
+
+    The file is a little-endian header of the magic and the entry count, the offsets of the keys (uint32, count + 1),
+    the latitude and longitude of each entry (float32, 2 * count) and the sorted keys. Lookups binary search the keys in
+    the mapped file, so the table is shared by the processes of a host and never parsed.
+    """
+
+    def __init__(self, path: Path = GAZETTEER_PATH):
+        with path.open("rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:4] != MAGIC:
+            raise ValueError(f"{path} is not a gazetteer")
+        self.count = int.from_bytes(self._mmap[4:HEADER_SIZE], "little")
+
+        view = memoryview(self._mmap)
+        offsets_end = HEADER_SIZE + 4 * (self.count + 1)
+        coordinates_end = offsets_end + 8 * self.count
+        if sys.byteorder == "little":
+            self._offsets = view[HEADER_SIZE:offsets_end].cast("I")
+            self._coordinates = view[offsets_end:coordinates_end].cast("f")
+        else:  # pragma: no cover
+            self._offsets = _swapped("I", view[HEADER_SIZE:offsets_end])
+            self._coordinates = _swapped("f", view[offsets_end:coordinates_end])
+        self._keys = view[coordinates_end:]
+
+    def _key(self, index: int) -> bytes:
+        return bytes(self._keys[self._offsets[index] : self._offsets[index + 1]])
+
+    def _find(self, key: bytes) -> int | None:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key(low) == key:
+            return low
+        return None
+
+    def lookup(self, country: str, city: str | None = None) -> Coordinates | None:
+        """The coordinates of the city, or of the country when the city is unknown"""
+
+        if city and (index := self._find(gazetteer_key(country, city))) is not None:
+            return self._coordinates_at(index, "city")
+        if (index := self._find(gazetteer_key(country))) is not None:
+            return self._coordinates_at(index, "country")
+        return None
+
+    def _coordinates_at(self, index: int, precision: Literal["city", "country"]) -> Coordinates:
+        # float32 keeps about 7 significant digits, so the coordinates are rounded to 5 decimals, about a metre
+        latitude, longitude = self._coordinates[2 * index], self._coordinates[2 * index + 1]
+        return Coordinates(round(latitude, 5), round(longitude, 5), precision)
+
+
+def _swapped(typecode: str, data: memoryview) -> array:  # pragma: no cover
+    values = array(typecode, bytes(data))
+    values.byteswap()
+    return values
+
+
+def write_gazetteer(entries: dict[bytes, tuple[float, float]], path: Path = GAZETTEER_PATH) -> None:
+    keys = sorted(entries)
+
+    offsets = array("I", [0])
+    coordinates = array("f")
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+        coordinates.extend(entries[key])
+    if sys.byteorder != "little":  # pragma: no cover
+        offsets.byteswap()
+        coordinates.byteswap()
+
+    path.write_bytes(
+        MAGIC + len(keys).to_bytes(4, "little") + offsets.tobytes() + coordinates.tobytes() + b"".join(keys)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer() -> Gazetteer:
+    return Gazetteer()
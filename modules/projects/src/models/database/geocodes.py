@@ -0,0 +1,120 @@
+import logging
+import math
+
+from pymongo import UpdateOne
+
+from models.database.db_model import DBGeocode, DBLocation, GeoPoint, LocationCoordinates
+from models.database.gazetteer import gazetteer_key, get_gazetteer
+
+logger = logging.getLogger("main")
+
+# Longitude span of the polygons of a bounding box, and the spacing of the vertices along its parallels
+MAX_POLYGON_WIDTH = 90.0
+VERTEX_SPACING = 1.0
+# Latitude margin of the polygons, wider than the bulge of a geodesic edge between vertices a degree apart. The
+# polygons stop short of the poles, where their vertices would coincide
+LATITUDE_MARGIN = 0.01
+MAX_POLYGON_LATITUDE = 89.9
+
+
+def geocode_id(country: str, city: str | None) -> str:
+    return gazetteer_key(country, city).decode()
+
+
+def resolve_coordinates(location: DBLocation) -> LocationCoordinates:
+    """The coordinates of the city of a location, or of its country, from the offline gazetteer"""
+
+    coordinates = get_gazetteer().lookup(location.country.value, location.city)
+    if coordinates is None:
+        return LocationCoordinates(latitude=0.0, longitude=0.0, precision="unknown")
+    return LocationCoordinates(**coordinates._asdict())
+
+
+def geo_point(coordinates: LocationCoordinates) -> GeoPoint | None:
+    if coordinates.precision == "unknown":
+        return None
+    return GeoPoint(coordinates=(coordinates.longitude, coordinates.latitude))
+
+
+def geocode_precision(location: DBLocation) -> str:
+    """The precision a geocode of the location is stored with: its city, or its country when it has none"""
+
+    return "city" if location.city else "country"
+
+
+async def geocode_locations(locations: list[DBLocation]) -> None:
+    """
+    Set the coordinates and map point of the locations that have none, with one read of the shared geocodes collection.
+    Places that are not in the collection yet are resolved and stored for the next projects in them. A city that falls
+    back to its country is stored under the country, so it is resolved again once the gazetteer has the city.
+    """
+
+    pending = {}
+    for location in locations:
+        if location.coordinates is None:
+            pending.setdefault(geocode_id(location.country.value, location.city), []).append(location)
+        elif location.point is None:
+            location.point = geo_point(location.coordinates)
+    if not pending:
+        return
+
+    collection = DBGeocode.get_motor_collection()
+    known = {geocode["_id"]: geocode async for geocode in collection.find({"_id": {"$in": list(pending)}})}
+
+    operations = {}
+    for key, _locations in pending.items():
+        location = _locations[0]
+        # Geocodes stored before fallbacks were kept under the country are resolved again
+        if key in known and known[key]["precision"] == geocode_precision(location):
+            coordinates = LocationCoordinates.model_validate(known[key])
+        else:
+            coordinates = resolve_coordinates(location)
+            if coordinates.precision != "unknown":
+                city = location.city if coordinates.precision == "city" else None
+                _id = geocode_id(location.country.value, city)
+                geocode = {"country": location.country.value, "city": city, **coordinates.model_dump()}
+                operations[_id] = UpdateOne({"_id": _id}, {"$set": geocode}, upsert=True)
+
+        for _location in _locations:
+            _location.coordinates = coordinates
+            _location.point = geo_point(coordinates)
+
+    if operations:
+        await collection.bulk_write(list(operations.values()), ordered=False)
+        logger.debug(f"Stored {len(operations)} geocodes")
+
+
+def longitude_ranges(west: float, east: float) -> list[tuple[float, float]]:
+    """The longitude ranges of a bounding box, split in two where it crosses the antimeridian, i.e. west > east"""
+
+    if west > east:
+        return [(west, 180.0), (-180.0, east)]
+    return [(west, east)]
+
+
+def bbox_polygons(west: float, south: float, east: float, north: float) -> list[dict]:
+    """
+    GeoJSON polygons covering a bounding box, for a $geoWithin match on the 2dsphere index.
+    The edges of a GeoJSON polygon are geodesics, not parallels, so the boxes are split at most MAX_POLYGON_WIDTH wide,
+    get a vertex every VERTEX_SPACING degrees along their parallels and a small latitude margin. The polygons cover the
+    box with a little to spare, which the exact coordinate match after them removes.
+    """
+
+    south = max(south - LATITUDE_MARGIN, -MAX_POLYGON_LATITUDE)
+    north = min(north + LATITUDE_MARGIN, MAX_POLYGON_LATITUDE)
+
+    polygons = []
+    for start, end in longitude_ranges(west, east):
+        pieces = max(math.ceil((end - start) / MAX_POLYGON_WIDTH), 1)
+        width = (end - start) / pieces
+        for piece in range(pieces):
+            _west = start + piece * width
+            steps = max(math.ceil(width / VERTEX_SPACING), 1)
+            longitudes = [_west + step * width / steps for step in range(steps + 1)]
+            ring = (
+                [[longitude, south] for longitude in longitudes]
+                + [[longitude, north] for longitude in reversed(longitudes)]
+                + [[_west, south]]
+            )
+            polygons.append({"type": "Polygon", "coordinates": [ring]})
+    return polygons
@@ -0,0 +1,94 @@
+import logging
+from typing import Any
+from uuid import UUID
+
+from beanie import Document, Link
+from beanie.operators import In
+from strawberry import Info
+from strawberry.dataloader import DataLoader
+
+from models.database.db_model import DBEPD, DBAssembly, DBGeocode, DBProduct, DBProject, DBTechFlow, LocationCoordinates
+from models.database.geocodes import geocode_id
+
+logger = logging.getLogger("main")
+
+# Link targets of DBProduct.impact_data, by collection name
+IMPACT_DATA_MODELS = (DBEPD, DBTechFlow)
+
+
+async def load_documents(model: type[Document], ids: list[UUID]) -> list[Document | None]:
+    """Fetch all documents of a link level with one $in query, in the order of the ids"""
+
+    documents = {document.id: document for document in await model.find(In(model.id, ids)).to_list()}
+    logger.debug(f"Loaded {len(documents)} of {len(ids)} {model.__name__} documents")
+    return [documents.get(_id) for _id in ids]
+
+
+async def load_impact_data(keys: list[tuple[str, UUID]]) -> list[Document | None]:
+    """Impact data links point to either EPDs or TechFlows, so they are loaded per collection"""
+
+    documents = {}
+    for model in IMPACT_DATA_MODELS:
+        collection = model.get_motor_collection().name
+        if ids := [_id for _collection, _id in keys if _collection == collection]:
+            documents.update(
+                {(collection, document.id): document for document in await load_documents(model, ids) if document}
+            )
+    return [documents.get(key) for key in keys]
+
+
+async def load_geocodes(keys: list[tuple[str, str | None]]) -> list[LocationCoordinates | None]:
+    """
+    The stored coordinates of places, by country and city, with one $in query. A city that is not stored falls back to
+    its country. Places are never geocoded here
+    """
+
+    ids = [(geocode_id(country, city), geocode_id(country, None)) for country, city in keys]
+    geocodes = {
+        geocode["_id"]: LocationCoordinates.model_validate(geocode)
+        async for geocode in DBGeocode.get_motor_collection().find(
+            {"_id": {"$in": list({_id for pair in ids for _id in pair})}}
+        )
+    }
+    return [geocodes.get(_id, geocodes.get(country_id)) for _id, country_id in ids]
+
+
+def create_loaders() -> dict[str, DataLoader]:
+    """DataLoaders for the project link chain. They cache per request, so a new set is created for every context"""
+
+    return {
+        "projects": DataLoader(load_fn=lambda ids: load_documents(DBProject, ids)),
+        "assemblies": DataLoader(load_fn=lambda ids: load_documents(DBAssembly, ids)),
+        "products": DataLoader(load_fn=lambda ids: load_documents(DBProduct, ids)),
+        "impact_data": DataLoader(load_fn=load_impact_data),
+        "geocodes": DataLoader(load_fn=load_geocodes),
+    }
+
+
+async def resolve_link(info: Info, loader: str, value: Any) -> Any:
+    """Load a link with the request's loader. Documents that are already fetched are returned as they are"""
+
+    if not isinstance(value, Link):
+        return value
+
+    if loader == "impact_data":
+        return await info.context["loaders"][loader].load((value.ref.collection, value.ref.id))
+    return await info.context["loaders"][loader].load(value.ref.id)
+
+
+async def resolve_ids(info: Info, loader: str, ids: list[UUID]) -> list[Document]:
+    """Load documents by id with the request's loader, skipping documents that no longer exist"""
+
+    return [document for document in await info.context["loaders"][loader].load_many(ids) if document is not None]
+
+
+async def resolve_links(info: Info, loader: str, values: list[Any]) -> list[Any]:
+    """Load a list of links with one batch, skipping links to documents that no longer exist"""
+
+    links = [value for value in values if isinstance(value, Link)]
+    if not links:
+        return values
+
+    loaded = iter(await info.context["loaders"][loader].load_many([link.ref.id for link in links]))
+    documents = [next(loaded) if isinstance(value, Link) else value for value in values]
+    return [document for document in documents if document is not None]
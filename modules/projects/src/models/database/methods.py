@@ -1,17 +1,16 @@
-import json
+import datetime
 import logging
-from pathlib import Path
 from uuid import UUID
 
-import httpx
-from async_lru import alru_cache
 from beanie.odm.operators.find.logical import Or
 from pydantic import BaseModel
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from pymongo.errors import ExecutionTimeout
 
-from core.exceptions import MicroServiceConnectionError, ThrottleError
-from models import DBProject
+from core.config import settings
+from core.exceptions import DatabaseError, InvalidOperationError
+from models import DBProject, DBProjectSummary, FilterBy, SortBy, filter_model_query
 from models.response import AggregationMethod
+from models.sort_filter import get_sort_key
 
 logger = logging.getLogger(__name__)
 
@@ -24,33 +23,79 @@ class ProjectAggregation(BaseModel):
 
 class ProjectGroup(BaseModel):
     group: str
-    items: list[DBProject]
+    # The projects are loaded by the items resolver, only when they are selected
+    item_ids: list[UUID]
     aggregation: list[ProjectAggregation] | None = None
     count: int
 
 
+class ProjectFacetBucket(BaseModel):
+    value: str
+    count: int
+
+
+class ProjectFacet(BaseModel):
+    field: str
+    buckets: list[ProjectFacetBucket]
+
+
+class ProjectFacets(BaseModel):
+    # The projects of the page are loaded by the items resolver, only when they are selected
+    item_ids: list[UUID]
+    facets: list[ProjectFacet]
+
+
+class ClusterBounds(BaseModel):
+    west: float
+    south: float
+    east: float
+    north: float
+
+
+class ProjectCluster(BaseModel):
+    count: int
+    public_count: int
+    # The mean coordinates of the projects and the box around them
+    latitude: float
+    longitude: float
+    bounds: ClusterBounds
+    latest_upload: datetime.datetime | None = None
+    # Set when the cluster is a single project, which the map shows as a marker
+    project_id: UUID | None = None
+
+
+MAX_ZOOM = 22
+
+
 async def group_projects(organization_id: UUID, group_by: str, limit: int, items_args: dict, aggregation_args: dict):
-    from models import DBProject
+    """
+    Group and aggregate the project summaries. The groups collect at most GROUP_MAX_ITEMS item ids, or the items limit,
+    so a large group never holds whole documents in the pipeline.
+    """
+
+    from models.pipeline import validate_summary_path
 
-    items = {"$push": "$$ROOT"}
-    if items_args.get("limit"):
-        items = {"$topN": {"n": int(items_args.get("limit")), "output": "$$ROOT", "sortBy": {"_id": -1}}}
+    validate_summary_path(group_by)
+    n = int(items_args.get("limit") or settings.GROUP_MAX_ITEMS)
+    items = {"$topN": {"n": n, "output": "$_id", "sortBy": {"_id": -1}}}
 
     aggregation = {}
+    fields = {group_by}
     projection = {
         "$project": {
-            "_id": None,
+            "_id": 0,
             "group": "$_id",
-            "items": "$items",
+            "item_ids": "$items",
             "count": "$count",
         }
     }
     if aggregation_args:
         aggregation_projection = []
         for _input in aggregation_args.get("apply"):
-            field = _input.get("field")
+            field = validate_summary_path(_input.get("field"))
             method = _input.get("method").lower()
             key = f"{method}_{field.replace('.', '_')}"
+            fields.add(field)
             if method == "pct25":
                 aggregation[key] = {"$percentile": {"input": f"${field}", "p": [0.25], "method": "approximate"}}
                 aggregation_projection.append({"method": method, "value": {"$first": f"${key}"}, "field": field})
@@ -65,72 +110,210 @@ async def group_projects(organization_id: UUID, group_by: str, limit: int, items
                 aggregation_projection.append({"method": method, "value": f"${key}", "field": field})
         projection["$project"]["aggregation"] = aggregation_projection
 
-    groups = (
-        await DBProject.find(
-            Or(DBProject.contribution.organizationId == organization_id, DBProject.contribution.public == True),  # noqa: E712
-            fetch_links=True,
-        )
-        .aggregate(
-            [
-                {"$group": {"_id": f"${group_by}", "items": items, "count": {"$sum": 1}, **aggregation}},
-                projection,
-                {"$limit": limit},
-            ],
-            projection_model=ProjectGroup,
+    try:
+        groups = (
+            await DBProjectSummary.find(
+                Or(DBProjectSummary.organization_id == organization_id, DBProjectSummary.public == True),  # noqa: E712
+            )
+            .aggregate(
+                [
+                    # Only the fields that are grouped and aggregated on enter the $group stage
+                    {"$project": {**_project_fields(fields), "_id": 1}},
+                    {"$group": {"_id": f"${group_by}", "items": items, "count": {"$sum": 1}, **aggregation}},
+                    {"$limit": limit},
+                    projection,
+                ],
+                projection_model=ProjectGroup,
+                allowDiskUse=True,
+                maxTimeMS=settings.ANALYTICS_MAX_TIME_MS,
+            )
+            .to_list()
         )
-        .to_list()
-    )
+    except ExecutionTimeout:
+        raise DatabaseError(f"Grouping projects by {group_by} took longer than {settings.ANALYTICS_MAX_TIME_MS} ms")
     return groups
 
 
+def _project_fields(fields: set[str]) -> dict[str, int]:
+    """An inclusion projection of the fields, without paths that are below another included path"""
+
+    return {field: 1 for field in fields if not any(field.startswith(f"{other}.") for other in fields)}
+
+
 async def aggregate_projects(organization_id: UUID, apply: list[dict]):
-    groups = (
-        await DBProject.find(
-            Or(DBProject.contribution.organizationId == organization_id, DBProject.contribution.public == True),  # noqa: E712
-            fetch_links=True,
+    """
+    Run a client supplied aggregation pipeline on the summaries of the projects the organization can see.
+    The visibility $match of the find query is the first stage, so the pipeline never sees other projects.
+    """
+
+    from models.pipeline import validate_pipeline, validate_summary_pipeline
+
+    apply = validate_pipeline(apply)
+    validate_summary_pipeline(apply)
+    try:
+        groups = (
+            await DBProjectSummary.find(
+                Or(DBProjectSummary.organization_id == organization_id, DBProjectSummary.public == True),  # noqa: E712
+            )
+            .aggregate(apply, allowDiskUse=True, maxTimeMS=settings.ANALYTICS_MAX_TIME_MS)
+            .to_list()
         )
-        .aggregate(apply)
-        .to_list()
-    )
+    except ExecutionTimeout:
+        raise DatabaseError(f"The aggregation took longer than {settings.ANALYTICS_MAX_TIME_MS} ms")
     return groups
 
 
-@alru_cache
-async def get_coordinates(country_name: str, city_name: str | None = None) -> dict:
-    country_name = country_name.lower()
-    city_name = city_name.lower() if city_name else None
-
-    if city_name:
-        return await get_city_location(city_name)
-    else:
-        country_cache = json.loads((Path(__file__).parent / "country_cache.json").read_text())
-        if country_cache.get(country_name):
-            return country_cache.get(country_name)
-
-    return {"latitude": 0.0, "longitude": 0.0}
-
-
-@retry(
-    stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=1, min=1, max=10),
-    retry=retry_if_exception_type(ThrottleError),
-)
-async def get_city_location(city_name: str) -> dict:
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"https://nominatim.openstreetmap.org/search?q={city_name}&format=json")
-        except httpx.RequestError as e:
-            raise MicroServiceConnectionError(f"Could not connect to nominatim.openstreetmap.org. Got {e}")
-        if response.is_error:
-            if "Bandwidth Limit exceeded" in response.text:
-                logger.info(f"Bandwidth Limit Exceeded - {city_name}")
-                raise ThrottleError("Bandwidth Limit Exceeded")
-            else:
-                raise MicroServiceConnectionError(
-                    f"Could not receive data from nominatim.openstreetmap.org. Got {response.text}"
-                )
-        _json = response.json()
-        if _json:
-            data = _json[0]
-            return {"latitude": float(data["lat"]), "longitude": float(data["lon"])}
-        return {"latitude": 0.0, "longitude": 0.0}
+async def facet_projects(
+    organization_id: UUID,
+    filter_by: FilterBy | None,
+    fields: list[str],
+    sort_by: SortBy | None = None,
+    limit: int = 50,
+    offset: int = 0,
+    bucket_limit: int = 50,
+) -> ProjectFacets:
+    """
+    Count the values of each field among the filtered projects, together with the ids of a page of them.
+    The visibility and filter $match runs once on the indexes, and a single $facet splits the matched projects into the
+    page and one bucket count per field. Array fields, like lifeCycleStages, count each of their values.
+    """
+
+    from models.pipeline import validate_field_path
+
+    query = DBProject.find(Or(DBProject.organization_id == organization_id, DBProject.public == True))  # noqa: E712
+    if filter_by:
+        query = filter_model_query(DBProject, filter_by, query)
+
+    sort_field, direction = get_sort_key(sort_by)
+    facets = {
+        "items": [
+            {"$sort": {sort_field: direction, "_id": direction}},
+            {"$skip": offset},
+            {"$limit": limit},
+            {"$project": {"_id": 1}},
+        ]
+    }
+    for index, field in enumerate(fields):
+        validate_field_path(field)
+        facets[f"facet_{index}"] = [
+            {"$unwind": f"${field}"},
+            {"$sortByCount": f"${field}"},
+            {"$limit": bucket_limit},
+        ]
+
+    try:
+        result = await query.aggregate(
+            [{"$facet": facets}], allowDiskUse=True, maxTimeMS=settings.ANALYTICS_MAX_TIME_MS
+        ).to_list()
+    except ExecutionTimeout:
+        raise DatabaseError(f"Counting the facets of projects took longer than {settings.ANALYTICS_MAX_TIME_MS} ms")
+
+    result = result[0] if result else {}
+    return ProjectFacets(
+        item_ids=[item["_id"] for item in result.get("items", [])],
+        facets=[
+            ProjectFacet(
+                field=field,
+                buckets=[
+                    ProjectFacetBucket(value=str(bucket["_id"]), count=bucket["count"])
+                    for bucket in result.get(f"facet_{index}", [])
+                    if bucket["_id"] is not None
+                ],
+            )
+            for index, field in enumerate(fields)
+        ],
+    )
+
+
+async def cluster_projects(
+    organization_id: UUID,
+    west: float,
+    south: float,
+    east: float,
+    north: float,
+    zoom: int,
+    filter_by: FilterBy | None = None,
+) -> list[ProjectCluster]:
+    """
+    Cluster the filtered projects in a bounding box on a grid of MAP_CLUSTER_GRID cells per map tile edge at the zoom.
+    The box is matched on the 2dsphere index of the project points, and the cells are grouped in the database, so the
+    response holds at most MAP_MAX_CLUSTERS clusters, the largest ones, whatever the number of projects.
+    """
+
+    from models.database.geocodes import bbox_polygons, longitude_ranges
+
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise InvalidOperationError(message=f"zoom must be between 0 and {MAX_ZOOM}", name="Clusters")
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise InvalidOperationError(
+            message="The bounding box takes longitudes between -180 and 180 and a south below its north",
+            name="Clusters",
+        )
+
+    within = [
+        {"location.point": {"$geoWithin": {"$geometry": polygon}}}
+        for polygon in bbox_polygons(west, south, east, north)
+    ]
+    query = DBProject.find(
+        Or(DBProject.organization_id == organization_id, DBProject.public == True),  # noqa: E712
+        Or(*within),
+    )
+    if filter_by:
+        query = filter_model_query(DBProject, filter_by, query)
+
+    latitude = "$location.coordinates.latitude"
+    longitude = "$location.coordinates.longitude"
+    size = 360 / (2**zoom * settings.MAP_CLUSTER_GRID)
+    pipeline = [
+        {
+            "$match": {
+                "location.coordinates.latitude": {"$gte": south, "$lte": north},
+                "$or": [
+                    {"location.coordinates.longitude": {"$gte": start, "$lte": end}}
+                    for start, end in longitude_ranges(west, east)
+                ],
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "x": {"$floor": {"$divide": [longitude, size]}},
+                    "y": {"$floor": {"$divide": [latitude, size]}},
+                },
+                "count": {"$sum": 1},
+                "publicCount": {"$sum": {"$cond": ["$public", 1, 0]}},
+                "latitude": {"$avg": latitude},
+                "longitude": {"$avg": longitude},
+                "west": {"$min": longitude},
+                "south": {"$min": latitude},
+                "east": {"$max": longitude},
+                "north": {"$max": latitude},
+                "latestUpload": {"$max": "$uploadedAt"},
+                "projectId": {"$first": "$_id"},
+            }
+        },
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": settings.MAP_MAX_CLUSTERS},
+    ]
+
+    try:
+        clusters = await query.aggregate(
+            pipeline, allowDiskUse=True, maxTimeMS=settings.ANALYTICS_MAX_TIME_MS
+        ).to_list()
+    except ExecutionTimeout:
+        raise DatabaseError(f"Clustering the projects took longer than {settings.ANALYTICS_MAX_TIME_MS} ms")
+
+    return [
+        ProjectCluster(
+            count=cluster["count"],
+            public_count=cluster["publicCount"],
+            latitude=cluster["latitude"],
+            longitude=cluster["longitude"],
+            bounds=ClusterBounds(
+                west=cluster["west"], south=cluster["south"], east=cluster["east"], north=cluster["north"]
+            ),
+            latest_upload=cluster["latestUpload"],
+            project_id=cluster["projectId"] if cluster["count"] == 1 else None,
+        )
+        for cluster in clusters
+    ]
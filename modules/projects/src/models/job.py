@@ -0,0 +1,33 @@
+import datetime
+
+import strawberry
+
+from .database.db_model import ContributionJobBase, ContributionJobError, JobStatus
+
+GraphQLJobStatus = strawberry.enum(JobStatus, name="JobStatus")
+
+
+@strawberry.experimental.pydantic.type(model=ContributionJobError, all_fields=True, name="ContributionJobError")
+class GraphQLContributionJobError:
+    pass
+
+
+@strawberry.experimental.pydantic.type(model=ContributionJobBase, name="ContributionJob")
+class GraphQLContributionJob:
+    id: strawberry.auto
+    status: GraphQLJobStatus
+    total: strawberry.auto
+    processed: strawberry.auto
+    failed: strawberry.auto
+    errors: list[GraphQLContributionJobError]
+    contributions: strawberry.auto
+    created_at: strawberry.auto
+    started_at: strawberry.auto
+    finished_at: strawberry.auto
+
+    @strawberry.field(description="Projects processed per second since the job started.")
+    def throughput(self) -> float | None:
+        if not self.started_at:
+            return None
+        elapsed = ((self.finished_at or datetime.datetime.now()) - self.started_at).total_seconds()
+        return self.processed / elapsed if elapsed > 0 else None
@@ -1,3 +1,5 @@
+from enum import Enum
+
 import strawberry
 from lcax import BuildingModelScope as LCAxBuildingModelScope
 from lcax import BuildingType as LCAxBuildingType
@@ -13,6 +15,12 @@ from lcax import SubType as LCAxSubType
 from lcax import Unit as LCAxUnit
 
 
+class CoordinatesPrecision(Enum):
+    city = "city"
+    country = "country"
+    unknown = "unknown"
+
+
 GraphQLUnit = strawberry.enum(LCAxUnit)
 GraphQLCountry = strawberry.enum(LCAxCountry)
 GraphQLStandard = strawberry.enum(LCAxStandard)
@@ -25,3 +33,4 @@ GraphQLImpactCategoryKey = strawberry.enum(LCAxImpactCategoryKey)
 GraphQLProjectPhase = strawberry.enum(LCAxProjectPhase)
 GraphQLLifeCycleStage = strawberry.enum(LCAxLifeCycleStage)
 GraphQLBuildingModelScope = strawberry.enum(LCAxBuildingModelScope)
+GraphQLCoordinatesPrecision = strawberry.enum(CoordinatesPrecision)
@@ -17,6 +17,7 @@ from lcax import SoftwareInfo as LCAxSoftwareInfo
 from lcax import Source as LCAxSource
 from lcax import TechFlow as LCAxTechFlow
 from lcax import ValueUnit as LCAxValueUnit
+from strawberry import Info
 from strawberry.scalars import JSON, Base64
 
 from models.openbdf.enums import (
@@ -32,12 +33,42 @@ from models.openbdf.enums import (
     GraphQLLifeCycleStage,
     GraphQLProjectPhase,
     GraphQLBuildingModelScope,
+    GraphQLCoordinatesPrecision,
 )
 from models.openbdf.utils import _resolve_dict_value
 
 logger = logging.getLogger("main")
 
 
+async def get_impact_data(root, info: Info) -> "GraphQLEPD | GraphQLTechFlow":
+    from models.database.loaders import resolve_link
+
+    return await resolve_link(info, "impact_data", root.impact_data)
+
+
+async def get_products(root, info: Info) -> list["GraphQLProduct"]:
+    from models.database.loaders import resolve_links
+
+    return await resolve_links(info, "products", root.products)
+
+
+async def get_coordinates(root, info: Info):
+    """
+    Stored projects carry their coordinates. Projects that are not backfilled yet read them from the geocodes of their
+    place, with one batch for all locations of the request
+    """
+
+    if (coordinates := getattr(root, "coordinates", None)) is not None:
+        return coordinates
+    return await info.context["loaders"]["geocodes"].load((root.country.value, root.city))
+
+
+async def get_assemblies(root, info: Info) -> list["GraphQLAssembly"]:
+    from models.database.loaders import resolve_links
+
+    return await resolve_links(info, "assemblies", root.assemblies)
+
+
 @strawberry.experimental.pydantic.type(model=LCAxValueUnit, name="ValueUnit")
 class GraphQLValueUnit:
     unit: GraphQLUnit
@@ -349,7 +380,7 @@ class GraphQLProductMetaData:
 class GraphQLProduct:
     description: strawberry.auto
     id: UUID
-    impact_data: GraphQLEPD | GraphQLTechFlow
+    impact_data: GraphQLEPD | GraphQLTechFlow = strawberry.field(resolver=get_impact_data)
     meta_data: GraphQLProductMetaData | None = None
     name: strawberry.auto
     quantity: strawberry.auto
@@ -376,12 +407,21 @@ class GraphQLAssembly:
     id: UUID
     meta_data: GraphQLAssemblyMetaData | None = None
     name: strawberry.auto
-    products: list[GraphQLProduct]
+    products: list[GraphQLProduct] = strawberry.field(resolver=get_products)
     quantity: strawberry.auto
     results: GraphQLResults | None = None
     unit: GraphQLUnit
 
 
+@strawberry.type(name="Coordinates")
+class GraphQLCoordinates:
+    latitude: float
+    longitude: float
+    precision: GraphQLCoordinatesPrecision = strawberry.field(
+        description="Whether the coordinates are of the city or, when the city is not known, of the country."
+    )
+
+
 @strawberry.experimental.pydantic.type(model=LCAxLocation, name="Location")
 class GraphQLLocation:
     address: strawberry.auto
@@ -395,19 +435,26 @@ class GraphQLLocation:
         except KeyError:
             return self.country.value
 
-    @strawberry.field
-    async def longitude(self) -> float:
-        from models.database.methods import get_coordinates
-
-        location = await get_coordinates(self.country.value)
-        return location.get("longitude", 0.0)
+    @strawberry.field(description="Coordinates of the city of the location, or of its country.")
+    async def coordinates(self, info: Info) -> GraphQLCoordinates | None:
+        coordinates = await get_coordinates(self, info)
+        if coordinates is None:
+            return None
+        return GraphQLCoordinates(
+            latitude=coordinates.latitude,
+            longitude=coordinates.longitude,
+            precision=GraphQLCoordinatesPrecision(coordinates.precision),
+        )
 
-    @strawberry.field
-    async def latitude(self) -> float:
-        from models.database.methods import get_coordinates
+    @strawberry.field(deprecation_reason="Use coordinates.longitude")
+    async def longitude(self, info: Info) -> float:
+        coordinates = await get_coordinates(self, info)
+        return coordinates.longitude if coordinates else 0.0
 
-        location = await get_coordinates(self.country.value)
-        return location.get("latitude", 0.0)
+    @strawberry.field(deprecation_reason="Use coordinates.latitude")
+    async def latitude(self, info: Info) -> float:
+        coordinates = await get_coordinates(self, info)
+        return coordinates.latitude if coordinates else 0.0
 
 
 @strawberry.experimental.pydantic.type(model=LCAxProjectInfo, name="ProjectInfo")
@@ -921,7 +968,7 @@ class GraphQLProjectMetaData:
 
 @strawberry.experimental.pydantic.type(model=LCAxProject, name="Project")
 class GraphQLProject:
-    assemblies: list[GraphQLAssembly]
+    assemblies: list[GraphQLAssembly] = strawberry.field(resolver=get_assemblies)
     classification_system: strawberry.auto
     comment: strawberry.auto
     description: strawberry.auto
@@ -0,0 +1,246 @@
+import re
+import types
+from typing import Any, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from core.config import settings
+from core.exceptions import InvalidOperationError
+from models.database.db_model import DBProjectSummary
+
+# Stages a client can use in the aggregation of projects. Stages that read other collections ($lookup, $unionWith),
+# write ($out, $merge) or inspect the server ($collStats, $currentOp) are not allowed
+ALLOWED_STAGES = {
+    "$match",
+    "$project",
+    "$addFields",
+    "$set",
+    "$unset",
+    "$group",
+    "$sort",
+    "$limit",
+    "$skip",
+    "$count",
+    "$unwind",
+    "$bucket",
+    "$bucketAuto",
+    "$sortByCount",
+    "$replaceRoot",
+    "$replaceWith",
+    "$facet",
+}
+
+# Query, expression and accumulator operators. JavaScript operators ($where, $function, $accumulator) are not allowed
+ALLOWED_OPERATORS = {
+    # Query
+    *("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$and", "$or", "$nor", "$not", "$exists", "$type"),
+    *("$size", "$all", "$elemMatch", "$regex", "$options", "$expr"),
+    # Arithmetic
+    *("$add", "$subtract", "$multiply", "$divide", "$mod", "$abs", "$ceil", "$floor", "$round", "$trunc", "$sqrt"),
+    *("$pow", "$exp", "$ln", "$log", "$log10"),
+    # Accumulators
+    *("$sum", "$avg", "$min", "$max", "$first", "$last", "$push", "$addToSet", "$count", "$median", "$percentile"),
+    *("$stdDevPop", "$stdDevSamp", "$top", "$topN", "$bottom", "$bottomN", "$firstN", "$lastN", "$maxN", "$minN"),
+    # Arrays, objects and sets
+    *("$arrayElemAt", "$filter", "$map", "$reduce", "$slice", "$concatArrays", "$isArray", "$indexOfArray"),
+    *("$objectToArray", "$arrayToObject", "$mergeObjects", "$getField", "$setUnion", "$setIntersection"),
+    *("$setDifference", "$setIsSubset"),
+    # Conditions, comparison and variables
+    *("$cond", "$ifNull", "$switch", "$cmp", "$literal", "$let"),
+    # Strings, types and dates
+    *("$concat", "$toLower", "$toUpper", "$substrCP", "$split", "$strLenCP", "$trim", "$toString", "$toDouble"),
+    *("$toInt", "$toLong", "$toDecimal", "$toBool", "$toDate", "$convert", "$isNumber", "$year", "$month"),
+    *("$dayOfMonth", "$dateToString", "$dateTrunc"),
+}
+
+FIELD_PATH = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+
+def validate_field_path(path: str) -> str:
+    """A dotted field path without operators or variables, e.g. location.country"""
+
+    if not isinstance(path, str) or not FIELD_PATH.match(path):
+        raise InvalidOperationError(message=f"Invalid field path: {path!r}", name="Aggregation")
+    return path
+
+
+# Stages after which the field paths refer to the output of the stage, not to the fields of the summaries
+RESHAPING_STAGES = {
+    "$group",
+    "$project",
+    "$bucket",
+    "$bucketAuto",
+    "$sortByCount",
+    "$count",
+    "$replaceRoot",
+    "$replaceWith",
+}
+
+
+def validate_summary_path(path: str, added: set[str] | frozenset = frozenset()) -> str:
+    """
+    A field path of the project summaries, e.g. location.country or intensities.gwp.a1a3, or below a field in `added`.
+    The analytics queries run on the summaries, so any other project field would silently group or aggregate as null.
+    """
+
+    validate_field_path(path)
+    parts = path.split(".")
+    if parts[0] in added:
+        return path
+
+    model = DBProjectSummary
+    for index, part in enumerate(parts):
+        field = _summary_field(model, part)
+        if field is None:
+            raise InvalidOperationError(
+                message=f"{path} is not a field of the project summaries, which groups and aggregations run on. "
+                f"The fields are {', '.join(_summary_field_names(DBProjectSummary))}",
+                name="Aggregation",
+            )
+        annotation = _unwrap(field.annotation)
+        if get_origin(annotation) is dict:
+            # Results and intensities are keyed by impact category and life cycle stage
+            return path
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            model = annotation
+        elif index < len(parts) - 1:
+            raise InvalidOperationError(message=f"{'.'.join(parts[: index + 1])} has no fields", name="Aggregation")
+    return path
+
+
+def _summary_field(model: type[BaseModel], name: str):
+    if model is DBProjectSummary and name == "_id":
+        return model.model_fields["id"]
+    return next((field for key, field in model.model_fields.items() if (field.alias or key) == name), None)
+
+
+def _summary_field_names(model: type[BaseModel]) -> list[str]:
+    return [
+        "_id" if key == "id" else field.alias or key
+        for key, field in model.model_fields.items()
+        if key != "revision_id"
+    ]
+
+
+def _unwrap(annotation: Any) -> Any:
+    """The type of a field without None and list"""
+
+    while True:
+        origin = get_origin(annotation)
+        if origin in (Union, types.UnionType):
+            annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+        elif origin is list:
+            annotation = get_args(annotation)[0]
+        else:
+            return annotation
+
+
+def validate_summary_pipeline(pipeline: list[dict], added: set[str] | None = None) -> None:
+    """
+    Check the fields a client supplied pipeline reads from the project summaries. The stages are checked up to the
+    first one that reshapes the documents, as the paths after it refer to its output. Fields set by $addFields are
+    allowed from then on.
+    """
+
+    added = set() if added is None else added
+    for stage in pipeline:
+        name, body = next(iter(stage.items()))
+        if name == "$facet":
+            for facet in body.values():
+                validate_summary_pipeline(facet, set(added))
+            return
+        if name == "$match":
+            _validate_match_paths(body, added)
+        elif name == "$sort":
+            for path in body:
+                validate_summary_path(path, added)
+        elif name == "$unwind":
+            path = body.get("path") if isinstance(body, dict) else body
+            _validate_expression_paths(path, added)
+        elif name in ("$addFields", "$set"):
+            _validate_expression_paths(body, added)
+            added.update(path.split(".")[0] for path in body)
+        elif name == "$project":
+            for path, value in body.items():
+                if value in (0, 1, True, False):
+                    validate_summary_path(path, added)
+                else:
+                    _validate_expression_paths(value, added)
+        elif name != "$unset":
+            _validate_expression_paths(body, added)
+
+        if name in RESHAPING_STAGES:
+            return
+
+
+def _validate_match_paths(query: Any, added: set[str]) -> None:
+    if not isinstance(query, dict):
+        return
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor") and isinstance(value, list):
+            for item in value:
+                _validate_match_paths(item, added)
+        elif key == "$expr":
+            _validate_expression_paths(value, added)
+        elif not key.startswith("$"):
+            validate_summary_path(key, added)
+
+
+def _validate_expression_paths(value: Any, added: set[str]) -> None:
+    """Every $field reference of an expression, except variables like $$ROOT"""
+
+    if isinstance(value, str) and value.startswith("$") and not value.startswith("$$"):
+        validate_summary_path(value[1:], added)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _validate_expression_paths(item, added)
+    elif isinstance(value, list):
+        for item in value:
+            _validate_expression_paths(item, added)
+
+
+def validate_pipeline(pipeline: Any, nested: bool = False) -> list[dict]:
+    """
+    Check a client supplied aggregation pipeline against the allowed stages and operators.
+    The pipeline is capped to ANALYTICS_MAX_RESULTS documents. The visibility $match is added before it by the caller.
+    """
+
+    if not isinstance(pipeline, list):
+        raise InvalidOperationError(message="The aggregation must be a list of stages", name="Aggregation")
+
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise InvalidOperationError(message=f"Invalid stage: {stage!r}", name="Aggregation")
+
+        name, body = next(iter(stage.items()))
+        if name not in ALLOWED_STAGES or (nested and name == "$facet"):
+            raise InvalidOperationError(message=f"Stage {name} is not allowed", name="Aggregation")
+
+        if name == "$facet":
+            if not isinstance(body, dict):
+                raise InvalidOperationError(message="$facet takes an object of pipelines", name="Aggregation")
+            for facet in body.values():
+                validate_pipeline(facet, nested=True)
+        elif name == "$limit" and (not isinstance(body, int) or body > settings.ANALYTICS_MAX_RESULTS):
+            raise InvalidOperationError(
+                message=f"$limit must be at most {settings.ANALYTICS_MAX_RESULTS}", name="Aggregation"
+            )
+        else:
+            _validate_operators(body)
+
+    if nested:
+        return pipeline
+    return [*pipeline, {"$limit": settings.ANALYTICS_MAX_RESULTS}]
+
+
+def _validate_operators(value: Any) -> None:
+    """Every key starting with $ must be an allowed operator"""
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.startswith("$") and key not in ALLOWED_OPERATORS:
+                raise InvalidOperationError(message=f"Operator {key} is not allowed", name="Aggregation")
+            _validate_operators(item)
+    elif isinstance(value, list):
+        for item in value:
+            _validate_operators(item)
@@ -1,3 +1,4 @@
+import asyncio
 from enum import Enum
 
 import strawberry
@@ -5,6 +6,7 @@ from strawberry import Info
 from strawberry.scalars import JSON
 
 from core.context import get_user
+from models.selection import get_selection
 from models.sort_filter import FilterBy, SortBy
 
 
@@ -44,8 +46,12 @@ class GraphQLGroupResponse[T]:
     group: str
 
     @strawberry.field()
-    def items(self, limit: int | None = None) -> list[T]:
-        return self.items
+    async def items(self, info: Info, limit: int | None = None) -> list[T]:
+        """The projects of all groups are loaded with one batch, and only when they are selected"""
+
+        from models.database.loaders import resolve_ids
+
+        return await resolve_ids(info, "projects", self.item_ids[:limit])
 
     @strawberry.field()
     async def aggregation(self, apply: list[InputAggregation]) -> list[AggregationResult]:
@@ -54,6 +60,35 @@ class GraphQLGroupResponse[T]:
     count: int
 
 
+@strawberry.type
+class FacetBucket:
+    value: str
+    count: int
+
+
+@strawberry.type
+class Facet:
+    field: str
+    buckets: list[FacetBucket]
+
+
+@strawberry.type
+class GraphQLFacetResponse[T]:
+    @strawberry.field(description="The page of filtered items.")
+    async def items(self, info: Info) -> list[T]:
+        from models.database.loaders import resolve_ids
+
+        return await resolve_ids(info, "projects", self.item_ids)
+
+    facets: list[Facet] = strawberry.field(description="The value counts of each requested field.")
+
+
+@strawberry.type
+class PageInfo:
+    end_cursor: str | None = strawberry.field(description="Cursor of the last item, to pass as 'after'.")
+    has_next_page: bool
+
+
 @strawberry.type
 class GraphQLResponse[T]:
     def __init__(self, generic_type: type[T]):
@@ -73,7 +108,14 @@ class GraphQLResponse[T]:
         sort_by: SortBy | None = None,
         offset: int = 0,
         limit: int | None = strawberry.UNSET,
+        first: int | None = strawberry.UNSET,
+        after: str | None = strawberry.UNSET,
     ) -> list[T] | None:
+        selection = self._selection(info)
+        if first is not strawberry.UNSET or after is not strawberry.UNSET:
+            items, _ = await self._page(info, filter_by, sort_by, first, after, selection)
+            return items
+
         user = get_user(info)
         organization_id = user.organization_id
         limit = (
@@ -83,29 +125,145 @@ class GraphQLResponse[T]:
         if self._type == "Project":
             from logic import get_projects
 
-            return await get_projects(organization_id, filter_by, sort_by, limit, offset)
+            return await get_projects(organization_id, filter_by, sort_by, limit, offset, selection=selection)
         elif self._type == "Contribution":
-            from logic import get_contributions, check_fetch_projects
+            from logic import get_contributions
 
             return await get_contributions(
-                organization_id, filter_by, sort_by, limit, offset, check_fetch_projects(info)
+                organization_id, filter_by, sort_by, limit, offset, selection is not None, selection=selection
             )
         return None
 
+    @strawberry.field(description="Cursor information for the page selected by 'first' and 'after'.")
+    async def page_info(
+        self,
+        info: Info,
+        filter_by: FilterBy | None = None,
+        sort_by: SortBy | None = None,
+        first: int | None = None,
+        after: str | None = None,
+    ) -> PageInfo:
+        _, page_info = await self._page(info, filter_by, sort_by, first, after, strawberry.UNSET)
+        return page_info
+
+    async def _page(
+        self,
+        info: Info,
+        filter_by: FilterBy | None,
+        sort_by: SortBy | None,
+        first: int | None,
+        after: str | None,
+        selection: dict | None,
+    ) -> tuple[list[T], PageInfo]:
+        """
+        Share one keyset query between items and pageInfo within a request.
+        pageInfo passes an unset selection, as any page of the same window has the cursor it needs.
+        """
+
+        first = 50 if first in (strawberry.UNSET, None) else first
+        after = None if after is strawberry.UNSET else after
+
+        pages = info.context.setdefault("pages", {}).setdefault(
+            (self._type, repr(filter_by), repr(sort_by), first, after), {}
+        )
+        if selection is strawberry.UNSET:
+            if pages:
+                return await next(iter(pages.values()))
+            # Only the cursor is needed, so no project fields or links are selected
+            selection = {} if self._type == "Project" else None
+
+        key = repr(selection)
+        if key not in pages:
+            pages[key] = asyncio.ensure_future(self._fetch_page(info, filter_by, sort_by, first, after, selection))
+        return await pages[key]
+
+    async def _fetch_page(
+        self,
+        info: Info,
+        filter_by: FilterBy | None,
+        sort_by: SortBy | None,
+        first: int,
+        after: str | None,
+        selection: dict | None,
+    ) -> tuple[list[T], PageInfo]:
+        from models.sort_filter import encode_cursor
+
+        user = get_user(info)
+        organization_id = user.organization_id
+
+        # Fetch one extra item to know whether there is a next page
+        if self._type == "Project":
+            from logic import get_projects
+
+            items = await get_projects(organization_id, filter_by, sort_by, first + 1, after=after, selection=selection)
+        elif self._type == "Contribution":
+            from logic import get_contributions
+
+            items = await get_contributions(
+                organization_id,
+                filter_by,
+                sort_by,
+                first + 1,
+                0,
+                selection is not None,
+                after=after,
+                selection=selection,
+            )
+        else:
+            items = []
+
+        page = items[:first]
+        end_cursor = encode_cursor(sort_by, page[-1]) if page else None
+        return page, PageInfo(end_cursor=end_cursor, has_next_page=len(items) > first)
+
+    def _selection(self, info: Info) -> dict | None:
+        """
+        The fields selected below the items of a project, or below the project of a contribution.
+        For contributions None means the project is not selected and not fetched.
+        """
+
+        selection = get_selection(info.selected_fields[0].selections)
+        if self._type == "Contribution":
+            return selection.get("project")
+        return selection
+
     @strawberry.field(description="Total number of items in the filtered dataset.")
     async def count(self, info: Info, filter_by: FilterBy | None = None) -> int:
-        items = await self.items(info, filter_by=filter_by, limit=None)
-        return len(items)
+        counts = await self._counts(info, filter_by)
+        return counts["count"]
 
     @strawberry.field(description="Total number of public contributions in the filtered dataset.")
     async def public_count(self, info: Info, filter_by: FilterBy | None = None) -> int:
-        items = await self.items(info, filter_by=filter_by, limit=None)
-        return len(list(filter(lambda item: item.public, items)))
+        counts = await self._counts(info, filter_by)
+        return counts["public_count"]
 
     @strawberry.field(description="Total number of private contributions in the filtered dataset.")
     async def private_count(self, info: Info, filter_by: FilterBy | None = None) -> int:
-        items = await self.items(info, filter_by=filter_by, limit=None)
-        return len(list(filter(lambda item: not item.public, items)))
+        counts = await self._counts(info, filter_by)
+        return counts["private_count"]
+
+    async def _counts(self, info: Info, filter_by: FilterBy | None) -> dict[str, int]:
+        """Share one counting query between count, publicCount and privateCount within a request"""
+
+        pending = info.context.setdefault("counts", {})
+        key = (self._type, repr(filter_by))
+        if key not in pending:
+            pending[key] = asyncio.ensure_future(self._count_items(info, filter_by))
+        return await pending[key]
+
+    async def _count_items(self, info: Info, filter_by: FilterBy | None) -> dict[str, int]:
+        user = get_user(info)
+        organization_id = user.organization_id
+
+        if self._type == "Project":
+            from logic import count_projects
+
+            return await count_projects(organization_id, filter_by)
+        elif self._type == "Contribution":
+            from logic import count_contributions
+
+            return await count_contributions(organization_id, filter_by)
+        return {"count": 0, "public_count": 0, "private_count": 0}
 
     @strawberry.field()
     async def groups(self, info: Info, group_by: str, limit: int = 50) -> list[GraphQLGroupResponse[T]]:
@@ -113,17 +271,44 @@ class GraphQLResponse[T]:
         organization_id = user.organization_id
 
         if self._type == "Project":
+            from logic.cache import cache_key, result_cache
             from models.database.methods import group_projects
 
-            return await group_projects(
-                organization_id,
-                group_by,
-                limit,
-                get_subselection_arguments(info, "items"),
-                get_subselection_arguments(info, "aggregation"),
+            items_args = get_subselection_arguments(info, "items")
+            aggregation_args = get_subselection_arguments(info, "aggregation")
+            return await result_cache.get(
+                cache_key("groups", organization_id, [group_by, limit, items_args, aggregation_args]),
+                lambda: group_projects(organization_id, group_by, limit, items_args, aggregation_args),
             )
         return []
 
+    @strawberry.field(
+        description="A page of the filtered items and the value counts of the given fields, e.g. location.country or lifeCycleStages, in one query."
+    )
+    async def facets(
+        self,
+        info: Info,
+        fields: list[str],
+        filter_by: FilterBy | None = None,
+        sort_by: SortBy | None = None,
+        offset: int = 0,
+        limit: int = 50,
+        bucket_limit: int = 50,
+    ) -> GraphQLFacetResponse[T] | None:
+        user = get_user(info)
+        organization_id = user.organization_id
+
+        if self._type == "Project":
+            from logic.cache import cache_key, result_cache
+            from models.database.methods import facet_projects
+
+            arguments = [fields, repr(filter_by), repr(sort_by), offset, limit, bucket_limit]
+            return await result_cache.get(
+                cache_key("facets", organization_id, arguments),
+                lambda: facet_projects(organization_id, filter_by, fields, sort_by, limit, offset, bucket_limit),
+            )
+        return None
+
     @strawberry.field(
         description="Apply aggregation to the items. The aggregation should be specified in the 'apply' argument, which should be provided in MongoDB aggregation syntax."
     )
@@ -132,9 +317,12 @@ class GraphQLResponse[T]:
         organization_id = user.organization_id
 
         if self._type == "Project":
+            from logic.cache import cache_key, result_cache
             from models.database.methods import aggregate_projects
 
-            return await aggregate_projects(organization_id, apply)
+            return await result_cache.get(
+                cache_key("aggregation", organization_id, apply), lambda: aggregate_projects(organization_id, apply)
+            )
         return []
 
 
@@ -0,0 +1,66 @@
+import re
+import unicodedata
+
+# The project fields that are searchable with the contains filter, by their path in a project
+SEARCH_FIELDS = ("name", "description", "owner")
+SEARCH_TERMS_FIELD = "searchTerms"
+
+# Words are indexed by their prefixes, so a search for "kinde" finds "Kindergarten" while it is being typed.
+# Longer query words are cut to the longest indexed prefix, and only the first words of long descriptions are indexed.
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 16
+MAX_WORDS_PER_FIELD = 100
+
+WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics, so "Zürich" and "zurich" fold to the same text"""
+
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def words(text: str | None) -> list[str]:
+    return WORD.findall(fold(text)) if text else []
+
+
+def search_terms(fields: dict[str, str | None]) -> list[str]:
+    """
+    The search terms of the searchable fields of a project.
+    Each word adds "field:prefix" for its prefixes, and "field=word" for the whole word, which ranks exact matches first.
+    """
+
+    terms = set()
+    for field, text in fields.items():
+        for word in list(dict.fromkeys(words(text)))[:MAX_WORDS_PER_FIELD]:
+            terms.add(f"{field}={word}")
+            for length in range(MIN_PREFIX_LENGTH, min(len(word), MAX_PREFIX_LENGTH) + 1):
+                terms.add(f"{field}:{word[:length]}")
+    return sorted(terms)
+
+
+def query_terms(field: str, value: str) -> list[str]:
+    """The terms a document needs for every word of a search to match. Single characters are not indexed"""
+
+    return [
+        f"{field}:{word[:MAX_PREFIX_LENGTH]}" for word in dict.fromkeys(words(value)) if len(word) >= MIN_PREFIX_LENGTH
+    ]
+
+
+def ranking_terms(field: str, value: str) -> list[str]:
+    return [f"{field}={word}" for word in dict.fromkeys(words(value))]
+
+
+def short_query_condition(field: str, value: str) -> dict | None:
+    """
+    The condition on the terms for a search whose words are all single characters, which query_terms leaves out.
+    A one character word matches the indexed prefixes with an anchored regex, which the index bounds, or a one character
+    word. A search of only punctuation matches nothing, and an empty search is no condition.
+    """
+
+    if not (_words := list(dict.fromkeys(words(value)))):
+        return {"$in": []} if value.strip() else None
+
+    conditions = [{"$in": [re.compile(f"^{re.escape(f'{field}:{word}')}"), f"{field}={word}"]} for word in _words]
+    return conditions[0] if len(conditions) == 1 else {"$all": [{"$elemMatch": condition} for condition in conditions]}
@@ -0,0 +1,94 @@
+from beanie import Document
+from beanie.odm.queries.find import FindMany, FindQueryResultType
+from strawberry.types.nodes import FragmentSpread, InlineFragment
+
+from models.database.db_model import DBProject
+from models.sort_filter import to_snake
+
+
+def get_selection(selections: list) -> dict:
+    """Flatten a Strawberry selection set, including fragments, into a tree of selected field names"""
+
+    tree = {}
+    for selection in selections:
+        if isinstance(selection, (FragmentSpread, InlineFragment)):
+            _merge_selection(tree, get_selection(selection.selections))
+        else:
+            _merge_selection(tree, {selection.name: get_selection(selection.selections)})
+    return tree
+
+
+def _merge_selection(tree: dict, other: dict):
+    for name, selection in other.items():
+        _merge_selection(tree.setdefault(name, {}), selection)
+
+
+def get_projection(model: type[Document], selection: dict, keep: tuple[str, ...] = ()) -> dict[str, int]:
+    """
+    Exclude the optional fields of the model that are not selected, as they can be left to their defaults.
+    Required fields and links are always kept, so the documents still validate.
+    """
+
+    selected = {to_snake(name) for name in selection} | set(keep)
+    link_fields = model.get_link_fields() or {}
+
+    projection = {}
+    for name, field in model.model_fields.items():
+        alias = field.alias or name
+        if field.is_required() or name in link_fields or name in selected or alias in selected:
+            continue
+        projection[alias] = 0
+    return projection
+
+
+def construct_project_projection(selection: dict | None, keep: tuple[str, ...] = ()) -> list[dict]:
+    """
+    Project only the selected fields of a project. Its links are resolved by the per-request loaders.
+    Unselected links are emptied, so an embedded project is read without its assemblies.
+    """
+
+    if selection is None:
+        return []
+
+    stages = []
+    if projection := get_projection(DBProject, selection, keep):
+        stages.append({"$project": projection})
+
+    selected = {to_snake(name) for name in selection} | set(keep)
+    if unselected := [
+        DBProject.model_fields[name].alias or name for name in DBProject.get_link_fields() or {} if name not in selected
+    ]:
+        stages.append({"$set": {alias: [] for alias in unselected}})
+    return stages
+
+
+def construct_contribution_lookups(selection: dict | None) -> list[dict]:
+    """Follow the project link of a contribution, with only the selected parts of the project"""
+
+    return [
+        {
+            "$lookup": {
+                "from": DBProject.get_motor_collection().name,
+                "localField": "project.$id",
+                "foreignField": "_id",
+                "as": "_link_project",
+                "pipeline": construct_project_projection(selection),
+            }
+        },
+        {"$unwind": {"path": "$_link_project", "preserveNullAndEmptyArrays": True}},
+        {"$addFields": {"project": {"$ifNull": ["$_link_project", "$project"]}}},
+        {"$project": {"_link_project": 0}},
+    ]
+
+
+def references_field(query: FindMany[FindQueryResultType], prefix: str) -> bool:
+    """Check if the filter or sort of a query uses a field below the prefix, e.g. a field of a linked document"""
+
+    def _references(value) -> bool:
+        if isinstance(value, dict):
+            return any(key.startswith(prefix) or _references(item) for key, item in value.items())
+        if isinstance(value, list):
+            return any(_references(item) for item in value)
+        return False
+
+    return _references(query.get_filter_query()) or any(field.startswith(prefix) for field, _ in query.sort_expressions)
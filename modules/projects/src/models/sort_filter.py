@@ -1,17 +1,38 @@
+import base64
+import binascii
+import copy
+import datetime
+import json
 import re
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
 from logging import getLogger
-from typing import Type
+from typing import Any, Literal, Type
 from uuid import UUID
 
 import strawberry
 from beanie import Document
 from beanie.odm.queries.find import FindMany, FindQueryResultType
+from bson import json_util
+from bson.binary import UuidRepresentation
 from strawberry import UNSET
 from strawberry.scalars import JSON
 from iso3166 import countries as iso_countries
 
+from core.exceptions import InvalidOperationError
+from models.search import (
+    SEARCH_TERMS_FIELD,
+    fold,
+    query_terms,
+    ranking_terms,
+    short_query_condition,
+)
+
 logger = getLogger("main")
 
+CURSOR_JSON_OPTIONS = json_util.CANONICAL_JSON_OPTIONS.with_options(uuid_representation=UuidRepresentation.STANDARD)
+
 
 class BaseFilter:  # pragma: no cover
     def dict(self):
@@ -24,16 +45,88 @@ class BaseFilter:  # pragma: no cover
         return [(key, value) for key, value in self.dict().items() if value]
 
 
+# Folded country names and their lowercase alpha-3 codes, which is how projects store their country
+COUNTRY_NAMES = tuple((fold(country.name), country.alpha3.lower()) for country in iso_countries)
+COUNTRY_CODES = dict(COUNTRY_NAMES)
+
+
+@lru_cache(maxsize=1024)
 def get_matching_country_codes(search_text: str) -> list[str]:
     """Get country codes that match the search text"""
-    matching_codes = []
-    search_text = search_text.lower()
-
-    for country in iso_countries:
-        if search_text in country.name.lower():
-            matching_codes.append(country.alpha3.lower())
 
-    return matching_codes
+    search_text = fold(search_text)
+    return [code for name, code in COUNTRY_NAMES if search_text in name]
+
+
+@dataclass(frozen=True)
+class FilterField:
+    """
+    A filterable field and how its values are matched. value fields are matched as they are, uuid and datetime values
+    are parsed, country names are matched on the stored country codes and search fields match contains on searchTerms.
+    """
+
+    path: str
+    kind: Literal["value", "uuid", "datetime", "country", "search"] = "value"
+
+    @property
+    def search_field(self) -> str:
+        return self.path.rpartition(".")[2]
+
+    @property
+    def search_terms_path(self) -> str:
+        prefix = self.path.rpartition(".")[0]
+        return f"{prefix}.{SEARCH_TERMS_FIELD}" if prefix else SEARCH_TERMS_FIELD
+
+    def prefixed(self, prefix: str) -> "FilterField":
+        return FilterField(path=f"{prefix}.{self.path}", kind=self.kind)
+
+
+# The fields a project can be filtered by, which all have an index on DBProject
+PROJECT_FILTER_FIELDS = {
+    "id": FilterField("_id", "uuid"),
+    "_id": FilterField("_id", "uuid"),
+    "organization_id": FilterField("organizationId", "uuid"),
+    "organizationId": FilterField("organizationId", "uuid"),
+    "public": FilterField("public"),
+    "uploadedAt": FilterField("uploadedAt", "datetime"),
+    "name": FilterField("name", "search"),
+    "description": FilterField("description", "search"),
+    "owner": FilterField("owner", "search"),
+    "countryName": FilterField("location.country", "country"),
+    "location.countryName": FilterField("location.country", "country"),
+    "location.country": FilterField("location.country"),
+    "buildingType": FilterField("projectInfo.buildingType"),
+    "projectInfo.buildingType": FilterField("projectInfo.buildingType"),
+    "projectPhase": FilterField("projectPhase"),
+    "lifeCycleStages": FilterField("lifeCycleStages"),
+    "impactCategories": FilterField("impactCategories"),
+}
+
+CONTRIBUTION_FILTER_FIELDS = {
+    "id": FilterField("_id", "uuid"),
+    "_id": FilterField("_id", "uuid"),
+    "organization_id": FilterField("organizationId", "uuid"),
+    "organizationId": FilterField("organizationId", "uuid"),
+    "userId": FilterField("userId", "uuid"),
+    "public": FilterField("public"),
+    "uploadedAt": FilterField("uploadedAt", "datetime"),
+}
+
+# Projects also accept the project. paths of contributions. Contributions match project fields on their looked up
+# project, and accept the project fields they don't have themselves without the prefix, e.g. name or countryName
+FILTER_FIELDS = {
+    "DBProject": {
+        **PROJECT_FILTER_FIELDS,
+        **{f"project.{name}": field for name, field in PROJECT_FILTER_FIELDS.items()},
+    },
+    "DBContribution": {
+        **{name: field.prefixed("project") for name, field in PROJECT_FILTER_FIELDS.items()},
+        **{f"project.{name}": field.prefixed("project") for name, field in PROJECT_FILTER_FIELDS.items()},
+        **CONTRIBUTION_FILTER_FIELDS,
+    },
+}
+
+COMPARISON_OPERATORS = {"not_equal": "$ne", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte"}
 
 
 def filter_model_query(
@@ -42,75 +135,150 @@ def filter_model_query(
     if query is None:
         query = model.find_all(fetch_links=True)
 
-    if filters:
-        for _filter, fields in filters.items():
-            if not fields:
-                continue
+    if filters and (match := compile_filter(model, filters)):
+        query = query.find(match)
 
-            for _field, value in fields.items():
-                if not _field or value is UNSET:
-                    continue
-
-                # Handle special case for country field
-                if _field in ["countryName", "project.location.countryName"]:
-                    field_path = "project.location.country"
-                    if _filter == "contains":
-                        matching_codes = get_matching_country_codes(value)
-                        if matching_codes:
-                            query = query.find({field_path: {"$in": matching_codes}})
-                        else:
-                            # If no matches found, ensure no results are returned
-                            query = query.find({"_id": None})
-                    continue
-
-                # Map other field names to database paths
-                field_mapping = {
-                    "name": "project.name",
-                    "buildingType": "project.projectInfo.buildingType",
-                    "uploadedAt": "uploadedAt",
-                    "public": "public",  # Not working
-                    "organization_id": "organization_id",
-                    "id": "_id",
-                    "_id": "_id",
-                    "lifeCycleStages": "project.lifeCycleStages",
-                    "impactCategories": "project.impactCategories",
-                }
+    return query
 
-                field_path = field_mapping.get(_field, _field)
-
-                logger.debug(f"Filtering {_filter} by {field_path} in {value}")
-
-                # Handle UUID fields specially
-                if isinstance(value, UUID) or (isinstance(value, str) and len(value) == 36):
-                    if _filter == "equal":
-                        if isinstance(value, str):
-                            try:
-                                value = UUID(value)
-                            except ValueError:
-                                continue
-                        query = query.find({field_path: value})
-                else:
-                    # Handle other field types
-                    if _filter == "contains":
-                        query = query.find({field_path: {"$regex": f".*{value}.*", "$options": "i"}})
-                    elif _filter == "equal":
-                        query = query.find({field_path: value})
-                    elif _filter == "not_equal":
-                        query = query.find({field_path: {"$ne": value}})
-                    elif _filter == "is_true" and value is not None:
-                        query = query.find({field_path: True})
-                    elif _filter == "_in":
-                        query = query.find({field_path: {"$in": value}})
-                    elif _filter == "gt":
-                        query = query.find({field_path: {"$gt": value}})
-                    elif _filter == "gte":
-                        query = query.find({field_path: {"$gte": value}})
-                    elif _filter == "lt":
-                        query = query.find({field_path: {"$lt": value}})
-                    elif _filter == "lte":
-                        query = query.find({field_path: {"$lte": value}})
 
-    return query
+def compile_filter(model: Type[Document], filters: BaseFilter) -> dict:
+    """
+    Translate a filter into a single match document. The translation is cached by the filter, so repeated filters,
+    like the browser's country and building type selections, are validated and planned once.
+    """
+
+    canonical = json.dumps(dict(filters.items()), sort_keys=True, default=str, separators=(",", ":"))
+    # The cached match is shared, so every query gets its own copy
+    return copy.deepcopy(_compile_filter(model.__name__, canonical))
+
+
+@lru_cache(maxsize=1024)
+def _compile_filter(model_name: str, canonical: str) -> dict:
+    fields = FILTER_FIELDS.get(model_name)
+    if fields is None:
+        raise InvalidOperationError(message=f"{model_name} cannot be filtered", name="Filter")
+
+    predicates = []
+    for _filter, values in json.loads(canonical).items():
+        if not isinstance(values, dict):
+            raise InvalidOperationError(message=f"{_filter} takes an object of fields and values", name="Filter")
+
+        for _field, value in values.items():
+            if _field not in fields:
+                raise InvalidOperationError(message=f"Filtering by {_field} is not supported", name="Filter")
+            if (predicate := _compile_predicate(_filter, fields[_field], value)) is not None:
+                logger.debug(f"Filtering {_filter} by {_field}: {predicate}")
+                predicates.append(predicate)
+
+    return _merge_predicates(predicates)
+
+
+def _compile_predicate(_filter: str, field: FilterField, value: Any) -> tuple[str, Any] | None:
+    if _filter == "contains":
+        if field.kind == "country":
+            # No matching country matches no projects
+            return field.path, {"$in": get_matching_country_codes(str(value))}
+        if field.kind == "search":
+            # Searchable fields match on the indexed prefixes of their words, not with a scan
+            if terms := query_terms(field.search_field, str(value)):
+                return field.search_terms_path, {"$all": terms}
+            condition = short_query_condition(field.search_field, str(value))
+            return (field.search_terms_path, condition) if condition is not None else None
+        return field.path, {"$regex": re.escape(str(value)), "$options": "i"}
+    if _filter == "starts_with":
+        return field.path, {"$regex": f"^{re.escape(str(value))}"}
+    if _filter == "ends_with":
+        return field.path, {"$regex": f"{re.escape(str(value))}$"}
+    if _filter == "is_true":
+        return field.path, True
+    if _filter == "equal":
+        return field.path, _convert_value(field, value)
+    if _filter == "_in":
+        if not isinstance(value, list):
+            raise InvalidOperationError(message=f"in takes a list of values for {field.path}", name="Filter")
+        return field.path, {"$in": [_convert_value(field, item) for item in value]}
+    if _filter in COMPARISON_OPERATORS:
+        return field.path, {COMPARISON_OPERATORS[_filter]: _convert_value(field, value)}
+    raise InvalidOperationError(message=f"Unknown filter {_filter}", name="Filter")
+
+
+def _convert_value(field: FilterField, value: Any) -> Any:
+    try:
+        if field.kind == "uuid" and value is not None:
+            return UUID(str(value))
+        if field.kind == "datetime" and isinstance(value, str):
+            return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidOperationError(message=f"Invalid value for {field.path}: {value!r}", name="Filter")
+    if field.kind == "country" and isinstance(value, str):
+        return COUNTRY_CODES.get(fold(value), value.lower())
+    return value
+
+
+def _merge_predicates(predicates: list[tuple[str, Any]]) -> dict:
+    """
+    Combine predicates into one match document. Operators on the same field are merged, e.g. gte and lt of a range,
+    other predicates on a field that is already matched are combined with $and.
+    """
+
+    match = {}
+    conjunction = []
+    for path, condition in predicates:
+        current = match.get(path)
+        if path not in match:
+            match[path] = condition
+        elif _is_operator(current) and _is_operator(condition) and not current.keys() & condition.keys():
+            match[path] = {**current, **condition}
+        else:
+            conjunction.append({path: condition})
+
+    if conjunction:
+        match["$and"] = conjunction
+    return match
+
+
+def _is_operator(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def search_ranking(model: Type[Document], filters: BaseFilter | None) -> list[dict]:
+    """
+    Stages that order the matches of a contains search by the number of searched words they contain as whole words,
+    so "school" ranks "School Aarhus" above "Schoolyard". Without a search, nothing is ranked.
+    Every match is ranked, carrying only its id and search terms. Followed by the $skip and $limit of a page, the sort
+    keeps only the best offset + limit matches in memory.
+    """
+
+    fields = FILTER_FIELDS.get(model.__name__, {})
+    searched = []
+    if filters and isinstance(contains := getattr(filters, "contains", UNSET), dict):
+        searched = [
+            (fields[_field], value)
+            for _field, value in contains.items()
+            if _field in fields and fields[_field].kind == "search" and value is not UNSET
+        ]
+    if not searched:
+        return []
+
+    terms = [term for field, value in searched for term in ranking_terms(field.search_field, str(value))]
+    path = searched[0][0].search_terms_path
+    return [
+        {"$project": {path: 1}},
+        {"$addFields": {"_searchScore": {"$size": {"$setIntersection": [{"$ifNull": [f"${path}", []]}, terms]}}}},
+        {"$sort": {"_searchScore": -1, "_id": 1}},
+    ]
+
+
+# Map frontend field paths to database paths
+SORT_FIELD_MAPPING = {
+    # "name": "project.name",  # Not working
+    "project.location.countryName": "project.location.country",
+    "project.projectInfo.buildingType": "project.projectInfo.buildingType",
+    "uploadedAt": "uploadedAt",
+    "public": "public",
+    "project.lifeCycleStages": "project.lifeCycleStages",
+    "project.impactCategories": "project.impactCategories",
+}
 
 
 def sort_model_query(
@@ -125,19 +293,8 @@ def sort_model_query(
             if not field:
                 continue
 
-            # Map frontend field paths to database paths
-            field_mappings = {
-                # "name": "project.name",  # Not working
-                "project.location.countryName": "project.location.country",
-                "project.projectInfo.buildingType": "project.projectInfo.buildingType",
-                "uploadedAt": "uploadedAt",
-                "public": "public",
-                "project.lifeCycleStages": "project.lifeCycleStages",
-                "project.impactCategories": "project.impactCategories",
-            }
-
             # Get the correct field path or use the original if no mapping exists
-            field_path = field_mappings.get(field, field)
+            field_path = SORT_FIELD_MAPPING.get(field, field)
 
             logger.debug(f"Sorting {field_path} by {sort_direction}")
 
@@ -150,6 +307,99 @@ def sort_model_query(
     return query
 
 
+def get_sort_key(sort_by: BaseFilter | None) -> tuple[str, int]:
+    """Get the database path and direction of the active sort. Without a sort, documents are ordered by _id"""
+
+    if sort_by:
+        if sort_by.asc:
+            return SORT_FIELD_MAPPING.get(sort_by.asc, sort_by.asc), 1
+        if sort_by.dsc:
+            return SORT_FIELD_MAPPING.get(sort_by.dsc, sort_by.dsc), -1
+    return "_id", 1
+
+
+def encode_cursor(sort_by: BaseFilter | None, document: Document) -> str:
+    """Encode the sort key value and id of a document into an opaque pagination cursor"""
+
+    field_path, _ = get_sort_key(sort_by)
+
+    value = document.model_dump(by_alias=True)
+    for key in field_path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    if isinstance(value, Enum):
+        value = value.value
+
+    payload = json_util.dumps(
+        {"field": field_path, "value": value, "id": document.id}, json_options=CURSOR_JSON_OPTIONS
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, Any, Any]:
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(cursor.encode()), json_options=CURSOR_JSON_OPTIONS)
+        return payload["field"], payload["value"], payload["id"]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise InvalidOperationError(message=f"Invalid cursor: {cursor}", name="Cursor")
+
+
+def keyset_model_query(
+    model: Type[Document],
+    sort_by: BaseFilter | None,
+    after: str | None,
+    query: FindMany[FindQueryResultType] | None = None,
+) -> FindMany[FindQueryResultType]:
+    """Sort by the active sort key with _id as tiebreaker and continue after the cursor, if any"""
+
+    if query is None:
+        query = model.find_all(fetch_links=True)
+
+    field_path, direction = get_sort_key(sort_by)
+    operator = "$gt" if direction == 1 else "$lt"
+
+    if after:
+        cursor_field, value, last_id = decode_cursor(after)
+        if cursor_field != field_path:
+            raise InvalidOperationError(message=f"Cursor was created for sorting by {cursor_field}", name="Cursor")
+
+        if field_path == "_id":
+            query = query.find({"_id": {operator: last_id}})
+        elif value is None and direction == 1:
+            # null sorts before all other values
+            query = query.find({"$or": [{field_path: {"$ne": None}}, {field_path: None, "_id": {operator: last_id}}]})
+        elif value is None:
+            query = query.find({field_path: None, "_id": {operator: last_id}})
+        else:
+            query = query.find(
+                {"$or": [{field_path: {operator: value}}, {field_path: value, "_id": {operator: last_id}}]}
+            )
+
+    if field_path == "_id":
+        return query.sort([("_id", direction)])
+    return query.sort([(field_path, direction), ("_id", direction)])
+
+
+async def count_model_query(query: FindMany[FindQueryResultType], public_field: str = "public") -> dict[str, int]:
+    """Count all, public and private documents of a query in a single $facet aggregation"""
+
+    result = await query.aggregate(
+        [
+            {
+                "$facet": {
+                    "count": [{"$count": "value"}],
+                    "public_count": [{"$match": {public_field: True}}, {"$count": "value"}],
+                }
+            }
+        ]
+    ).to_list()
+
+    facets = result[0] if result else {}
+    count = facets["count"][0]["value"] if facets.get("count") else 0
+    public_count = facets["public_count"][0]["value"] if facets.get("public_count") else 0
+
+    return {"count": count, "public_count": public_count, "private_count": count - public_count}
+
+
 def to_camel(string: str) -> str:
     return "".join(word.capitalize() for word in string.split("_"))
 
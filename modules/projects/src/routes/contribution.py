@@ -0,0 +1,31 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Request
+from supertokens_python.recipe.session import SessionContainer
+from supertokens_python.recipe.session.framework.fastapi import verify_session
+
+from core.context import get_session_user
+from logic.upload import upload_contributions
+
+contribution_router = APIRouter(
+    prefix="/contributions",
+)
+
+
+@contribution_router.post("/upload")
+async def upload_contributions_route(
+    request: Request, session: Annotated[SessionContainer, Depends(verify_session())], public: bool = False
+) -> dict:
+    """
+    Upload LCAx projects as contributions. The body is a project, a JSON array of projects or NDJSON,
+    optionally gzipped. It is parsed and written while it streams in, in batches of UPLOAD_BATCH_SIZE projects.
+    An invalid project fails the upload with a 400, but the batches before it stay stored: the response then has the
+    count and ids of the stored contributions, which are the first projects of the body in order.
+    """
+
+    user = await get_session_user(session.get_user_id())
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+
+    contributions = await upload_contributions(request.stream(), user, public, gzipped)
+
+    return {"count": len(contributions), "contributions": [str(_id) for _id in contributions]}
@@ -1,8 +1,7 @@
-from typing import Any
+from fastapi import APIRouter, Request, Response
 
-from fastapi import APIRouter
-
-from logic import serialize_openbdf_schema
+from core.config import settings
+from logic.openbdf import get_openbdf_document, select_encoding
 
 openbdf_router = APIRouter(
     prefix="/openbdf",
@@ -10,5 +9,27 @@ openbdf_router = APIRouter(
 
 
 @openbdf_router.get("")
-async def get_openbdf_schema() -> Any:
-    return await serialize_openbdf_schema()
+async def get_openbdf_schema(request: Request) -> Response:
+    """
+    The OpenBDF JSON schema, served from the bytes serialized at startup. Clients revalidate with the ETag and get a 304,
+    and the gzip and brotli variants are compressed once.
+    """
+
+    document = get_openbdf_document()
+    encoding = select_encoding(request.headers.get("accept-encoding"), document.bodies)
+    headers = {
+        "ETag": document.etags[encoding],
+        "Cache-Control": f"public, max-age={settings.OPENBDF_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+
+    # Every variant holds the same schema, so the ETag of any of them is current
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or tags & set(document.etags.values()):
+            return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=document.bodies[encoding], media_type="application/json", headers=headers)
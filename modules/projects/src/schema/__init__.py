@@ -3,9 +3,23 @@ from uuid import UUID
 
 import strawberry
 
-from models import GraphQLContribution, GraphQLResponse, GraphQLProject, GraphQLUser
-from schema.contribution import add_contributions_mutation, delete_contributions_mutation, update_contributions_mutation
+from models import (
+    GraphQLContribution,
+    GraphQLContributionJob,
+    GraphQLResponse,
+    GraphQLProject,
+    GraphQLProjectCluster,
+    GraphQLUser,
+)
+from schema.contribution import (
+    add_contributions_mutation,
+    contribution_job_query,
+    delete_contributions_mutation,
+    enqueue_contributions_mutation,
+    update_contributions_mutation,
+)
 from schema.permisions import IsAuthenticated
+from schema.project import project_clusters_query
 
 
 @strawberry.type
@@ -20,6 +34,17 @@ class Query:
     async def contributions(self) -> GraphQLResponse[GraphQLContribution]:
         return GraphQLResponse(GraphQLContribution)
 
+    project_clusters: list[GraphQLProjectCluster] = strawberry.field(
+        resolver=project_clusters_query,
+        description=getdoc(project_clusters_query),
+        permission_classes=[IsAuthenticated],
+    )
+    contribution_job: GraphQLContributionJob | None = strawberry.field(
+        resolver=contribution_job_query,
+        description=getdoc(contribution_job_query),
+        permission_classes=[IsAuthenticated],
+    )
+
 
 @strawberry.type
 class Mutation:
@@ -28,6 +53,11 @@ class Mutation:
         description=getdoc(add_contributions_mutation),
         permission_classes=[IsAuthenticated],
     )
+    enqueue_contributions: GraphQLContributionJob = strawberry.field(
+        resolver=enqueue_contributions_mutation,
+        description=getdoc(enqueue_contributions_mutation),
+        permission_classes=[IsAuthenticated],
+    )
     delete_contributions: list[UUID] = strawberry.field(
         resolver=delete_contributions_mutation,
         description=getdoc(delete_contributions_mutation),
@@ -4,11 +4,12 @@ from strawberry.types import Info
 
 from core.context import get_user
 from logic import create_contributions, delete_contributions, update_contributions
-from models import GraphQLContribution, InputContribution, UpdateContribution
+from logic.jobs import enqueue_contributions, get_contribution_job
+from models import GraphQLContribution, GraphQLContributionJob, InputContribution, UpdateContribution
 
 
 async def add_contributions_mutation(info: Info, contributions: list[InputContribution]) -> list[GraphQLContribution]:
-    """Creates new Contributions"""
+    """Creates new Contributions. Large uploads can be queued with enqueueContributions instead"""
 
     user = get_user(info)
 
@@ -17,6 +18,24 @@ async def add_contributions_mutation(info: Info, contributions: list[InputContri
     return _contributions
 
 
+async def enqueue_contributions_mutation(info: Info, contributions: list[InputContribution]) -> GraphQLContributionJob:
+    """Queues new Contributions to be created in the background and returns the job tracking them"""
+
+    user = get_user(info)
+    job = await enqueue_contributions(contributions, user)
+
+    return job
+
+
+async def contribution_job_query(info: Info, id: UUID) -> GraphQLContributionJob | None:
+    """Returns the progress of a contribution job of the user's organization"""
+
+    user = get_user(info)
+    job = await get_contribution_job(id, user)
+
+    return job
+
+
 async def delete_contributions_mutation(info: Info, contributions: list[UUID]) -> list[UUID]:
     """Deletes Contributions"""
 
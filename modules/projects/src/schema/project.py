@@ -0,0 +1,23 @@
+from strawberry.types import Info
+
+from core.context import get_user
+from logic.cache import cache_key, result_cache
+from models import FilterBy, GraphQLProjectCluster, InputBoundingBox
+from models.database.methods import cluster_projects
+
+
+async def project_clusters_query(
+    info: Info, bbox: InputBoundingBox, zoom: int, filter_by: FilterBy | None = None
+) -> list[GraphQLProjectCluster]:
+    """Returns the projects in a bounding box clustered for a map at the zoom level, largest first. A box with a west greater than its east crosses the antimeridian"""
+
+    user = get_user(info)
+    organization_id = user.organization_id
+
+    arguments = [bbox.west, bbox.south, bbox.east, bbox.north, zoom, repr(filter_by)]
+    clusters = await result_cache.get(
+        cache_key("clusters", organization_id, arguments),
+        lambda: cluster_projects(organization_id, bbox.west, bbox.south, bbox.east, bbox.north, zoom, filter_by),
+    )
+
+    return clusters
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+import logging
+
+from core.config import settings
+from core.connection import init_documents
+from logic.jobs import run_worker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("main")
+
+
+async def main(workers: int) -> None:
+    await init_documents()
+
+    logger.info(f"Starting {workers} contribution workers")
+    await asyncio.gather(*(run_worker(f"worker-{index}") for index in range(workers)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued contribution jobs from the jobs collection")
+    parser.add_argument("--workers", type=int, default=max(settings.INGEST_WORKERS, 1))
+    args = parser.parse_args()
+
+    asyncio.run(main(args.workers))
@@ -1,3 +1,4 @@
+import asyncio
 import json
 
 import pytest
@@ -41,6 +42,34 @@ async def test_contributions_query(client: AsyncClient, contributions):
     assert "user" in data["data"]["contributions"]["items"][0]
 
 
+@pytest.mark.asyncio
+async def test_contributions_query_counts(client: AsyncClient, contributions):
+    query = """
+        query {
+            contributions {
+                count
+                publicCount
+                privateCount
+            }
+        }
+    """
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={
+            "query": query,
+        },
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    assert data["data"]["contributions"]["count"] == len(contributions)
+    assert data["data"]["contributions"]["publicCount"] == 0
+    assert data["data"]["contributions"]["privateCount"] == len(contributions)
+
+
 @pytest.mark.asyncio
 async def test_add_contributions_mutation(client: AsyncClient, datafix_dir):
     query = """
@@ -77,6 +106,96 @@ async def test_add_contributions_mutation(client: AsyncClient, datafix_dir):
     assert "id" in data["data"]["addContributions"][0]["user"]
 
 
+@pytest.mark.asyncio
+async def test_add_contributions_mutation_batch(client: AsyncClient, datafix_dir):
+    query = """
+        mutation($contributions: [InputContribution!]!) {
+            addContributions(contributions: $contributions) {
+                id
+                project {
+                    id
+                    assemblies {
+                        id
+                        products {
+                            id
+                        }
+                    }
+                }
+            }
+        }
+    """
+    input_project = json.loads((datafix_dir / "project.json").read_text())
+
+    # The same project twice in one batch, as in a re-upload, is written once
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={
+            "query": query,
+            "variables": {"contributions": [{"project": input_project}, {"project": input_project}]},
+        },
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors"), f"GraphQL errors: {data.get('errors')}"
+    contributions = data["data"]["addContributions"]
+    assert len(contributions) == 2
+    assert contributions[0]["id"] != contributions[1]["id"]
+    assert contributions[0]["project"]["id"] == input_project["id"]
+    assert len(contributions[0]["project"]["assemblies"]) == len(input_project["assemblies"])
+
+
+@pytest.mark.asyncio
+async def test_enqueue_contributions_mutation(client: AsyncClient, datafix_dir):
+    mutation = """
+        mutation($contributions: [InputContribution!]!) {
+            enqueueContributions(contributions: $contributions) {
+                id
+                status
+                total
+            }
+        }
+    """
+    query = """
+        query($id: UUID!) {
+            contributionJob(id: $id) {
+                status
+                processed
+                failed
+                contributions
+                throughput
+            }
+        }
+    """
+    input_project = json.loads((datafix_dir / "project.json").read_text())
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": mutation, "variables": {"contributions": [{"project": input_project}]}},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert not data.get("errors"), f"GraphQL errors: {data.get('errors')}"
+    job = data["data"]["enqueueContributions"]
+    assert job["total"] == 1
+
+    for _ in range(50):
+        response = await client.post(
+            f"{settings.API_STR}/graphql", json={"query": query, "variables": {"id": job["id"]}}
+        )
+        job = response.json()["data"]["contributionJob"]
+        if job["status"] in ("COMPLETED", "FAILED"):
+            break
+        await asyncio.sleep(0.1)
+
+    assert job["status"] == "COMPLETED"
+    assert job["processed"] == 1
+    assert job["failed"] == 0
+    assert len(job["contributions"]) == 1
+
+
 @pytest.mark.asyncio
 async def test_contributions_query_filter(client: AsyncClient, contributions):
     query = """
@@ -197,3 +316,65 @@ async def test_update_contributions_mutation(client: AsyncClient, contributions)
     assert len(data.get("data", {}).get("updateContributions")) == 1
 
     assert data.get("data", {}).get("updateContributions")[0].get("public") is True
+
+
+@pytest.mark.asyncio
+async def test_delete_contributions_removes_projects(client: AsyncClient, contributions):
+    mutation = """
+        mutation($contributions: [UUID!]!) {
+            deleteContributions(contributions: $contributions)
+        }
+    """
+    query = """
+        query {
+            projects {
+                count
+            }
+        }
+    """
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": mutation, "variables": {"contributions": [str(contributions[0].id)]}},
+    )
+    assert response.status_code == 200
+    assert not response.json().get("errors")
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query})
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    assert data["data"]["projects"]["count"] == len(contributions) - 1
+
+
+@pytest.mark.asyncio
+async def test_delete_contributions_cascades(client: AsyncClient, contributions):
+    from models import DBAssembly, DBProduct, DBProject, DBProjectSummary
+
+    mutation = """
+        mutation($contributions: [UUID!]!) {
+            deleteContributions(contributions: $contributions)
+        }
+    """
+
+    # The test projects share their assemblies, so they are kept while one project still links to them
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": mutation, "variables": {"contributions": [str(contributions[0].id)]}},
+    )
+    assert not response.json().get("errors")
+    assert await DBProject.count() == len(contributions) - 1
+    assert await DBProjectSummary.count() == len(contributions) - 1
+    assert await DBAssembly.count() > 0
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": mutation, "variables": {"contributions": [str(c.id) for c in contributions[1:]]}},
+    )
+    assert not response.json().get("errors")
+    assert await DBProject.count() == 0
+    assert await DBProjectSummary.count() == 0
+    assert await DBAssembly.count() == 0
+    assert await DBProduct.count() == 0
@@ -0,0 +1,46 @@
+import pytest
+
+from logic.gc import collect_orphans
+from logic.ingest import insert_contributions
+from models import DBAssembly, DBContribution, DBProject
+
+
+@pytest.mark.asyncio
+async def test_collect_orphans(contributions):
+    # Delete a contribution without its project, as older releases did
+    await DBContribution.get_motor_collection().delete_one({"_id": contributions[0].id})
+
+    collected = await collect_orphans(batch_size=2, delay=0)
+
+    assert collected["DBProject"].count == 1
+    assert collected["DBProject"].bytes > 0
+    assert await DBProject.count() == len(contributions) - 1
+    # The assemblies are shared with the other projects
+    assert collected["DBAssembly"].count == 0
+    assert await DBAssembly.count() > 0
+
+
+@pytest.mark.asyncio
+async def test_collect_orphans_dry_run(contributions):
+    await DBContribution.get_motor_collection().delete_many({})
+
+    collected = await collect_orphans(delay=0, dry_run=True)
+
+    assert collected["DBProject"].count == len(contributions)
+    assert await DBProject.count() == len(contributions)
+
+
+@pytest.mark.asyncio
+async def test_collect_orphans_grace_period(create_user, projects):
+    # Written by an upload whose contributions are not written yet
+    contributions = [
+        DBContribution(user_id=create_user.id, organization_id=create_user.organization_id, project=project)
+        for project in projects
+    ]
+    await insert_contributions(contributions)
+    await DBContribution.get_motor_collection().delete_many({})
+
+    collected = await collect_orphans(delay=0)
+
+    assert collected["DBProject"].count == 0
+    assert await DBProject.count() >= len(projects)
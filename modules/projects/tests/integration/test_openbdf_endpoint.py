@@ -14,3 +14,30 @@ async def test_openbdf(client_unauthenticated: AsyncClient):
     assert data
 
     assert data.get("title") == "Project"
+
+
+@pytest.mark.asyncio
+async def test_openbdf_brotli(client_unauthenticated: AsyncClient):
+    response = await client_unauthenticated.get(f"{settings.API_STR}/openbdf", headers={"Accept-Encoding": "br"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json().get("title") == "Project"
+
+
+@pytest.mark.asyncio
+async def test_openbdf_revalidation(client_unauthenticated: AsyncClient):
+    response = await client_unauthenticated.get(f"{settings.API_STR}/openbdf", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"].startswith("public")
+    assert response.json().get("title") == "Project"
+
+    response = await client_unauthenticated.get(
+        f"{settings.API_STR}/openbdf", headers={"If-None-Match": response.headers["etag"]}
+    )
+
+    assert response.status_code == 304
+    assert not response.content
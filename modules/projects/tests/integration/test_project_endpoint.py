@@ -1,7 +1,9 @@
 import pytest
+from beanie import WriteRules
 from httpx import AsyncClient
 
 from core.config import settings
+from models import DBContribution
 
 
 @pytest.mark.asyncio
@@ -76,6 +78,148 @@ async def test_projects_query_filter(client: AsyncClient, contributions, project
     assert data.get("data", {}).get("projects", {}).get("items", [])[0].get("id") == str(projects[0].id)
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("search, found", [("EKSEM", True), ("test eks", True), ("eksempler", False), ("(eks", True)])
+async def test_projects_query_search(client: AsyncClient, contributions, projects, search, found):
+    query = """
+        query($search: JSON!) {
+            projects {
+                items(filterBy: {contains: {name: $search}}) {
+                    id
+                    name
+                }
+            }
+        }
+    """
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": query, "variables": {"search": search}},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    assert len(data.get("data", {}).get("projects", {}).get("items")) == (len(projects) if found else 0)
+
+
+@pytest.mark.asyncio
+async def test_projects_query_coordinates(client: AsyncClient, contributions, projects):
+    query = """
+        query {
+            projects {
+                items {
+                    location {
+                        coordinates {
+                            latitude
+                            longitude
+                            precision
+                        }
+                    }
+                }
+            }
+        }
+    """
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query})
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    # The coordinates were stored when the contributions were inserted
+    for item in data["data"]["projects"]["items"]:
+        coordinates = item["location"]["coordinates"]
+        assert coordinates["latitude"] != 0.0
+        assert coordinates["longitude"] != 0.0
+        assert coordinates["precision"] in ("city", "country")
+
+
+@pytest.mark.asyncio
+async def test_projects_query_city_coordinates(client: AsyncClient, projects, create_user):
+    project = projects[0]
+    project.location.city = "Copenhagen"
+    contribution = DBContribution(user_id=create_user.id, organization_id=create_user.organization_id, project=project)
+    await contribution.insert(link_rule=WriteRules.WRITE)
+
+    query = """
+        query {
+            projects {
+                items {
+                    location {
+                        coordinates {
+                            latitude
+                            longitude
+                            precision
+                        }
+                    }
+                }
+            }
+        }
+    """
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query})
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    (item,) = data["data"]["projects"]["items"]
+    coordinates = item["location"]["coordinates"]
+    assert coordinates["precision"] == "city"
+    assert (coordinates["latitude"], coordinates["longitude"]) == (
+        pytest.approx(55.68, abs=0.05),
+        pytest.approx(12.57, abs=0.05),
+    )
+
+
+@pytest.mark.asyncio
+async def test_project_clusters_query(client: AsyncClient, contributions, projects):
+    query = """
+        query {
+            projectClusters(bbox: {west: -180, south: -90, east: 180, north: 90}, zoom: 0) {
+                count
+                latitude
+                longitude
+                bounds {
+                    west
+                    east
+                }
+                projectId
+            }
+        }
+    """
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query})
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    clusters = data["data"]["projectClusters"]
+    assert sum(cluster["count"] for cluster in clusters) == len(projects)
+    for cluster in clusters:
+        assert cluster["bounds"]["west"] <= cluster["longitude"] <= cluster["bounds"]["east"]
+        assert (cluster["projectId"] is not None) == (cluster["count"] == 1)
+
+
+@pytest.mark.asyncio
+async def test_project_clusters_query_invalid_zoom(client: AsyncClient, contributions):
+    query = """
+        query {
+            projectClusters(bbox: {west: 0, south: 0, east: 10, north: 10}, zoom: 40) {
+                count
+            }
+        }
+    """
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query})
+
+    assert response.status_code == 200
+    assert response.json().get("errors")
+
+
 @pytest.mark.asyncio
 async def test_projects_query_sort(client: AsyncClient, contributions, projects):
     query = """
@@ -134,6 +278,43 @@ async def test_projects_query_offset(client: AsyncClient, contributions, project
     assert data.get("data", {}).get("projects", {}).get("items", [])[0].get("id") == str(projects[2].id)
 
 
+@pytest.mark.asyncio
+async def test_projects_query_cursor(client: AsyncClient, contributions, projects):
+    query = """
+        query($after: String) {
+            projects {
+                items(first: 2, after: $after, sortBy: {dsc: "uploadedAt"}) {
+                    id
+                }
+                pageInfo(first: 2, after: $after, sortBy: {dsc: "uploadedAt"}) {
+                    endCursor
+                    hasNextPage
+                }
+            }
+        }
+    """
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query, "variables": {"after": None}})
+
+    assert response.status_code == 200
+    first_page = response.json()["data"]["projects"]
+    assert len(first_page["items"]) == 2
+    assert first_page["pageInfo"]["hasNextPage"] is True
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": query, "variables": {"after": first_page["pageInfo"]["endCursor"]}},
+    )
+
+    assert response.status_code == 200
+    second_page = response.json()["data"]["projects"]
+    assert len(second_page["items"]) == 1
+    assert second_page["pageInfo"]["hasNextPage"] is False
+    assert {item["id"] for item in first_page["items"] + second_page["items"]} == {
+        str(project.id) for project in projects
+    }
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize("group_by", ["name", "location.country"])
 async def test_projects_query_groups(client: AsyncClient, contributions, projects, group_by):
@@ -168,6 +349,43 @@ async def test_projects_query_groups(client: AsyncClient, contributions, project
     assert len(data.get("data", {}).get("projects", {}).get("groups")[0].get("items", [])) == 2
 
 
+@pytest.mark.asyncio
+async def test_projects_query_facets(client: AsyncClient, contributions, projects):
+    query = """
+        query($fields: [String!]!) {
+            projects {
+                facets(fields: $fields, limit: 2) {
+                    items {
+                        id
+                    }
+                    facets {
+                        field
+                        buckets {
+                            value
+                            count
+                        }
+                    }
+                }
+            }
+        }
+    """
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": query, "variables": {"fields": ["location.country", "lifeCycleStages"]}},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    facets = data["data"]["projects"]["facets"]
+    assert len(facets["items"]) == 2
+    assert [facet["field"] for facet in facets["facets"]] == ["location.country", "lifeCycleStages"]
+    assert sum(bucket["count"] for bucket in facets["facets"][0]["buckets"]) == len(projects)
+    assert facets["facets"][1]["buckets"]
+
+
 @pytest.mark.asyncio
 async def test_projects_query_aggregate(client: AsyncClient, contributions, projects):
     query = """
@@ -193,6 +411,31 @@ async def test_projects_query_aggregate(client: AsyncClient, contributions, proj
     assert data.get("data", {}).get("projects", {}).get("aggregation", [])[0].get("value") == 50
 
 
+@pytest.mark.asyncio
+async def test_projects_query_aggregate_intensities(client: AsyncClient, contributions, projects):
+    query = """
+        query($aggregation: JSON!) {
+            projects {
+                aggregation(apply: $aggregation)
+            }
+        }
+    """
+
+    # The test project has a gwp a1a3 result of 22 on a gross floor area of 100 m²
+    aggregation = [{"$group": {"_id": None, "value": {"$avg": "$intensities.gwp.a1a3"}}}]
+
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": query, "variables": {"aggregation": aggregation}},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    assert data.get("data", {}).get("projects", {}).get("aggregation", [])[0].get("value") == pytest.approx(0.22)
+
+
 @pytest.mark.asyncio
 async def test_projects_query_group_aggregate(client: AsyncClient, contributions, projects):
     query = """
@@ -278,6 +521,45 @@ async def test_projects_query_aggregation_advanced(client: AsyncClient, contribu
     assert data.get("data", {}).get("projects", {}).get("aggregation", [])[0].get("average") == 50
 
 
+@pytest.mark.asyncio
+async def test_projects_query_aggregation_rejects_lookup(client: AsyncClient, contributions, projects):
+    query = """
+        query($aggregation: JSON!) {
+            projects {
+                aggregation(apply: $aggregation)
+            }
+        }
+    """
+
+    aggregation = [{"$lookup": {"from": "DBContribution", "localField": "_id", "foreignField": "_id", "as": "c"}}]
+    response = await client.post(
+        f"{settings.API_STR}/graphql",
+        json={"query": query, "variables": {"aggregation": aggregation}},
+    )
+
+    assert response.status_code == 200
+    assert "$lookup is not allowed" in response.json()["errors"][0]["message"]
+
+
+@pytest.mark.asyncio
+async def test_projects_query_groups_rejects_unsupported_field(client: AsyncClient, contributions, projects):
+    query = """
+        query {
+            projects {
+                groups(groupBy: "projectPhase") {
+                    group
+                    count
+                }
+            }
+        }
+    """
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query})
+
+    assert response.status_code == 200
+    assert "projectPhase is not a field of the project summaries" in response.json()["errors"][0]["message"]
+
+
 @pytest.mark.asyncio
 async def test_project_metadata_query(client: AsyncClient, metadata_project):
     query = """
@@ -528,3 +810,49 @@ async def test_project_metadata_query(client: AsyncClient, metadata_project):
 
     assert not data.get("errors")
     assert data.get("data", {}).get("projects", {}).get("items")
+
+
+@pytest.mark.asyncio
+async def test_projects_query_embedded(client: AsyncClient, projects, create_user, monkeypatch):
+    from logic.ingest import insert_contributions
+    from models import DBAssembly, DBContribution
+
+    monkeypatch.setattr(settings, "PROJECT_STORAGE", "embedded")
+    await insert_contributions(
+        [
+            DBContribution(user_id=create_user.id, organization_id=create_user.organization_id, project=project)
+            for project in projects
+        ]
+    )
+    assert await DBAssembly.count() == 0
+
+    query = """
+        query {
+            projects {
+                items {
+                    id
+                    assemblies {
+                        id
+                        products {
+                            id
+                            impactData {
+                                ...on EPD {
+                                    id
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    """
+
+    response = await client.post(f"{settings.API_STR}/graphql", json={"query": query})
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert not data.get("errors")
+    items = data.get("data", {}).get("projects", {}).get("items")
+    assert len(items) == len(projects)
+    assert items[0]["assemblies"][0]["products"][0]["impactData"]["id"]
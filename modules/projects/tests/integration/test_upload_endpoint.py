@@ -0,0 +1,60 @@
+import gzip
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from core.config import settings
+
+
+@pytest.mark.asyncio
+async def test_upload_ndjson(client: AsyncClient, datafix_dir):
+    project = json.loads((datafix_dir / "project.json").read_text())
+    body = "\n".join(json.dumps(project) for _ in range(3))
+
+    response = await client.post(f"{settings.API_STR}/contributions/upload", content=body.encode())
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_upload_gzip(client: AsyncClient, datafix_dir):
+    project = json.loads((datafix_dir / "project.json").read_text())
+
+    response = await client.post(
+        f"{settings.API_STR}/contributions/upload",
+        params={"public": True},
+        content=gzip.compress(json.dumps([project]).encode()),
+        headers={"Content-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_upload_invalid_project(client: AsyncClient):
+    response = await client.post(f"{settings.API_STR}/contributions/upload", content=b'{"name": "Not a project"}')
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_upload_invalid_project_after_batch(client: AsyncClient, datafix_dir, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_BATCH_SIZE", 1)
+    project = json.loads((datafix_dir / "project.json").read_text())
+    body = "\n".join([json.dumps(project), json.dumps({"name": "Not a project"})])
+
+    response = await client.post(f"{settings.API_STR}/contributions/upload", content=body.encode())
+
+    assert response.status_code == 400
+    assert response.json()["count"] == 1
+    assert len(response.json()["contributions"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_upload_unauthenticated(client_unauthenticated: AsyncClient):
+    response = await client_unauthenticated.post(f"{settings.API_STR}/contributions/upload", content=b"{}")
+
+    assert response.status_code == 401
@@ -1 +1,15 @@
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
 
+from core.config import settings
+from core.connection import get_document_models
+
+
+@pytest.fixture
+async def mock_database():
+    """The document models on an in-memory database, for tests that do not need a Mongo server"""
+
+    client = AsyncMongoMockClient(uuidRepresentation="standard")
+    await init_beanie(database=client[settings.MONGO_DB], document_models=get_document_models())
+    yield client[settings.MONGO_DB]
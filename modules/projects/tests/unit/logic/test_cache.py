@@ -0,0 +1,55 @@
+import pytest
+
+import logic.cache
+from logic.cache import ResultCache, cache_key
+
+
+@pytest.fixture()
+def version(monkeypatch) -> dict:
+    current = {"version": 0}
+
+    async def get_version(name: str = logic.cache.PROJECTS_VERSION) -> int:
+        return current["version"]
+
+    monkeypatch.setattr(logic.cache, "get_version", get_version)
+    return current
+
+
+@pytest.mark.asyncio
+async def test_result_cache(version):
+    cache = ResultCache(maxsize=2)
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        return value
+
+    key = cache_key("groups", None, {"groupBy": "name", "limit": 50})
+    assert await cache.get(key, lambda: compute(1)) == 1
+    assert await cache.get(cache_key("groups", None, {"limit": 50, "groupBy": "name"}), lambda: compute(2)) == 1
+
+    # A write bumps the version, so the result is computed again
+    version["version"] += 1
+    assert await cache.get(key, lambda: compute(3)) == 3
+
+    # The least recently used entry is evicted
+    await cache.get(cache_key("groups", None, "a"), lambda: compute(4))
+    await cache.get(cache_key("groups", None, "b"), lambda: compute(5))
+    assert await cache.get(key, lambda: compute(6)) == 6
+    assert calls == [1, 3, 4, 5, 6]
+
+
+@pytest.mark.asyncio
+async def test_result_cache_failure(version):
+    cache = ResultCache(maxsize=2)
+
+    async def fail():
+        raise ValueError("failed")
+
+    async def compute():
+        return 1
+
+    key = cache_key("aggregation", None, [])
+    with pytest.raises(ValueError):
+        await cache.get(key, fail)
+    assert await cache.get(key, compute) == 1
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from beanie import WriteRules
+
+from logic.geocodes import backfill_coordinates
+from models import DBGeocode, DBLocation, DBProject, DBProjectSummary
+from models.database.db_model import LocationCoordinates
+from models.database.geocodes import geocode_id, geocode_locations
+
+
+@pytest.mark.asyncio
+async def test_geocode_locations_stores_fallback_under_country(app, database):
+    locations = [DBLocation(country="dnk", city="Copenhagen"), DBLocation(country="dnk", city="Testbyen")]
+
+    await geocode_locations(locations)
+
+    assert [location.coordinates.precision for location in locations] == ["city", "country"]
+    assert (await DBGeocode.get(geocode_id("dnk", "Copenhagen"))).precision == "city"
+    assert (await DBGeocode.get(geocode_id("dnk", None))).precision == "country"
+    assert await DBGeocode.get(geocode_id("dnk", "Testbyen")) is None
+
+
+@pytest.mark.asyncio
+async def test_backfill_coordinates_resolves_city_fallbacks(app, database, datafix_dir):
+    # A project and a geocode of its city stored while the gazetteer only had countries
+    fallback = LocationCoordinates(latitude=56.0, longitude=10.0, precision="country")
+    await DBGeocode(
+        id=geocode_id("dnk", "Copenhagen"), country="dnk", city="Copenhagen", **fallback.model_dump()
+    ).insert()
+    project = DBProject(**json.loads((datafix_dir / "project.json").read_text()))
+    project.location = DBLocation(country="dnk", city="Copenhagen", coordinates=fallback)
+    await project.insert(link_rule=WriteRules.WRITE)
+    await DBProjectSummary.from_project(project).insert()
+
+    assert await backfill_coordinates(delay=0) >= 1
+
+    location = (await DBProject.get(project.id)).location
+    assert location.coordinates.precision == "city"
+    assert location.point is not None
+    assert (await DBProjectSummary.get(project.id)).location.coordinates.precision == "city"
+    assert (await DBGeocode.get(geocode_id("dnk", "Copenhagen"))).precision == "city"
+
+    # Nothing is left to resolve
+    assert await backfill_coordinates(delay=0) == 0
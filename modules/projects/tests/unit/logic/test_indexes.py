@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+
+from core.connection import init_documents
+from indexes import main as indexes_main
+from logic.indexes import get_declared_indexes, index_report
+from models import DBContributionJob
+
+
+async def job_indexes() -> dict:
+    return await DBContributionJob.get_motor_collection().index_information()
+
+
+@pytest.fixture()
+async def unindexed_jobs(mongo, database):
+    """The jobs collection without its declared indexes and with an index that no model declares"""
+
+    await init_documents(skip_indexes=True)
+    await DBContributionJob(total=0, user_id=uuid.uuid4(), organization_id=uuid.uuid4()).insert()
+    await DBContributionJob.get_motor_collection().create_index("userId", name="user_id")
+    yield
+
+
+@pytest.mark.asyncio
+async def test_index_report(unindexed_jobs):
+    (report,) = await index_report([DBContributionJob])
+
+    assert report["collection"] == "jobs"
+    assert report["missing"] == get_declared_indexes(DBContributionJob)
+    assert report["undeclared"] == ["user_id"]
+    assert "user_id" in report["unused"]
+    assert "_id_" in report["usage"]
+
+
+@pytest.mark.asyncio
+async def test_indexes_report_only(unindexed_jobs):
+    await indexes_main(reconcile=False)
+
+    assert set(await job_indexes()) == {"_id_", "user_id"}
+
+
+@pytest.mark.asyncio
+async def test_indexes_reconcile(unindexed_jobs):
+    await indexes_main(reconcile=True)
+
+    # The undeclared index is dropped, the declared ones are created and the documents are kept
+    assert set(await job_indexes()) == {"_id_", *get_declared_indexes(DBContributionJob)}
+    assert await DBContributionJob.count() == 1
+    (report,) = await index_report([DBContributionJob])
+    assert report["missing"] == report["undeclared"] == []
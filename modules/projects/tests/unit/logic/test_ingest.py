@@ -0,0 +1,101 @@
+import json
+import uuid
+
+import pytest
+from beanie import Link
+from bson import DBRef
+
+from core.config import settings
+from logic.ingest import content_id, embed_project, flatten_contributions, insert_contributions
+from models import DBEPD, DBAssembly, DBContribution, DBProduct, DBProject
+
+
+@pytest.mark.asyncio
+async def test_flatten_contributions_links_impact_data(create_user, datafix_dir):
+    contributions = []
+    for i in range(2):
+        project = DBProject(**json.loads((datafix_dir / "project.json").read_text()))
+        project.id = uuid.uuid4()
+        for assembly in project.assemblies:
+            for product in assembly.products:
+                # The same dataset uploaded under different ids
+                product.id = uuid.uuid4()
+                product.impact_data.id = uuid.uuid4()
+        contributions.append(
+            DBContribution(user_id=create_user.id, organization_id=create_user.organization_id, project=project)
+        )
+
+    documents = flatten_contributions(contributions)
+
+    products = [product for contribution in contributions for product in contribution.project.assemblies[0].products]
+    assert all(isinstance(product.impact_data, Link) for product in products)
+    assert len({product.impact_data.ref.id for product in products}) == len(documents[DBEPD])
+    assert len(documents[DBEPD]) < len(products)
+    assert all(content_id(epd) == epd.id for epd in documents[DBEPD])
+
+
+@pytest.mark.asyncio
+async def test_insert_contributions_scopes_project_ids(create_user, datafix_dir):
+    data = json.loads((datafix_dir / "project.json").read_text())
+    organizations = [create_user.organization_id, uuid.uuid4()]
+    contributions = [
+        DBContribution(user_id=create_user.id, organization_id=organization_id, project=DBProject(**data))
+        for organization_id in organizations
+    ]
+
+    await insert_contributions(contributions[:1])
+    await insert_contributions(contributions[1:])
+
+    first, second = [contribution.project.id for contribution in contributions]
+    assert first != second
+    assert (await DBProject.get(first)).organization_id == organizations[0]
+    assert (await DBProject.get(second)).organization_id == organizations[1]
+
+    # A re-upload by the second organization replaces its own project
+    again = DBContribution(user_id=create_user.id, organization_id=organizations[1], project=DBProject(**data))
+    await insert_contributions([again])
+    assert again.project.id == second
+
+
+@pytest.mark.asyncio
+async def test_insert_contributions_scopes_shared_assembly_ids(create_user, datafix_dir):
+    data = json.loads((datafix_dir / "project.json").read_text())
+    organizations = [create_user.organization_id, uuid.uuid4()]
+    # Two projects of different organizations that share their assembly and product ids
+    contributions = [
+        DBContribution(user_id=create_user.id, organization_id=organization_id, project=DBProject(**data))
+        for organization_id in organizations
+    ]
+    contributions[1].project.id = uuid.uuid4()
+    assembly_id = contributions[0].project.assemblies[0].id
+    product_id = contributions[0].project.assemblies[0].products[0].id
+
+    await insert_contributions(contributions[:1])
+    await insert_contributions(contributions[1:])
+
+    first, second = [contribution.project for contribution in contributions]
+    assert first.assemblies[0].id == assembly_id
+    assert second.assemblies[0].id != assembly_id
+    assert second.assemblies[0].products[0].id != product_id
+
+    # The assembly of the first organization still holds its own products
+    assembly = await DBAssembly.get(assembly_id)
+    assert [link.ref.id for link in assembly.products] == [product_id]
+    assert await DBAssembly.count() == 2
+    assert await DBProduct.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_embed_project(mock_database, datafix_dir, monkeypatch):
+    project = DBProject(**json.loads((datafix_dir / "project.json").read_text()))
+    flatten_contributions([DBContribution(user_id=uuid.uuid4(), organization_id=uuid.uuid4(), project=project)])
+
+    data = embed_project(project)
+
+    # The impact data stays linked, with a UUID id that the size check encodes
+    product = data["assemblies"][0]["products"][0]
+    assert isinstance(product["impactData"], DBRef)
+    assert len(data["assemblies"]) == len(project.assemblies)
+
+    monkeypatch.setattr(settings, "EMBEDDED_PROJECT_MAX_SIZE", 1024)
+    assert embed_project(project) is None
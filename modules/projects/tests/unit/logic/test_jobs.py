@@ -0,0 +1,70 @@
+import json
+import uuid
+
+import pytest
+
+from core.config import settings
+from logic.jobs import claim_job, finish_job, process_job, release_job
+from models import DBContributionJob, DBContributionJobItem
+from models.database.db_model import JobStatus
+
+
+@pytest.mark.asyncio
+async def test_finish_job_failed_deletes_items(create_user):
+    job = DBContributionJob(total=2, user_id=create_user.id, organization_id=create_user.organization_id)
+    await DBContributionJobItem.insert_many(
+        [DBContributionJobItem(job_id=job.id, index=index, project={}) for index in range(2)]
+    )
+    await job.insert()
+
+    await finish_job(job.id, "The database went away")
+
+    assert (await DBContributionJob.get(job.id)).status == JobStatus.FAILED
+    assert await DBContributionJobItem.find(DBContributionJobItem.job_id == job.id).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_process_job_counts_failed_items_once(create_user, datafix_dir, monkeypatch):
+    async def fail(contributions):
+        raise RuntimeError("The database went away")
+
+    monkeypatch.setattr("logic.jobs.insert_contributions", fail)
+    project = json.loads((datafix_dir / "project.json").read_text())
+    job = DBContributionJob(total=2, user_id=uuid.uuid4(), organization_id=uuid.uuid4())
+    await DBContributionJobItem.insert_many(
+        [
+            DBContributionJobItem(job_id=job.id, index=0, project={}),
+            DBContributionJobItem(job_id=job.id, index=1, project=project),
+        ]
+    )
+    await job.insert()
+
+    await process_job(job)
+
+    job = await DBContributionJob.get(job.id)
+    # The invalid item is not counted again when the batch fails to write
+    assert (job.processed, job.failed) == (2, 2)
+    assert sorted(error.index for error in job.errors) == [0, 1]
+    assert job.status == JobStatus.FAILED
+
+
+@pytest.mark.asyncio
+async def test_release_job_keeps_items(mock_database, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_JOB_MAX_ATTEMPTS", 2)
+    job = DBContributionJob(total=1, user_id=uuid.uuid4(), organization_id=uuid.uuid4())
+    await DBContributionJobItem(job_id=job.id, index=0, project={}).insert()
+    await job.insert()
+    items = DBContributionJobItem.find(DBContributionJobItem.job_id == job.id)
+
+    job = await claim_job()
+    await release_job(job, "The database went away")
+
+    assert (await DBContributionJob.get(job.id)).status == JobStatus.QUEUED
+    assert await items.count() == 1
+
+    # The last attempt fails the job
+    job = await claim_job()
+    await release_job(job, "The database went away")
+
+    assert (await DBContributionJob.get(job.id)).status == JobStatus.FAILED
+    assert await items.count() == 0
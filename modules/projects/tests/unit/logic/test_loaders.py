@@ -0,0 +1,112 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from beanie import Document, Link, WriteRules
+from bson import DBRef
+
+from models import DBEPD, DBAssembly, DBGeocode, DBProject, DBTechFlow
+from models.database.geocodes import geocode_id
+from models.database.loaders import create_loaders, resolve_link, resolve_links
+
+
+def spy_queries(monkeypatch, *models: type[Document]) -> list[type[Document]]:
+    """The models whose collections are queried, one entry per query"""
+
+    queries = []
+    for model in models:
+        collection = model.get_motor_collection()
+
+        def find(*args, _find=collection.find, _model=model, **kwargs):
+            queries.append(_model)
+            return _find(*args, **kwargs)
+
+        monkeypatch.setattr(collection, "find", find)
+    return queries
+
+
+def request_info() -> SimpleNamespace:
+    return SimpleNamespace(context={"loaders": create_loaders()})
+
+
+@pytest.fixture()
+async def project(app, database, datafix_dir) -> DBProject:
+    """A stored project, fetched without its links"""
+
+    project = DBProject(**json.loads((datafix_dir / "project.json").read_text()))
+    await project.insert(link_rule=WriteRules.WRITE)
+    yield await DBProject.get(project.id)
+
+
+@pytest.mark.asyncio
+async def test_load_documents_in_key_order(app, database, datafix_dir, monkeypatch):
+    project = json.loads((datafix_dir / "project.json").read_text())
+    epd = await DBEPD(**project["assemblies"][0]["products"][0]["impactData"]).insert()
+    epds, techflows = DBEPD.get_motor_collection().name, DBTechFlow.get_motor_collection().name
+    queries = spy_queries(monkeypatch, DBEPD, DBTechFlow)
+
+    documents = await create_loaders()["impact_data"].load_many(
+        [(epds, uuid.uuid4()), (epds, epd.id), (techflows, epd.id)]
+    )
+
+    # A missing document and an id looked up in the wrong collection are None, in the place of their key
+    assert [document and document.id for document in documents] == [None, epd.id, None]
+    assert queries == [DBEPD, DBTechFlow]
+
+
+@pytest.mark.asyncio
+async def test_resolve_links_batches_per_request(project, monkeypatch):
+    (link,) = project.assemblies
+    missing = Link(DBRef(link.ref.collection, uuid.uuid4()), DBAssembly)
+    fetched = await DBAssembly.get(link.ref.id)
+    queries = spy_queries(monkeypatch, DBAssembly)
+    info = request_info()
+
+    # Concurrent loads of one request share a query, and the links keep their order without the missing ones
+    links, single, deleted = await asyncio.gather(
+        resolve_links(info, "assemblies", [missing, fetched, link]),
+        resolve_link(info, "assemblies", link),
+        resolve_link(info, "assemblies", missing),
+    )
+
+    assert [assembly.id for assembly in links] == [link.ref.id, link.ref.id]
+    assert links[0] is fetched
+    assert single.id == link.ref.id
+    assert deleted is None
+    assert queries == [DBAssembly]
+
+    # The loaders cache per request, so a new request queries again
+    await resolve_link(request_info(), "assemblies", link)
+    assert queries == [DBAssembly, DBAssembly]
+
+
+@pytest.mark.asyncio
+async def test_load_geocodes_falls_back_to_country(mock_database, monkeypatch):
+    await DBGeocode.insert_many(
+        [
+            DBGeocode(id=geocode_id("dnk", None), country="dnk", latitude=56.0, longitude=10.0, precision="country"),
+            DBGeocode(
+                id=geocode_id("dnk", "Aarhus"),
+                country="dnk",
+                city="Aarhus",
+                latitude=56.2,
+                longitude=10.2,
+                precision="city",
+            ),
+        ]
+    )
+    queries = spy_queries(monkeypatch, DBGeocode)
+
+    coordinates = await create_loaders()["geocodes"].load_many(
+        [("dnk", "Testbyen"), ("swe", "Malmö"), ("dnk", "Aarhus"), ("dnk", None)]
+    )
+
+    assert [coordinate and coordinate.precision for coordinate in coordinates] == [
+        "country",
+        None,
+        "city",
+        "country",
+    ]
+    assert queries == [DBGeocode]
@@ -1,7 +1,12 @@
+import gzip
+import json
+
+import brotli
 import pytest
 from jsonschema import Draft202012Validator
 
 from logic import serialize_openbdf_schema
+from logic.openbdf import get_openbdf_document, select_encoding
 
 
 @pytest.mark.asyncio
@@ -10,3 +15,21 @@ async def test_serialize_openbdf_schema():
 
     assert schema
     Draft202012Validator.check_schema(schema)
+
+
+def test_openbdf_document():
+    document = get_openbdf_document()
+
+    assert document is get_openbdf_document()
+    assert json.loads(document.bodies["identity"]) == json.loads(gzip.decompress(document.bodies["gzip"]))
+    assert brotli.decompress(document.bodies["br"]) == document.bodies["identity"]
+    assert document.etags["identity"] != document.etags["gzip"] != document.etags["br"]
+
+
+def test_select_encoding():
+    available = {"identity": b"", "gzip": b"", "br": b""}
+
+    assert select_encoding("gzip, deflate, br", available) == "br"
+    assert select_encoding("br;q=0, gzip;q=0.5", available) == "gzip"
+    assert select_encoding("br", {"identity": b"", "gzip": b""}) == "identity"
+    assert select_encoding(None, available) == "identity"
@@ -0,0 +1,28 @@
+import json
+import uuid
+
+import pytest
+
+from logic.project import get_projects
+from models import DBProject, FilterBy
+
+
+@pytest.mark.asyncio
+async def test_get_projects_ranks_every_search_match(app, database, datafix_dir):
+    data = {**json.loads((datafix_dir / "project.json").read_text()), "assemblies": [], "public": True}
+    projects = [DBProject(**{**data, "id": uuid.uuid4(), "name": f"Schoolyard {index}"}) for index in range(1005)]
+    # The best match is stored last, so a ranking of only the first matches would miss it
+    projects.append(DBProject(**{**data, "id": uuid.uuid4(), "name": "School Aarhus"}))
+    for project in projects:
+        project.index_search_terms()
+    await DBProject.insert_many(projects)
+
+    filter_by = FilterBy(contains={"name": "school"})
+
+    (first,) = await get_projects(uuid.uuid4(), filter_by, limit=1)
+    assert first.name == "School Aarhus"
+
+    # Pages past the first thousand matches are ranked too
+    page = await get_projects(uuid.uuid4(), filter_by, limit=10, offset=1000)
+    assert len(page) == 6
+    assert all(project.name.startswith("Schoolyard") for project in page)
@@ -0,0 +1,96 @@
+import gzip
+import json
+import uuid
+
+import pytest
+
+import logic.upload
+from core.config import settings
+from core.exceptions import InvalidOperationError, PartialUploadError
+from logic.upload import decompress, iter_documents, upload_contributions
+from models import SuperTokensUser
+
+
+async def stream(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def collect(chunks) -> list:
+    return [document async for document in iter_documents(chunks)]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        json.dumps({"name": "Projekt ø", "id": 1}),
+        json.dumps([{"name": "Projekt ø", "id": 1}, {"name": "b", "id": 2}]),
+        '{"name": "Projekt ø", "id": 1}\n{"name": "b", "id": 2}\n',
+    ],
+)
+async def test_iter_documents(body: str):
+    documents = await collect(stream(body.encode()))
+
+    assert documents[0] == {"name": "Projekt ø", "id": 1}
+    assert len(documents) == body.count("{")
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.parametrize(
+    "parts",
+    [
+        [b'{"bbbbbbbb": ', b'2}\n{"c":3}\n'],
+        [b'[{"bbbbbbbb": ', b'2},{"c":3}]'],
+        [b'{"a": 1}\n{"bbbbbbbb": ', b'2}\n{"c":', b"3}"],
+    ],
+)
+async def test_iter_documents_split_across_chunks(parts: list[bytes]):
+    documents = await collect(chunks(*parts))
+
+    assert documents == await collect(chunks(b"".join(parts)))
+    assert documents[-1] == {"c": 3}
+
+
+@pytest.mark.parametrize("size", range(1, 40))
+async def test_iter_documents_any_chunk_size(size: int):
+    body = b'[{"name": "a", "values": [1, 2]}, {"name": "\xc3\xb8"}, {"c": 3}]'
+
+    assert await collect(stream(body, size)) == [{"name": "a", "values": [1, 2]}, {"name": "ø"}, {"c": 3}]
+
+
+async def test_iter_documents_invalid():
+    with pytest.raises(InvalidOperationError):
+        await collect(stream(b'{"name": "a"}\n{"name": '))
+    with pytest.raises(InvalidOperationError):
+        await collect(chunks(b'{"name": ', b'"a"}\n{"c": 3} x'))
+
+
+async def test_decompress():
+    body = b'{"name": "a"}\n{"name": "b"}\n'
+
+    documents = await collect(decompress(stream(gzip.compress(body))))
+
+    assert documents == [{"name": "a"}, {"name": "b"}]
+
+
+@pytest.mark.asyncio
+async def test_upload_contributions_reports_stored_batches(mock_database, datafix_dir, monkeypatch):
+    async def insert_contributions(contributions):
+        return contributions
+
+    monkeypatch.setattr(logic.upload, "insert_contributions", insert_contributions)
+    monkeypatch.setattr(settings, "UPLOAD_BATCH_SIZE", 2)
+    project = json.loads((datafix_dir / "project.json").read_text())
+    body = "\n".join([*(json.dumps(project) for _ in range(3)), json.dumps({"name": "Not a project"})])
+    user = SuperTokensUser(id=uuid.uuid4(), organization_id=uuid.uuid4())
+
+    with pytest.raises(PartialUploadError) as error:
+        await upload_contributions(stream(body.encode(), 1024), user)
+
+    # The first batch was stored, the valid project of the failed batch was not
+    assert len(error.value.contributions) == 2
+    assert "Project 3" in error.value.message
@@ -0,0 +1,70 @@
+import pytest
+
+from models import DBLocation
+from models.database.gazetteer import Gazetteer, gazetteer_key, get_gazetteer, write_gazetteer
+from models.database.geocodes import bbox_polygons, geocode_id, resolve_coordinates
+
+
+@pytest.fixture()
+def gazetteer(tmp_path) -> Gazetteer:
+    path = tmp_path / "gazetteer.bin"
+    write_gazetteer(
+        {
+            gazetteer_key("dnk"): (56.0, 10.0),
+            gazetteer_key("dnk", "Aarhus"): (56.15, 10.21),
+            gazetteer_key("dnk", "København"): (55.68, 12.57),
+            gazetteer_key("che", "Zürich"): (47.37, 8.54),
+        },
+        path,
+    )
+    return Gazetteer(path)
+
+
+def test_lookup_city(gazetteer):
+    coordinates = gazetteer.lookup("DNK", "KØBENHAVN")
+
+    assert coordinates.precision == "city"
+    assert coordinates.latitude == pytest.approx(55.68)
+    assert gazetteer.lookup("che", "zurich").longitude == pytest.approx(8.54)
+
+
+def test_lookup_falls_back_to_country(gazetteer):
+    assert gazetteer.lookup("dnk", "Odense").precision == "country"
+    assert gazetteer.lookup("dnk").latitude == pytest.approx(56.0)
+    assert gazetteer.lookup("swe", "Malmö") is None
+
+
+def test_bundled_gazetteer():
+    gazetteer = get_gazetteer()
+
+    assert gazetteer.lookup("dnk").precision == "country"
+    copenhagen = gazetteer.lookup("dnk", "Copenhagen")
+    assert copenhagen.precision == "city"
+    assert (copenhagen.latitude, copenhagen.longitude) == (
+        pytest.approx(55.68, abs=0.05),
+        pytest.approx(12.57, abs=0.05),
+    )
+    assert gazetteer.lookup("che", "Zürich").precision == "city"
+
+
+def test_resolve_coordinates():
+    location = DBLocation(country="dnk", city="Testbyen")
+
+    assert geocode_id(location.country.value, location.city) == "dnk\ttestbyen"
+    assert resolve_coordinates(location).precision == "country"
+    assert resolve_coordinates(DBLocation(country="dnk", city="Copenhagen")).precision == "city"
+    assert resolve_coordinates(DBLocation(country="unknown")).precision == "unknown"
+
+
+def test_bbox_polygons():
+    polygons = bbox_polygons(-180, -90, 180, 90)
+    assert len(polygons) == 4
+    ring = polygons[0]["coordinates"][0]
+    assert ring[0] == ring[-1]
+    assert max(abs(latitude) for _, latitude in ring) < 90
+
+    # A box crossing the antimeridian is covered on both sides of it
+    ring = [point for polygon in bbox_polygons(170, 0, -170, 10) for point in polygon["coordinates"][0]]
+    assert min(longitude for longitude, _ in ring) == -180
+    assert max(longitude for longitude, _ in ring) == 180
+    assert all(longitude >= 170 or longitude <= -170 for longitude, _ in ring)
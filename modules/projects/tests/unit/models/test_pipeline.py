@@ -0,0 +1,79 @@
+import pytest
+
+from core.config import settings
+from core.exceptions import InvalidOperationError
+from models.pipeline import validate_field_path, validate_pipeline, validate_summary_path, validate_summary_pipeline
+
+
+def test_validate_pipeline():
+    pipeline = [
+        {"$match": {"lifeCycleStages": {"$in": ["a1a3"]}}},
+        {"$group": {"_id": "$location.country", "value": {"$avg": "$intensities.gwp.a1a3"}}},
+        {"$facet": {"count": [{"$count": "count"}], "top": [{"$sort": {"value": -1}}, {"$limit": 5}]}},
+    ]
+
+    assert validate_pipeline(pipeline) == [*pipeline, {"$limit": settings.ANALYTICS_MAX_RESULTS}]
+
+
+@pytest.mark.parametrize(
+    "pipeline",
+    [
+        {"$match": {}},
+        [{"$lookup": {"from": "DBProject", "localField": "_id", "foreignField": "_id", "as": "project"}}],
+        [{"$out": "projects"}],
+        [{"$match": {"$where": "sleep(1000)"}}],
+        [{"$group": {"_id": None, "value": {"$accumulator": {}}}}],
+        [{"$facet": {"nested": [{"$facet": {}}]}}],
+        [{"$facet": {"projects": [{"$unionWith": "DBProject"}]}}],
+        [{"$limit": settings.ANALYTICS_MAX_RESULTS + 1}],
+        [{"$match": {}, "$limit": 1}],
+    ],
+)
+def test_validate_pipeline_rejects(pipeline):
+    with pytest.raises(InvalidOperationError):
+        validate_pipeline(pipeline)
+
+
+def test_validate_field_path():
+    assert validate_field_path("location.country") == "location.country"
+
+    for path in ["$name", "name.$id", "", "a..b", "$$ROOT"]:
+        with pytest.raises(InvalidOperationError):
+            validate_field_path(path)
+
+
+def test_validate_summary_path():
+    for path in [
+        "location.country",
+        "projectInfo.grossFloorArea.value",
+        "intensities.gwp.a1a3",
+        "lifeCycleStages",
+        "_id",
+    ]:
+        assert validate_summary_path(path) == path
+    assert validate_summary_path("ratio", {"ratio"}) == "ratio"
+
+    for path in ["projectPhase", "softwareInfo.lcaSoftware", "metaData.source", "location.country.code"]:
+        with pytest.raises(InvalidOperationError):
+            validate_summary_path(path)
+
+
+def test_validate_summary_pipeline():
+    validate_summary_pipeline(
+        [
+            {"$match": {"$or": [{"public": True}, {"location.country": "dnk"}]}},
+            {"$addFields": {"ratio": {"$divide": ["$results.gwp.a1a3", "$projectInfo.grossFloorArea.value"]}}},
+            {"$group": {"_id": "$location.country", "value": {"$avg": "$ratio"}}},
+            # After the $group, paths refer to its output
+            {"$sort": {"value": -1}},
+        ]
+    )
+
+    for pipeline in [
+        [{"$group": {"_id": "$projectPhase", "count": {"$sum": 1}}}],
+        [{"$match": {"softwareInfo.lcaSoftware": "x"}}],
+        [{"$facet": {"phases": [{"$sortByCount": "$projectPhase"}]}}],
+        [{"$project": {"metaData": 1}}],
+    ]:
+        with pytest.raises(InvalidOperationError):
+            validate_summary_pipeline(pipeline)
@@ -0,0 +1,47 @@
+import re
+
+from models import DBContribution, DBProject, FilterBy
+from models.search import fold, query_terms, search_terms, short_query_condition
+from models.sort_filter import FILTER_FIELDS, search_ranking
+
+
+def test_fold():
+    assert fold("Zürich Skolehus ÆBLE") == "zurich skolehus æble"
+
+
+def test_search_terms():
+    terms = search_terms({"name": "Zürich School", "owner": None})
+
+    assert {"name:zu", "name:zurich", "name=zurich", "name:sc", "name=school"} <= set(terms)
+    assert "name:z" not in terms
+    assert not [term for term in terms if term.startswith("owner")]
+
+
+def test_query_terms_are_literal():
+    assert query_terms("name", "Züri.*(") == ["name:zuri"]
+    assert query_terms("name", "a") == []
+
+
+def test_search_fields():
+    assert FILTER_FIELDS["DBProject"]["project.name"].search_terms_path == "searchTerms"
+    assert FILTER_FIELDS["DBContribution"]["name"].search_field == "name"
+    assert FILTER_FIELDS["DBContribution"]["name"].search_terms_path == "project.searchTerms"
+    assert search_ranking(DBContribution, FilterBy(contains={"uploadedAt": "2024"})) == []
+
+
+def test_search_ranking():
+    ranking = search_ranking(DBProject, FilterBy(contains={"name": "zurich school"}))
+    stages = {name: body for stage in ranking for name, body in stage.items()}
+
+    assert stages["$addFields"]["_searchScore"]["$size"]["$setIntersection"][1] == ["name=zurich", "name=school"]
+    # Every match is ranked, on its search terms only
+    assert "$limit" not in stages
+    assert ranking[0] == {"$project": {"searchTerms": 1}}
+    assert search_ranking(DBProject, FilterBy(equal={"name": "zurich"})) == []
+
+
+def test_short_query_condition():
+    assert short_query_condition("name", "Å") == {"$in": [re.compile("^name:a"), "name=a"]}
+    assert len(short_query_condition("name", "a b")["$all"]) == 2
+    assert short_query_condition("name", "-") == {"$in": []}
+    assert short_query_condition("name", " ") is None
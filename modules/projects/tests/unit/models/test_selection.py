@@ -0,0 +1,17 @@
+from strawberry.types.nodes import InlineFragment, SelectedField
+
+from models.selection import get_selection
+
+
+def field(name: str, *selections) -> SelectedField:
+    return SelectedField(name=name, directives={}, arguments={}, selections=list(selections))
+
+
+def test_get_selection():
+    selections = [
+        field("name"),
+        field("location", field("country")),
+        InlineFragment(type_condition="Project", selections=[field("location", field("city"))], directives={}),
+    ]
+
+    assert get_selection(selections) == {"name": {}, "location": {"country": {}, "city": {}}}
@@ -0,0 +1,90 @@
+import datetime
+from uuid import uuid4
+
+import pytest
+from pydantic import BaseModel, Field
+
+from core.exceptions import InvalidOperationError
+from models import DBContribution, DBProject, FilterBy, SortBy, encode_cursor
+from models.sort_filter import compile_filter, decode_cursor, get_matching_country_codes, get_sort_key
+
+
+class CursorDocument(BaseModel):
+    id: object = Field(default_factory=uuid4)
+    uploaded_at: datetime.datetime = Field(alias="uploadedAt")
+
+
+def test_get_sort_key():
+    assert get_sort_key(None) == ("_id", 1)
+    assert get_sort_key(SortBy(asc="uploadedAt")) == ("uploadedAt", 1)
+    assert get_sort_key(SortBy(dsc="project.location.countryName")) == ("project.location.country", -1)
+
+
+def test_cursor_round_trip():
+    document = CursorDocument(uploadedAt=datetime.datetime(2024, 5, 1, 12, 30))
+
+    cursor = encode_cursor(SortBy(dsc="uploadedAt"), document)
+
+    assert decode_cursor(cursor) == ("uploadedAt", document.uploaded_at, document.id)
+
+
+def test_decode_invalid_cursor():
+    with pytest.raises(InvalidOperationError):
+        decode_cursor("not-a-cursor")
+
+
+def test_compile_filter():
+    project_id = uuid4()
+    match = compile_filter(
+        DBProject,
+        FilterBy(
+            equal={"id": str(project_id), "projectPhase": "design"},
+            contains={"countryName": "denm", "name": "school"},
+            gte={"uploadedAt": "2024-01-01T00:00:00"},
+            lt={"uploadedAt": "2025-01-01T00:00:00"},
+        ),
+    )
+
+    assert match == {
+        "_id": project_id,
+        "projectPhase": "design",
+        "location.country": {"$in": ["dnk"]},
+        "searchTerms": {"$all": ["name:school"]},
+        "uploadedAt": {"$gte": datetime.datetime(2024, 1, 1), "$lt": datetime.datetime(2025, 1, 1)},
+    }
+
+
+def test_compile_filter_short_search():
+    # A single character is not indexed as a prefix, but still filters
+    assert compile_filter(DBProject, FilterBy(contains={"name": "s"}))["searchTerms"]["$in"][1] == "name=s"
+    assert compile_filter(DBProject, FilterBy(contains={"name": "?"})) == {"searchTerms": {"$in": []}}
+
+
+def test_compile_filter_contribution_paths():
+    match = compile_filter(DBContribution, FilterBy(equal={"buildingType": "new", "public": True}))
+
+    assert match == {"project.projectInfo.buildingType": "new", "public": True}
+
+
+def test_compile_filter_escapes_values():
+    match = compile_filter(DBProject, FilterBy(starts_with={"location.country": ".*"}))
+
+    assert match == {"location.country": {"$regex": "^\\.\\*"}}
+
+
+@pytest.mark.parametrize(
+    "filter_by",
+    [
+        FilterBy(equal={"assemblies.name": "wall"}),
+        FilterBy(equal={"id": "not-a-uuid"}),
+        FilterBy(_in={"lifeCycleStages": "a1a3"}),
+    ],
+)
+def test_compile_filter_rejects(filter_by):
+    with pytest.raises(InvalidOperationError):
+        compile_filter(DBProject, filter_by)
+
+
+def test_get_matching_country_codes():
+    assert get_matching_country_codes("Curacao") == ["cuw"]
+    assert get_matching_country_codes("atlantis") == []